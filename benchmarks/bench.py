@@ -0,0 +1,590 @@
+#!/usr/bin/env python
+# coding=utf8
+"""Runs reproducible workloads against simplekv backends.
+
+Every combination of backend and workload runs in a fresh store inside its
+own child process, so that peak memory usage can be reported per workload.
+Results are written as JSON and can be compared with ``compare``::
+
+    python benchmarks/bench.py run -o before.json
+    # ... apply changes ...
+    python benchmarks/bench.py run -o after.json
+    python benchmarks/bench.py compare before.json after.json
+
+Backends whose dependencies or stand-ins are not available are reported as
+unavailable instead of failing the run.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from random import Random
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+
+class Unavailable(Exception):
+    """Raised if a backend or workload cannot be run here."""
+
+
+# backends. each is a context manager yielding a store inside *path*
+
+@contextlib.contextmanager
+def dict_backend(path, args):
+    from simplekv.memory import DictStore
+    yield DictStore()
+
+
+@contextlib.contextmanager
+def fs_backend(path, args):
+    from simplekv.fs import FilesystemStore
+    yield FilesystemStore(path)
+
+
+@contextlib.contextmanager
+def fs_perm_backend(path, args):
+    from simplekv.fs import FilesystemStore
+    yield FilesystemStore(path, perm=0o640)
+
+
+@contextlib.contextmanager
+def fs_atomic_backend(path, args):
+    from simplekv.fs import FilesystemStore
+    yield FilesystemStore(path, atomic=True)
+
+
+@contextlib.contextmanager
+def fs_sharded_backend(path, args):
+    from simplekv.fs import FilesystemStore
+    yield FilesystemStore(path, shard_depth=2)
+
+
+@contextlib.contextmanager
+def fs_indexed_backend(path, args):
+    from simplekv.fs import FilesystemStore
+    yield FilesystemStore(path, index=True)
+
+
+@contextlib.contextmanager
+def bitcask_backend(path, args):
+    from simplekv.bitcask import BitcaskStore
+    store = BitcaskStore(path)
+    try:
+        yield store
+    finally:
+        store.close()
+
+
+@contextlib.contextmanager
+def lmdb_backend(path, args):
+    try:
+        import lmdb
+    except ImportError:
+        raise Unavailable('lmdb is not installed')
+    from simplekv.db.lmdbstore import LMDBStore
+
+    env = lmdb.open(path, map_size=2 ** 32)
+    try:
+        yield LMDBStore(env)
+    finally:
+        env.close()
+
+
+@contextlib.contextmanager
+def sqlite_backend(path, args):
+    try:
+        from sqlalchemy import create_engine, MetaData
+    except ImportError:
+        raise Unavailable('sqlalchemy is not installed')
+    from simplekv.db.sql import SQLAlchemyStore
+
+    engine = create_engine('sqlite:///' + os.path.join(path, 'bench.db'))
+    metadata = MetaData(bind=engine)
+    store = SQLAlchemyStore(engine, metadata, 'simplekv_bench')
+    metadata.create_all()
+    try:
+        yield store
+    finally:
+        engine.dispose()
+
+
+@contextlib.contextmanager
+def sqlite3_backend(path, args):
+    from simplekv.db.sqlite import SQLiteStore
+    store = SQLiteStore(os.path.join(path, 'bench.db'))
+    try:
+        yield store
+    finally:
+        store.close()
+
+
+@contextlib.contextmanager
+def git_backend(path, args):
+    try:
+        from dulwich.repo import Repo
+    except ImportError:
+        raise Unavailable('dulwich is not installed')
+    from simplekv.git import GitCommitStore
+
+    Repo.init_bare(path)
+    yield GitCommitStore(path)
+
+
+@contextlib.contextmanager
+def redis_backend(path, args):
+    from simplekv.memory.redisstore import RedisStore
+
+    if args.redis_url:
+        from redis import StrictRedis
+        r = StrictRedis.from_url(args.redis_url)
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            raise Unavailable('fakeredis is not installed and no --redis-url '
+                              'was given')
+        r = fakeredis.FakeStrictRedis()
+    r.flushdb()
+    yield RedisStore(r)
+
+
+@contextlib.contextmanager
+def s3_backend(path, args):
+    try:
+        import boto3
+        import moto
+    except ImportError:
+        raise Unavailable('boto3 and moto are required')
+    from simplekv.net.boto3store import Boto3Store
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    mock = getattr(moto, 'mock_aws', None) or moto.mock_s3
+    with mock():
+        bucket = boto3.resource('s3').Bucket('simplekv-bench')
+        bucket.create()
+        yield Boto3Store(bucket)
+
+
+@contextlib.contextmanager
+def azure_backend(path, args):
+    conn_string = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
+    if not conn_string:
+        raise Unavailable('set AZURE_STORAGE_CONNECTION_STRING, e.g. to an '
+                          'Azurite instance')
+    try:
+        from simplekv.net.azurestore import AzureBlockBlobStore
+    except ImportError:
+        raise Unavailable('azure-storage-blob is not installed')
+
+    store = AzureBlockBlobStore(conn_string=conn_string,
+                                container='simplekv-bench-%d' % os.getpid())
+    try:
+        yield store
+    finally:
+        store.delete_many(list(store.keys()))
+
+
+@contextlib.contextmanager
+def gcs_backend(path, args):
+    if not os.environ.get('STORAGE_EMULATOR_HOST'):
+        raise Unavailable('set STORAGE_EMULATOR_HOST, e.g. to a '
+                          'fake-gcs-server instance')
+    try:
+        from google.auth.credentials import AnonymousCredentials
+        from simplekv.net.gcstore import GoogleCloudStore
+    except ImportError:
+        raise Unavailable('google-cloud-storage is not installed')
+
+    store = GoogleCloudStore(AnonymousCredentials(),
+                             'simplekv-bench-%d' % os.getpid(),
+                             project='simplekv-bench')
+    try:
+        yield store
+    finally:
+        store.delete_many(list(store.keys()))
+
+
+BACKENDS = {
+    'dict': dict_backend,
+    'fs': fs_backend,
+    'fs-perm': fs_perm_backend,
+    'fs-atomic': fs_atomic_backend,
+    'fs-sharded': fs_sharded_backend,
+    'fs-indexed': fs_indexed_backend,
+    'bitcask': bitcask_backend,
+    'lmdb': lmdb_backend,
+    'sqlite': sqlite_backend,
+    'sqlite3': sqlite3_backend,
+    'git': git_backend,
+    'redis': redis_backend,
+    's3': s3_backend,
+    'azure': azure_backend,
+    'gcs': gcs_backend,
+}
+
+
+# workloads
+
+class Recorder(object):
+    """Collects the latency, bytes and items of every timed operation."""
+
+    def __init__(self):
+        self.latencies = []
+        self.bytes = 0
+        self.items = 0
+
+    def time(self, fn, *args, **kwargs):
+        start = default_timer()
+        rv = fn(*args, **kwargs)
+        self.latencies.append(default_timer() - start)
+        return rv
+
+
+def random_bytes(rng, n):
+    return rng.getrandbits(n * 8).to_bytes(n, 'little') if n else b''
+
+
+def populate(store, keys, value_size, rng, batch_size=1000):
+    """Puts random values of *value_size* bytes at *keys*, in batches."""
+    value = random_bytes(rng, value_size)
+    for i in range(0, len(keys), batch_size):
+        store.put_many((k, value) for k in keys[i:i + batch_size])
+
+
+def small_put(store, rec, rng, scale):
+    n = int(10000 * scale) or 1
+    values = [random_bytes(rng, 100) for _ in range(100)]
+    for i in range(n):
+        value = values[i % len(values)]
+        rec.time(store.put, u'key%08d' % i, value)
+        rec.bytes += len(value)
+
+
+def small_get(store, rec, rng, scale):
+    n = int(10000 * scale) or 1
+    keys = [u'key%08d' % i for i in range(n)]
+    populate(store, keys, 100, rng)
+    for _ in range(n):
+        rec.bytes += len(rec.time(store.get, rng.choice(keys)))
+
+
+def _large_file(path, rng, scale):
+    size = max(int(64 * 1024 * 1024 * scale), 1024 * 1024)
+    block = random_bytes(rng, 1024 * 1024)
+    filename = os.path.join(path, 'large.bin')
+    with open(filename, 'wb') as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+    return filename, size // len(block) * len(block)
+
+
+def large_put_file(store, rec, rng, scale, path):
+    filename, size = _large_file(path, rng, scale)
+    for i in range(4):
+        with open(filename, 'rb') as f:
+            rec.time(store.put_file, u'large%d' % i, f)
+        rec.bytes += size
+
+
+def large_get_file(store, rec, rng, scale, path):
+    filename, size = _large_file(path, rng, scale)
+    for i in range(4):
+        with open(filename, 'rb') as f:
+            store.put_file(u'large%d' % i, f)
+    os.unlink(filename)
+
+    for i in range(4):
+        with open(filename, 'wb') as f:
+            rec.time(store.get_file, u'large%d' % i, f)
+        rec.bytes += size
+        os.unlink(filename)
+
+
+def list_prefix(store, rec, rng, scale):
+    n = int(1000000 * scale) or 1
+    populate(store, [u'p%02d.key%08d' % (i % 100, i) for i in range(n)], 10,
+             rng)
+
+    for _ in range(3):
+        rec.items += len(rec.time(store.keys))
+    for i in rng.sample(range(100), 10):
+        rec.items += len(rec.time(store.keys, u'p%02d.' % i))
+
+
+def iter_prefixes(store, rec, rng, scale):
+    n = int(100000 * scale) or 1
+    populate(store, [u'a%02d.b%02d.key%08d' % (i % 100, i // 100 % 100, i)
+                     for i in range(n)], 10, rng)
+
+    for _ in range(3):
+        rec.items += len(rec.time(lambda: list(store.iter_prefixes(u'.'))))
+    for i in rng.sample(range(100), 10):
+        rec.items += len(rec.time(
+            lambda: list(store.iter_prefixes(u'.', u'a%02d.' % i))))
+
+
+def copy(store, rec, rng, scale):
+    if not hasattr(store, 'copy'):
+        raise Unavailable('store does not support copy')
+
+    n = int(10000 * scale) or 1
+    keys = [u'key%08d' % i for i in range(n)]
+    populate(store, keys, 1000, rng)
+    for key in keys:
+        rec.time(store.copy, key, u'copy.' + key)
+        rec.bytes += 1000
+
+
+def _mixed(read_ratio):
+    def mixed(store, rec, rng, scale):
+        n = int(10000 * scale) or 1
+        keys = [u'key%08d' % i for i in range(n)]
+        populate(store, keys, 1000, rng)
+        values = [random_bytes(rng, 1000) for _ in range(100)]
+
+        for i in range(n):
+            key = rng.choice(keys)
+            if rng.random() < read_ratio:
+                rec.bytes += len(rec.time(store.get, key))
+            else:
+                value = values[i % len(values)]
+                rec.time(store.put, key, value)
+                rec.bytes += len(value)
+    return mixed
+
+
+WORKLOADS = {
+    'small_put': small_put,
+    'small_get': small_get,
+    'large_put_file': large_put_file,
+    'large_get_file': large_get_file,
+    'list_prefix': list_prefix,
+    'iter_prefixes': iter_prefixes,
+    'copy': copy,
+    'mixed_95_5': _mixed(0.95),
+    'mixed_50_50': _mixed(0.5),
+}
+
+# workloads that need a scratch directory for their own files
+NEEDS_PATH = ('large_put_file', 'large_get_file')
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes everywhere but on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_one(args):
+    """Runs a single workload, in the child process."""
+    result = {'backend': args.backend, 'workload': args.workload}
+    tmp = tempfile.mkdtemp(prefix='simplekv-bench-')
+    try:
+        store_path = os.path.join(tmp, 'store')
+        os.mkdir(store_path)
+        rng = Random('%s-%s' % (args.seed, args.workload))
+        rec = Recorder()
+        workload = WORKLOADS[args.workload]
+        extra = (tmp,) if args.workload in NEEDS_PATH else ()
+
+        with BACKENDS[args.backend](store_path, args) as store:
+            workload(store, rec, rng, args.scale, *extra)
+    except Unavailable as e:
+        result.update(status='unavailable', reason=str(e))
+    else:
+        latencies = sorted(rec.latencies)
+        seconds = sum(latencies)
+        result.update(
+            status='ok',
+            ops=len(latencies),
+            seconds=seconds,
+            ops_per_sec=len(latencies) / seconds if seconds else None,
+            bytes=rec.bytes,
+            mb_per_sec=rec.bytes / seconds / 1e6 if seconds else None,
+            items=rec.items,
+            items_per_sec=rec.items / seconds if seconds else None,
+            p50=percentile(latencies, 0.5),
+            p99=percentile(latencies, 0.99),
+        )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    result['peak_rss'] = peak_rss()
+    json.dump(result, sys.stdout)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _select(value, choices):
+    names = value.split(',') if value else sorted(choices)
+    unknown = set(names) - set(choices)
+    if unknown:
+        raise SystemExit('unknown: %s' % ', '.join(sorted(unknown)))
+    return names
+
+
+def run(args):
+    results = []
+    for backend in _select(args.backends, BACKENDS):
+        for workload in _select(args.workloads, WORKLOADS):
+            cmd = [sys.executable, os.path.abspath(__file__), 'child',
+                   backend, workload, '--scale', str(args.scale),
+                   '--seed', str(args.seed)]
+            if args.redis_url:
+                cmd += ['--redis-url', args.redis_url]
+
+            try:
+                proc = subprocess.run(cmd, stdout=subprocess.PIPE,
+                                      timeout=args.timeout)
+            except subprocess.TimeoutExpired:
+                result = {'backend': backend, 'workload': workload,
+                          'status': 'timeout'}
+            else:
+                if proc.returncode:
+                    result = {'backend': backend, 'workload': workload,
+                              'status': 'error'}
+                else:
+                    result = json.loads(proc.stdout.decode())
+
+            results.append(result)
+            print(format_result(result), file=sys.stderr)
+
+    output = {
+        'meta': {
+            'revision': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+    else:
+        json.dump(output, sys.stdout, indent=2, sort_keys=True)
+
+
+def _ms(seconds):
+    return '%9.3fms' % (seconds * 1000) if seconds is not None else ' ' * 11
+
+
+def format_result(r):
+    name = '%-8s %-15s' % (r['backend'], r['workload'])
+    if r['status'] != 'ok':
+        return '%s %s %s' % (name, r['status'], r.get('reason', ''))
+    if r['items']:
+        rate = '%10.0f items/s' % (r['items_per_sec'] or 0)
+    else:
+        rate = '%8.1f MB/s' % (r['mb_per_sec'] or 0)
+    return '%s %10.1f ops/s %s p50 %s p99 %s rss %6.1f MB' % (
+        name, r['ops_per_sec'] or 0, rate, _ms(r['p50']), _ms(r['p99']),
+        r['peak_rss'] / 1e6)
+
+
+def compare(args):
+    def load(filename):
+        with open(filename) as f:
+            return dict(((r['backend'], r['workload']), r)
+                        for r in json.load(f)['results']
+                        if r['status'] == 'ok')
+
+    old, new = load(args.old), load(args.new)
+    regressions = 0
+    print('%-8s %-15s %12s %12s %8s %12s %12s %8s' % (
+        'backend', 'workload', 'old ops/s', 'new ops/s', 'change',
+        'old p99', 'new p99', 'change'))
+    for key in sorted(set(old) & set(new)):
+        o, n = old[key], new[key]
+        speed = n['ops_per_sec'] / o['ops_per_sec'] - 1
+        p99 = n['p99'] / o['p99'] - 1 if o['p99'] else 0
+        flag = ''
+        if speed < -args.threshold or p99 > args.threshold:
+            flag = ' !'
+            regressions += 1
+        print('%-8s %-15s %12.1f %12.1f %+7.1f%% %s %s %+7.1f%%%s' % (
+            key + (o['ops_per_sec'], n['ops_per_sec'], speed * 100,
+                   _ms(o['p99']), _ms(n['p99']), p99 * 100, flag)))
+
+    if regressions and args.fail:
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    def common(p):
+        p.add_argument('--scale', type=float, default=1.0,
+                       help='multiplier for the number of keys and the size '
+                       'of large values (default: %(default)s)')
+        p.add_argument('--seed', default='simplekv',
+                       help='seed of the generated keys and values')
+        p.add_argument('--redis-url',
+                       help='use this redis server instead of fakeredis')
+
+    p = commands.add_parser('run', help='run workloads')
+    common(p)
+    p.add_argument('-b', '--backends',
+                   help='comma separated list of %s (default: all)'
+                   % ', '.join(sorted(BACKENDS)))
+    p.add_argument('-w', '--workloads',
+                   help='comma separated list of %s (default: all)'
+                   % ', '.join(sorted(WORKLOADS)))
+    p.add_argument('-o', '--output', help='write JSON results to this file')
+    p.add_argument('--timeout', type=float, default=1800,
+                   help='timeout per workload in seconds')
+    p.set_defaults(func=run)
+
+    p = commands.add_parser('compare', help='compare two result files')
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=0.1,
+                   help='relative change reported as a regression')
+    p.add_argument('--fail', action='store_true',
+                   help='exit with status 1 if there are regressions')
+    p.set_defaults(func=compare)
+
+    p = commands.add_parser('child')
+    p.add_argument('backend', choices=sorted(BACKENDS))
+    p.add_argument('workload', choices=sorted(WORKLOADS))
+    common(p)
+    p.set_defaults(func=run_one)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
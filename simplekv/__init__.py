@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 # coding=utf8
 
+import io
 import re
+from bisect import bisect_right
+from collections import namedtuple
 from io import BytesIO
-from ._compat import key_type
+from ._compat import key_type, text_type, PY2
 
 __version__ = '0.14.1'
 
@@ -16,6 +19,18 @@ VALID_KEY_RE = re.compile(VALID_KEY_REGEXP)
 """A compiled version of :data:`~simplekv.VALID_KEY_REGEXP`."""
 
 
+class KeyStat(namedtuple('KeyStat', ['size', 'mtime', 'etag'])):
+    """Metadata of a stored value, as returned by
+    :meth:`~simplekv.KeyValueStore.stat`.
+
+    ``size`` is the length of the value in bytes. ``mtime`` is the time of the
+    last modification in seconds since the epoch, as a `float`, and ``etag`` is
+    an opaque string that changes whenever the value does. Backends that do
+    not keep track of these set them to `None`.
+    """
+    __slots__ = ()
+
+
 class KeyValueStore(object):
     """The smallest API supported by all backends.
 
@@ -51,6 +66,22 @@ class KeyValueStore(object):
         """
         return self.iter_keys()
 
+    def contains_many(self, keys):
+        """Checks which of several keys are present
+
+        :param keys: An iterable of keys whose existence should be verified.
+
+        :raises exceptions.ValueError: If any of the keys is not valid.
+        :raises exceptions.IOError: If there was an error accessing the store.
+
+        :returns: A dictionary mapping every key to True if it exists, False
+                  otherwise.
+        """
+        keys = list(keys)
+        for key in keys:
+            self._check_valid_key(key)
+        return self._contains_many(keys)
+
     def delete(self, key):
         """Delete key and data associated with it.
 
@@ -62,6 +93,34 @@ class KeyValueStore(object):
         self._check_valid_key(key)
         return self._delete(key)
 
+    def delete_many(self, keys):
+        """Delete several keys and the data associated with them.
+
+        Keys that do not exist are ignored, like in
+        :meth:`~simplekv.KeyValueStore.delete`.
+
+        :param keys: An iterable of keys to delete.
+
+        :raises exceptions.ValueError: If any of the keys is not valid.
+        :raises exceptions.IOError: If there was an error deleting.
+        """
+        keys = list(keys)
+        for key in keys:
+            self._check_valid_key(key)
+        return self._delete_many(keys)
+
+    def delete_prefix(self, prefix):
+        """Delete all keys starting with *prefix* and the data associated with
+        them.
+
+        Note that an empty prefix deletes all keys.
+
+        :param prefix: The prefix of the keys to delete.
+
+        :raises exceptions.IOError: If there was an error deleting.
+        """
+        return self._delete_prefix(prefix)
+
     def get(self, key):
         """Returns the key data as a bytestring.
 
@@ -99,6 +158,121 @@ class KeyValueStore(object):
         else:
             return self._get_file(key, file)
 
+    def get_into(self, key, buf):
+        """Reads the data of a key into a preallocated buffer.
+
+        Unlike :meth:`~simplekv.KeyValueStore.get`, no new bytestring is
+        created, which avoids holding a second copy of large values in memory.
+        Use :meth:`~simplekv.KeyValueStore.stat` to find out the size the
+        buffer needs to have.
+
+        :param key: The key to be read
+        :param buf: A writable object supporting the buffer protocol, such as
+                    a `bytearray`, a `memoryview` or a numpy array.
+
+        :returns: The number of bytes written to *buf*.
+
+        :raises exceptions.ValueError: If the key is not valid, *buf* is not
+                                       writable or too small to hold the value.
+                                       In the latter case, the contents of
+                                       *buf* are undefined.
+        :raises exceptions.IOError: If the data could not be read.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        return self._get_into(key, _writable_view(buf))
+
+    def get_many(self, keys):
+        """Returns the data of several keys.
+
+        Backends may implement this using a single request, making it much
+        faster than calling :meth:`~simplekv.KeyValueStore.get` repeatedly.
+
+        :param keys: An iterable of keys to retrieve.
+
+        :returns: A dictionary mapping every key to its value, as a `bytes`
+                  object.
+
+        :raises exceptions.ValueError: If any of the keys is not valid.
+        :raises exceptions.IOError: If the data could not be read.
+        :raises exceptions.KeyError: If any of the keys was not found.
+        """
+        keys = list(keys)
+        for key in keys:
+            self._check_valid_key(key)
+        return self._get_many(keys)
+
+    def get_range(self, key, offset, length=None):
+        """Returns part of the data of a key as a bytestring.
+
+        Backends implement this with a single request where possible, such as
+        an HTTP range request, instead of retrieving the whole value.
+
+        Like reading from a file, fewer than *length* bytes are returned if
+        the value ends before that, and an empty bytestring if *offset* lies
+        beyond its end.
+
+        :param key: The key to be read
+        :param offset: Position of the first byte to return.
+        :param length: Maximum number of bytes to return. If `None`, everything
+                       from *offset* to the end is returned.
+
+        :raises exceptions.ValueError: If the key is not valid or *offset* or
+                                       *length* are negative.
+        :raises exceptions.IOError: If the data could not be read.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        self._check_valid_range(offset, length)
+        return self._get_range(key, offset, length)
+
+    def get_ranges(self, key, ranges):
+        """Returns several parts of the data of a key.
+
+        Overlapping and adjacent ranges are merged, so that every byte is
+        retrieved at most once.
+
+        :param key: The key to be read
+        :param ranges: An iterable of ``(offset, length)`` pairs, as accepted
+                       by :meth:`~simplekv.KeyValueStore.get_range`.
+
+        :returns: A list holding the data of each range, in the order the
+                  ranges were given.
+
+        :raises exceptions.ValueError: If the key or any of the ranges is not
+                                       valid.
+        :raises exceptions.IOError: If the data could not be read.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        ranges = list(ranges)
+        for offset, length in ranges:
+            self._check_valid_range(offset, length)
+        return self._get_ranges(key, ranges)
+
+    def iter_chunks(self, key, chunk_size=1024 * 1024):
+        """Returns an iterator over the data of a key, in chunks of at most
+        *chunk_size* bytes.
+
+        This allows streaming a value without holding all of it in memory.
+        The key is looked up right away, so a missing key raises a
+        :exc:`~exceptions.KeyError` from this call rather than once iteration
+        starts. If the iteration is stopped early, ``close()`` the iterator
+        to release the underlying resources right away.
+
+        :param key: The key to be read
+        :param chunk_size: The maximum size of a chunk in bytes.
+
+        :raises exceptions.ValueError: If the key is not valid or *chunk_size*
+                                       is not positive.
+        :raises exceptions.IOError: If the data could not be read.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive: %r' % chunk_size)
+        return self._iter_chunks(key, chunk_size)
+
     def iter_keys(self, prefix=u""):
         """Return an Iterator over all keys currently in the store, in any
         order.
@@ -135,6 +309,26 @@ class KeyValueStore(object):
                 yield k
                 memory.add(k)
 
+    def iter_stats(self, prefix=u""):
+        """Return an Iterator over ``(key, stat)`` pairs for all keys currently
+        in the store, in any order. *stat* is a :class:`~simplekv.KeyStat`, see
+        :meth:`~simplekv.KeyValueStore.stat`.
+
+        If prefix is not the empty string, iterates only over all keys starting
+        with prefix.
+
+        The default calls :meth:`~simplekv.KeyValueStore._stat` for every key.
+        Backends whose listings already carry the metadata return it directly.
+
+        :raises exceptions.IOError: If there was an error accessing the store.
+        """
+        for key in self.iter_keys(prefix):
+            try:
+                yield key, self._stat(key)
+            except KeyError:
+                # deleted while iterating
+                pass
+
     def keys(self, prefix=u""):
         """Return a list of keys currently in store, in any order
         If prefix is not the empty string, returns only all keys starting with prefix.
@@ -163,7 +357,11 @@ class KeyValueStore(object):
         Stores bytestring *data* in *key*.
 
         :param key: The key under which the data is to be stored
-        :param data: Data to be stored into key, must be `bytes`.
+        :param data: Data to be stored into key, must be `bytes` or another
+                     object supporting the buffer protocol, such as a
+                     `bytearray`, a `memoryview` or a numpy array. Those are
+                     stored without being copied to `bytes` first, where the
+                     backend allows it.
 
         :returns: The key under which data was stored
 
@@ -172,10 +370,59 @@ class KeyValueStore(object):
                                     be read
         """
         self._check_valid_key(key)
-        if not isinstance(data, bytes):
-            raise IOError("Provided data is not of type bytes")
+        data = _bytes_like(data)
         return self._put(key, data)
 
+    def put_iter(self, key, chunks):
+        """Store into key from an iterable of chunks
+
+        Stores the data yielded by *chunks*, which allows producers that
+        generate data incrementally to store it without buffering all of it
+        or writing it to a temporary file first. Backends stream the data
+        where possible, keeping memory usage constant regardless of the size
+        of the value.
+
+        If an error occurs during iteration, it depends on the backend whether
+        the key ends up holding incomplete data.
+
+        :param key: The key under which the data is to be stored
+        :param chunks: An iterable of `bytes` or other bytes-like objects, see
+                       :meth:`~simplekv.KeyValueStore.put`.
+
+        :returns: The key under which data was stored
+
+        :raises exceptions.ValueError: If the key is not valid.
+        :raises exceptions.IOError: If storing failed or any of the chunks is
+                                    not bytes-like.
+        """
+        self._check_valid_key(key)
+        return self._put_iter(key, (_bytes_like(chunk) for chunk in chunks))
+
+    def put_many(self, items):
+        """Store several values at once
+
+        Backends may implement this using a single request or transaction,
+        making it much faster than calling :meth:`~simplekv.KeyValueStore.put`
+        repeatedly. All keys and values are checked before anything is
+        stored.
+
+        :param items: A dictionary mapping keys to `bytes` (or other
+                      bytes-like objects, see
+                      :meth:`~simplekv.KeyValueStore.put`), or an iterable of
+                      ``(key, data)`` pairs.
+
+        :returns: A list of the keys under which data was stored
+
+        :raises exceptions.ValueError: If any of the keys is not valid.
+        :raises exceptions.IOError: If storing failed or any of the values is
+                                    not bytes-like.
+        """
+        items = _list_items(items)
+        for key, data in items:
+            self._check_valid_key(key)
+        items = [(key, _bytes_like(data)) for key, data in items]
+        return self._put_many(items)
+
     def put_file(self, key, file):
         """Store into key from file on disk
 
@@ -205,6 +452,21 @@ class KeyValueStore(object):
         else:
             return self._put_file(key, file)
 
+    def stat(self, key):
+        """Returns metadata of a value without retrieving it.
+
+        :param key: The key to look up
+
+        :returns: A :class:`~simplekv.KeyStat` holding the size, modification
+                  time and etag of the value.
+
+        :raises exceptions.ValueError: If the key is not valid.
+        :raises exceptions.IOError: If there was an error accessing the store.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        return self._stat(key)
+
     def _check_valid_key(self, key):
         """Checks if a key is valid and raises a ValueError if its not.
 
@@ -218,6 +480,27 @@ class KeyValueStore(object):
         if not VALID_KEY_RE.match(key):
             raise ValueError('%r contains illegal characters' % key)
 
+    def _check_valid_range(self, offset, length):
+        """Checks if a range given to :meth:`~simplekv.KeyValueStore.get_range`
+        is valid and raises a ValueError if its not.
+
+        :param offset: Start of the range
+        :param length: Length of the range or `None`
+        """
+        if offset < 0:
+            raise ValueError('offset must not be negative: %r' % offset)
+        if length is not None and length < 0:
+            raise ValueError('length must not be negative: %r' % length)
+
+    def _contains_many(self, keys):
+        """Implementation for :meth:`~simplekv.KeyValueStore.contains_many`.
+        The default implementation calls
+        :meth:`~simplekv.KeyValueStore._has_key` for every key.
+
+        :param keys: List of keys to check
+        """
+        return dict((key, bool(self._has_key(key))) for key in keys)
+
     def _delete(self, key):
         """Implementation for :meth:`~simplekv.KeyValueStore.delete`. The
         default implementation will simply raise a
@@ -225,6 +508,26 @@ class KeyValueStore(object):
         """
         raise NotImplementedError
 
+    def _delete_many(self, keys):
+        """Implementation for :meth:`~simplekv.KeyValueStore.delete_many`. The
+        default implementation calls :meth:`~simplekv.KeyValueStore._delete`
+        for every key.
+
+        :param keys: List of keys to delete
+        """
+        for key in keys:
+            self._delete(key)
+
+    def _delete_prefix(self, prefix):
+        """Implementation for :meth:`~simplekv.KeyValueStore.delete_prefix`.
+        The default implementation lists the matching keys using
+        :meth:`~simplekv.KeyValueStore.iter_keys` and deletes them with
+        :meth:`~simplekv.KeyValueStore._delete_many`.
+
+        :param prefix: Prefix of the keys to delete
+        """
+        self._delete_many(list(self.iter_keys(prefix)))
+
     def _get(self, key):
         """Implementation for :meth:`~simplekv.KeyValueStore.get`. The default
         implementation will create a :class:`io.BytesIO`-buffer and then call
@@ -249,20 +552,12 @@ class KeyValueStore(object):
         """
         bufsize = 1024 * 1024
 
-        # note: we do not use a context manager here or close the source.
-        # the source goes out of scope shortly after, taking care of the issue
-        # this allows us to support file-like objects without close as well,
-        # such as BytesIO.
-        source = self.open(key)
+        chunks = self._iter_chunks(key, bufsize)
         try:
-            while True:
-                buf = source.read(bufsize)
+            for buf in chunks:
                 file.write(buf)
-
-                if len(buf) < bufsize:
-                    break
         finally:
-            source.close()
+            chunks.close()
 
     def _get_filename(self, key, filename):
         """Write key to file. Either this method or
@@ -277,6 +572,75 @@ class KeyValueStore(object):
         with open(filename, 'wb') as dest:
             return self._get_file(key, dest)
 
+    def _get_into(self, key, buf):
+        """Implementation for :meth:`~simplekv.KeyValueStore.get_into`. The
+        default implementation calls
+        :meth:`~simplekv.KeyValueStore._get_file` with a file-like object that
+        writes into *buf*.
+
+        :param key: Key of the value to be read
+        :param buf: A writable :class:`memoryview` of bytes
+        """
+        writer = _BufferWriter(buf)
+        self._get_file(key, writer)
+        return writer.size
+
+    def _get_many(self, keys):
+        """Implementation for :meth:`~simplekv.KeyValueStore.get_many`. The
+        default implementation calls :meth:`~simplekv.KeyValueStore._get` for
+        every key.
+
+        :param keys: List of keys of the values to be retrieved
+        """
+        return dict((key, self._get(key)) for key in keys)
+
+    def _get_range(self, key, offset, length):
+        """Implementation for :meth:`~simplekv.KeyValueStore.get_range`. The
+        default implementation opens the key using
+        :meth:`~simplekv.KeyValueStore._open`, then seeks to *offset*.
+
+        :param key: Key of the value to be read
+        :param offset: Start of the range
+        :param length: Length of the range or `None`
+        """
+        source = self._open(key)
+        try:
+            source.seek(offset)
+            return source.read() if length is None else source.read(length)
+        finally:
+            source.close()
+
+    def _get_ranges(self, key, ranges):
+        """Implementation for :meth:`~simplekv.KeyValueStore.get_ranges`. The
+        default implementation merges overlapping and adjacent ranges, then
+        calls :meth:`~simplekv.KeyValueStore._get_range` once per merged
+        range.
+
+        :param key: Key of the value to be read
+        :param ranges: List of ``(offset, length)`` pairs
+        """
+        spans = []  # [start, end] pairs, an end of None means "until EOF"
+        for offset, length in sorted(ranges, key=lambda r: r[0]):
+            end = None if length is None else offset + length
+            if spans and (spans[-1][1] is None or offset <= spans[-1][1]):
+                last_end = spans[-1][1]
+                if last_end is not None and (end is None or end > last_end):
+                    spans[-1][1] = end
+            else:
+                spans.append([offset, end])
+
+        starts = [start for start, end in spans]
+        data = [self._get_range(key, start, None if end is None else end - start)
+                for start, end in spans]
+
+        rv = []
+        for offset, length in ranges:
+            i = bisect_right(starts, offset) - 1
+            pos = offset - starts[i]
+            rv.append(data[i][pos:] if length is None
+                      else data[i][pos:pos + length])
+        return rv
+
     def _has_key(self, key):
         """Default implementation for
         :meth:`~simplekv.KeyValueStore.__contains__`.
@@ -288,6 +652,21 @@ class KeyValueStore(object):
         """
         return key in self.keys()
 
+    def _iter_chunks(self, key, chunk_size):
+        """Implementation for :meth:`~simplekv.KeyValueStore.iter_chunks`. The
+        default implementation opens the key using
+        :meth:`~simplekv.KeyValueStore._open` and returns a generator reading
+        from it.
+
+        Note that this method itself must not be a generator, as the key is
+        expected to be looked up before it returns. It must return a generator
+        or another iterator that has a ``close()`` method, though.
+
+        :param key: Key of the value to be read
+        :param chunk_size: Maximum size of a chunk
+        """
+        return _read_chunks(self._open(key), chunk_size, close=True)
+
     def _open(self, key):
         """Open key for reading. Default implementation simply raises a
         :py:exc:`~exceptions.NotImplementedError`.
@@ -302,7 +681,10 @@ class KeyValueStore(object):
         :meth:`~simplekv.KeyValueStore._put_file`.
 
         :param key: Key under which data should be stored
-        :param data: Data to be stored
+        :param data: Data to be stored, either `bytes` or a one-dimensional
+                     :class:`memoryview` of bytes. A memoryview must not be
+                     kept around, as the caller may modify the underlying
+                     buffer later on.
         """
         return self._put_file(key, BytesIO(data))
 
@@ -335,6 +717,193 @@ class KeyValueStore(object):
         with open(filename, 'rb') as source:
             return self._put_file(key, source)
 
+    def _put_iter(self, key, chunks):
+        """Implementation for :meth:`~simplekv.KeyValueStore.put_iter`. The
+        default implementation wraps *chunks* in a file-like object and
+        calls :meth:`~simplekv.KeyValueStore._put_file`.
+
+        :param key: Key under which data should be stored
+        :param chunks: Iterator over the data to be stored, yielding `bytes`
+                       or one-dimensional :class:`memoryview` objects of bytes
+        """
+        return self._put_file(key, _IterReader(chunks))
+
+    def _put_many(self, items):
+        """Implementation for :meth:`~simplekv.KeyValueStore.put_many`. The
+        default implementation calls :meth:`~simplekv.KeyValueStore._put` for
+        every item.
+
+        :param items: List of ``(key, data)`` pairs to be stored
+        """
+        return [self._put(key, data) for key, data in items]
+
+    def _stat(self, key):
+        """Implementation for :meth:`~simplekv.KeyValueStore.stat`. The
+        default implementation retrieves the value using
+        :meth:`~simplekv.KeyValueStore._get` and only reports its size.
+
+        :param key: Key of the value to look up
+        """
+        return KeyStat(len(self._get(key)), None, None)
+
+
+def _list_items(items):
+    """Turns a dictionary or an iterable of ``(key, value)`` pairs into a list
+    of pairs."""
+    if hasattr(items, 'items'):
+        items = items.items()
+    return list(items)
+
+
+def _bytes_like(data):
+    """Returns *data* if it is `bytes`, otherwise a one-dimensional
+    :class:`memoryview` of bytes of it, without copying. On python 2, a copy
+    of *data* as `bytes` is returned instead.
+
+    :raises exceptions.IOError: If *data* does not support the buffer protocol,
+                                e.g. if it is a text string.
+    """
+    if isinstance(data, bytes):
+        return data
+
+    if PY2:
+        # memoryviews cannot be cast on python 2, and bytes() of one is its
+        # repr, so backends are passed a copy
+        if isinstance(data, text_type):
+            raise IOError("Provided data is not bytes-like")
+        try:
+            return memoryview(data).tobytes()
+        except TypeError:
+            pass
+        try:
+            # e.g. arrays, which only support the old buffer protocol
+            return bytes(buffer(data))
+        except TypeError:
+            raise IOError("Provided data is not bytes-like")
+
+    try:
+        view = memoryview(data)
+    except TypeError:
+        raise IOError("Provided data is not bytes-like")
+
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes())
+    elif view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    return view
+
+
+class _IterReader(object):
+    """A file-like object reading from an iterable of bytes-like chunks, as
+    passed to :meth:`~simplekv.KeyValueStore.put_iter`."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b''
+        self._pos = 0
+
+    def read(self, size=-1):
+        parts = [self._buf] if self._buf else []
+        n = len(self._buf)
+        while size is None or size < 0 or n < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            n += len(chunk)
+
+        # joining a single bytes object does not copy it
+        buf = b''.join(parts)
+        if size is None or size < 0 or size >= len(buf):
+            rv, self._buf = buf, b''
+        else:
+            rv, self._buf = buf[:size], buf[size:]
+        self._pos += len(rv)
+        return rv
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+
+def _read_chunks(file, chunk_size, close=False):
+    """Iterates over the data of a file-like object in chunks of at most
+    *chunk_size* bytes, closing it at the end if *close* is true."""
+    try:
+        while True:
+            buf = file.read(chunk_size)
+            if not buf:
+                break
+            yield buf
+    finally:
+        if close:
+            file.close()
+
+
+def _remaining(file):
+    """Returns the number of bytes left in *file*, or `None` if it cannot be
+    seeked."""
+    try:
+        pos = file.tell()
+        file.seek(0, io.SEEK_END)
+        end = file.tell()
+        file.seek(pos)
+    except (AttributeError, IOError, OSError, ValueError):
+        return None
+    return end - pos
+
+
+def _writable_view(buf):
+    """Returns a one-dimensional, writable :class:`memoryview` of bytes of
+    *buf*.
+
+    On python 2, memoryviews cannot be cast, so *buf* has to be a buffer of
+    bytes already."""
+    view = memoryview(buf)
+    if view.readonly:
+        raise ValueError('Buffer is not writable')
+    if view.format != 'B' or view.ndim != 1:
+        if PY2:
+            raise ValueError('Buffer is not a one-dimensional buffer of bytes')
+        view = view.cast('B')
+    return view
+
+
+class _BufferWriter(object):
+    """A seekable file-like object writing into a buffer of fixed size, as
+    returned by :func:`_writable_view`."""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+        self.size = 0
+
+    def write(self, data):
+        end = self.pos + len(data)
+        if end > len(self.buf):
+            raise ValueError('Buffer too small, need at least %d bytes' % end)
+
+        self.buf[self.pos:end] = data
+        self.pos = end
+        self.size = max(self.size, end)
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.pos
+        elif whence == 2:
+            offset += self.size
+        self.pos = offset
+        return self.pos
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
 
 class UrlMixin(object):
     """Supports getting a download URL for keys."""
@@ -420,8 +989,7 @@ class TimeToLiveMixin(object):
 
         """
         self._check_valid_key(key)
-        if not isinstance(data, bytes):
-            raise IOError("Provided data is not of type bytes")
+        data = _bytes_like(data)
         return self._put(key, data, self._valid_ttl(ttl_secs))
 
     def put_file(self, key, file, ttl_secs=None):
@@ -442,6 +1010,32 @@ class TimeToLiveMixin(object):
         else:
             return self._put_file(key, file, self._valid_ttl(ttl_secs))
 
+    def put_iter(self, key, chunks, ttl_secs=None):
+        """Like :meth:`~simplekv.KeyValueStore.put_iter`, but with an
+           additional parameter:
+
+           :param ttl_secs: Number of seconds until the key expires. See above
+                            for valid values.
+           :raises exceptions.ValueError: If ``ttl_secs`` is invalid.
+        """
+        self._check_valid_key(key)
+        return self._put_iter(key, (_bytes_like(chunk) for chunk in chunks),
+                              self._valid_ttl(ttl_secs))
+
+    def put_many(self, items, ttl_secs=None):
+        """Like :meth:`~simplekv.KeyValueStore.put_many`, but with an
+           additional parameter:
+
+           :param ttl_secs: Number of seconds until the keys expire. See above
+                            for valid values.
+           :raises exceptions.ValueError: If ``ttl_secs`` is invalid.
+        """
+        items = _list_items(items)
+        for key, data in items:
+            self._check_valid_key(key)
+        items = [(key, _bytes_like(data)) for key, data in items]
+        return self._put_many(items, self._valid_ttl(ttl_secs))
+
     # default implementations similar to KeyValueStore below:
     def _put(self, key, data, ttl_secs):
         return self._put_file(key, BytesIO(data), ttl_secs)
@@ -453,6 +1047,12 @@ class TimeToLiveMixin(object):
         with open(filename, 'rb') as source:
             return self._put_file(key, source, ttl_secs)
 
+    def _put_iter(self, key, chunks, ttl_secs):
+        return self._put_file(key, _IterReader(chunks), ttl_secs)
+
+    def _put_many(self, items, ttl_secs):
+        return [self._put(key, data, ttl_secs) for key, data in items]
+
 
 class UrlKeyValueStore(UrlMixin, KeyValueStore):
     """
@@ -57,3 +57,25 @@ else:
     key_type = basestring
     unichr = unichr
     binary_type = str
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        import os as _os
+
+        class _DirEntry(object):
+            def __init__(self, dirname, name):
+                self.name = name
+                self.path = _os.path.join(dirname, name)
+
+            def is_dir(self):
+                return _os.path.isdir(self.path)
+
+            def is_symlink(self):
+                return _os.path.islink(self.path)
+
+        def scandir(path):
+            return (_DirEntry(path, name) for name in _os.listdir(path))
@@ -0,0 +1,449 @@
+#!/usr/bin/env python
+# coding=utf8
+
+"""
+Asynchronous counterparts of the simplekv API, for use with :mod:`asyncio`.
+
+Any synchronous store can be used through :class:`ThreadPoolStore`, which runs
+every operation inside a bounded thread pool, keeping the event loop free:
+
+>>> import asyncio
+>>> from simplekv.memory import DictStore
+>>> from simplekv.aio import ThreadPoolStore
+>>>
+>>> store = ThreadPoolStore(DictStore())
+>>>
+>>> async def main():
+...     await store.put(u'key', b'value')
+...     return await store.get(u'key')
+>>>
+>>> print(asyncio.run(main()).decode())
+value
+"""
+
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from .. import KeyValueStore, TimeToLiveMixin, _bytes_like, _list_items
+
+
+async def _maybe_await(rv):
+    if inspect.isawaitable(rv):
+        return await rv
+    return rv
+
+
+class AsyncFile(object):
+    """Wraps a synchronous file-like object, making its methods awaitable.
+
+    If an *executor* is given, every call is run inside of it. Otherwise, the
+    methods are called directly, which is suitable for in-memory buffers.
+
+    :param file: The file-like object to wrap.
+    :param executor: An optional :class:`concurrent.futures.Executor`.
+    """
+
+    def __init__(self, file, executor=None):
+        self.file = file
+        self.executor = executor
+
+    async def _run(self, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+        return await asyncio.get_event_loop().run_in_executor(
+            self.executor, functools.partial(fn, *args))
+
+    async def read(self, size=-1):
+        return await self._run(self.file.read, size)
+
+    async def seek(self, offset, whence=0):
+        return await self._run(self.file.seek, offset, whence)
+
+    async def tell(self):
+        return await self._run(self.file.tell)
+
+    async def close(self):
+        return await self._run(self.file.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+class AsyncKeyValueStore(object):
+    """The asynchronous counterpart of :class:`~simplekv.KeyValueStore`.
+
+    All methods taking or returning data are coroutines, key iteration is done
+    using asynchronous iterators. Keys and values follow the same rules as for
+    :class:`~simplekv.KeyValueStore`. Since ``in`` cannot be awaited, the
+    existence of a key is checked using :meth:`contains`.
+
+    Wherever a file-like object is accepted, its ``read`` or ``write``
+    method may either be a regular method or a coroutine. File-like objects
+    returned by :meth:`open` have coroutine methods.
+    """
+
+    _check_valid_key = KeyValueStore._check_valid_key
+
+    def __aiter__(self):
+        """Iterate over keys
+
+        :raises exceptions.IOError: If there was an error accessing the store.
+        """
+        return self.iter_keys()
+
+    async def contains(self, key):
+        """Checks if a key is present
+
+        :param key: The key whose existence should be verified.
+
+        :raises exceptions.ValueError: If the key is not valid.
+        :raises exceptions.IOError: If there was an error accessing the store.
+
+        :returns: True if the key exists, False otherwise.
+        """
+        self._check_valid_key(key)
+        return await self._has_key(key)
+
+    async def contains_many(self, keys):
+        """See :meth:`simplekv.KeyValueStore.contains_many`."""
+        keys = list(keys)
+        for key in keys:
+            self._check_valid_key(key)
+        return await self._contains_many(keys)
+
+    async def delete(self, key):
+        """See :meth:`simplekv.KeyValueStore.delete`."""
+        self._check_valid_key(key)
+        return await self._delete(key)
+
+    async def delete_many(self, keys):
+        """See :meth:`simplekv.KeyValueStore.delete_many`."""
+        keys = list(keys)
+        for key in keys:
+            self._check_valid_key(key)
+        return await self._delete_many(keys)
+
+    async def get(self, key):
+        """See :meth:`simplekv.KeyValueStore.get`."""
+        self._check_valid_key(key)
+        return await self._get(key)
+
+    async def get_file(self, key, file):
+        """See :meth:`simplekv.KeyValueStore.get_file`."""
+        self._check_valid_key(key)
+        if isinstance(file, str):
+            return await self._get_filename(key, file)
+        else:
+            return await self._get_file(key, file)
+
+    async def get_many(self, keys):
+        """See :meth:`simplekv.KeyValueStore.get_many`."""
+        keys = list(keys)
+        for key in keys:
+            self._check_valid_key(key)
+        return await self._get_many(keys)
+
+    def iter_keys(self, prefix=u""):
+        """Return an asynchronous iterator over all keys currently in the
+        store, in any order.
+
+        If prefix is not the empty string, iterates only over all keys
+        starting with prefix.
+
+        :raises exceptions.IOError: If there was an error accessing the store.
+        """
+        raise NotImplementedError
+
+    async def iter_prefixes(self, delimiter, prefix=u""):
+        """See :meth:`simplekv.KeyValueStore.iter_prefixes`. Returns an
+        asynchronous iterator."""
+        dlen = len(delimiter)
+        plen = len(prefix)
+        memory = set()
+
+        async for k in self.iter_keys(prefix):
+            pos = k.find(delimiter, plen)
+            if pos >= 0:
+                k = k[: pos + dlen]
+
+            if k not in memory:
+                yield k
+                memory.add(k)
+
+    async def keys(self, prefix=u""):
+        """See :meth:`simplekv.KeyValueStore.keys`."""
+        return [k async for k in self.iter_keys(prefix)]
+
+    async def open(self, key):
+        """Open key for reading.
+
+        Returns a read-only file-like object whose ``read`` and ``close``
+        methods are coroutines.
+
+        :param key: Key to open
+
+        :raises exceptions.ValueError: If the key is not valid.
+        :raises exceptions.IOError: If the file could not be read.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        return await self._open(key)
+
+    async def put(self, key, data):
+        """See :meth:`simplekv.KeyValueStore.put`."""
+        self._check_valid_key(key)
+        data = _bytes_like(data)
+        return await self._put(key, data)
+
+    async def put_file(self, key, file):
+        """See :meth:`simplekv.KeyValueStore.put_file`."""
+        self._check_valid_key(key)
+        if isinstance(file, str):
+            return await self._put_filename(key, file)
+        else:
+            return await self._put_file(key, file)
+
+    async def put_many(self, items):
+        """See :meth:`simplekv.KeyValueStore.put_many`."""
+        items = _list_items(items)
+        for key, data in items:
+            self._check_valid_key(key)
+        items = [(key, _bytes_like(data)) for key, data in items]
+        return await self._put_many(items)
+
+    async def _contains_many(self, keys):
+        return dict([(key, bool(await self._has_key(key))) for key in keys])
+
+    async def _delete(self, key):
+        raise NotImplementedError
+
+    async def _delete_many(self, keys):
+        for key in keys:
+            await self._delete(key)
+
+    async def _get(self, key):
+        buf = BytesIO()
+
+        await self._get_file(key, buf)
+
+        return buf.getvalue()
+
+    async def _get_file(self, key, file):
+        bufsize = 1024 * 1024
+
+        source = await self.open(key)
+        try:
+            while True:
+                buf = await source.read(bufsize)
+                await _maybe_await(file.write(buf))
+
+                if len(buf) < bufsize:
+                    break
+        finally:
+            await source.close()
+
+    async def _get_filename(self, key, filename):
+        with open(filename, 'wb') as dest:
+            return await self._get_file(key, dest)
+
+    async def _get_many(self, keys):
+        return dict([(key, await self._get(key)) for key in keys])
+
+    async def _has_key(self, key):
+        return key in await self.keys()
+
+    async def _open(self, key):
+        raise NotImplementedError
+
+    async def _put(self, key, data):
+        return await self._put_file(key, BytesIO(data))
+
+    async def _put_file(self, key, file):
+        raise NotImplementedError
+
+    async def _put_filename(self, key, filename):
+        with open(filename, 'rb') as source:
+            return await self._put_file(key, source)
+
+    async def _put_many(self, items):
+        return [await self._put(key, data) for key, data in items]
+
+
+class AsyncTimeToLiveMixin(object):
+    """The asynchronous counterpart of :class:`~simplekv.TimeToLiveMixin`.
+
+    :meth:`put`, :meth:`put_file` and :meth:`put_many` take an additional
+    ``ttl_secs`` argument, which accepts the same values as with the
+    synchronous mixin.
+    """
+    ttl_support = True
+
+    default_ttl_secs = TimeToLiveMixin.default_ttl_secs
+
+    _valid_ttl = TimeToLiveMixin._valid_ttl
+
+    async def put(self, key, data, ttl_secs=None):
+        self._check_valid_key(key)
+        data = _bytes_like(data)
+        return await self._put(key, data, self._valid_ttl(ttl_secs))
+
+    async def put_file(self, key, file, ttl_secs=None):
+        self._check_valid_key(key)
+
+        if isinstance(file, str):
+            return await self._put_filename(key, file,
+                                            self._valid_ttl(ttl_secs))
+        else:
+            return await self._put_file(key, file, self._valid_ttl(ttl_secs))
+
+    async def put_many(self, items, ttl_secs=None):
+        items = _list_items(items)
+        for key, data in items:
+            self._check_valid_key(key)
+        items = [(key, _bytes_like(data)) for key, data in items]
+        return await self._put_many(items, self._valid_ttl(ttl_secs))
+
+    # default implementations similar to AsyncKeyValueStore below:
+    async def _put(self, key, data, ttl_secs):
+        return await self._put_file(key, BytesIO(data), ttl_secs)
+
+    async def _put_file(self, key, file, ttl_secs):
+        raise NotImplementedError
+
+    async def _put_filename(self, key, filename, ttl_secs):
+        with open(filename, 'rb') as source:
+            return await self._put_file(key, source, ttl_secs)
+
+    async def _put_many(self, items, ttl_secs):
+        return [await self._put(key, data, ttl_secs) for key, data in items]
+
+
+class _SyncFileBridge(object):
+    # gives code running in a worker thread blocking access to a file-like
+    # object with coroutine methods, by running them on the event loop
+    def __init__(self, file, loop):
+        self.file = file
+        self.loop = loop
+
+    def read(self, size=-1):
+        return asyncio.run_coroutine_threadsafe(
+            _maybe_await(self.file.read(size)), self.loop).result()
+
+    def write(self, data):
+        return asyncio.run_coroutine_threadsafe(
+            _maybe_await(self.file.write(data)), self.loop).result()
+
+
+def _is_async_method(file, name):
+    return asyncio.iscoroutinefunction(getattr(file, name, None))
+
+
+def _take(iterator, n):
+    rv = []
+    for item in iterator:
+        rv.append(item)
+        if len(rv) == n:
+            break
+    return rv
+
+
+class ThreadPoolStore(AsyncKeyValueStore):
+    """Makes a synchronous :class:`~simplekv.KeyValueStore` usable from
+    asynchronous code.
+
+    Every operation is run on a bounded thread pool, so the event loop is not
+    blocked while the store does I/O. The wrapped store checks keys itself,
+    which makes this work with mixins that alter the keyspace as well.
+    Additional arguments to :meth:`put`, :meth:`put_file` and
+    :meth:`put_many`, such as ``ttl_secs``, are passed on.
+
+    :param store: The synchronous store to wrap.
+    :param max_workers: The number of threads to use at most.
+    :param executor: An :class:`concurrent.futures.Executor` to use instead of
+                     creating a thread pool.
+    """
+    iter_batch_size = 1000
+    """Number of keys fetched from the wrapped store per thread pool call when
+    iterating."""
+
+    def __init__(self, store, max_workers=4, executor=None):
+        self.store = store
+        self.executor = executor or ThreadPoolExecutor(max_workers)
+
+    def __getattr__(self, attr):
+        # expose attributes such as ttl_support
+        store = object.__getattribute__(self, "store")
+        return getattr(store, attr)
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_event_loop().run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def contains(self, key):
+        return await self._run(self.store.__contains__, key)
+
+    async def contains_many(self, keys):
+        return await self._run(self.store.contains_many, list(keys))
+
+    async def delete(self, key):
+        return await self._run(self.store.delete, key)
+
+    async def delete_many(self, keys):
+        return await self._run(self.store.delete_many, list(keys))
+
+    async def get(self, key):
+        return await self._run(self.store.get, key)
+
+    async def get_file(self, key, file):
+        if _is_async_method(file, 'write'):
+            file = _SyncFileBridge(file, asyncio.get_event_loop())
+        return await self._run(self.store.get_file, key, file)
+
+    async def get_many(self, keys):
+        return await self._run(self.store.get_many, list(keys))
+
+    async def _iterate(self, fn, *args):
+        it = await self._run(fn, *args)
+        try:
+            while True:
+                batch = await self._run(_take, it, self.iter_batch_size)
+                for item in batch:
+                    yield item
+
+                if len(batch) < self.iter_batch_size:
+                    break
+        finally:
+            # releases cursors or connections when stopped early
+            if hasattr(it, 'close'):
+                await self._run(it.close)
+
+    def iter_keys(self, prefix=u""):
+        return self._iterate(self.store.iter_keys, prefix)
+
+    def iter_prefixes(self, delimiter, prefix=u""):
+        return self._iterate(self.store.iter_prefixes, delimiter, prefix)
+
+    async def keys(self, prefix=u""):
+        return await self._run(self.store.keys, prefix)
+
+    async def open(self, key):
+        return AsyncFile(await self._run(self.store.open, key), self.executor)
+
+    async def put(self, key, data, *args, **kwargs):
+        return await self._run(self.store.put, key, data, *args, **kwargs)
+
+    async def put_file(self, key, file, *args, **kwargs):
+        if _is_async_method(file, 'read'):
+            file = _SyncFileBridge(file, asyncio.get_event_loop())
+        return await self._run(self.store.put_file, key, file,
+                               *args, **kwargs)
+
+    async def put_many(self, items, *args, **kwargs):
+        return await self._run(self.store.put_many, _list_items(items),
+                               *args, **kwargs)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# coding=utf8
+
+from .decorator import AsyncStoreDecorator
+from .. import _list_items
+
+
+class AsyncCacheDecorator(AsyncStoreDecorator):
+    """The asynchronous counterpart of
+    :class:`~simplekv.cache.CacheDecorator`, combining two
+    :class:`~simplekv.aio.AsyncKeyValueStore` instances. Caching behaves
+    exactly like it does with the synchronous decorator.
+
+    :param cache: The caching backend.
+    :param store: The backing store. This is the "authorative" backend.
+    """
+    def __init__(self, cache, store):
+        super(AsyncCacheDecorator, self).__init__(store)
+        self.cache = cache
+
+    async def delete(self, key):
+        await self._dstore.delete(key)
+        await self.cache.delete(key)
+
+    async def delete_many(self, keys):
+        keys = list(keys)
+        await self._dstore.delete_many(keys)
+        await self.cache.delete_many(keys)
+
+    async def get(self, key):
+        try:
+            return await self.cache.get(key)
+        except KeyError:
+            # cache miss or error, retrieve from backend
+            data = await self._dstore.get(key)
+
+            # store in cache and return
+            await self.cache.put(key, data)
+            return data
+        except IOError:
+            # cache error, ignore completely and return from backend
+            return await self._dstore.get(key)
+
+    async def get_many(self, keys):
+        keys = list(keys)
+        try:
+            cached = await self.cache.contains_many(keys)
+            rv = await self.cache.get_many([k for k in keys if cached[k]])
+        except (KeyError, IOError):
+            return await self._dstore.get_many(keys)
+
+        missing = [k for k in keys if k not in rv]
+        if missing:
+            data = await self._dstore.get_many(missing)
+
+            await self.cache.put_many(data)
+            rv.update(data)
+        return rv
+
+    async def get_file(self, key, file):
+        try:
+            return await self.cache.get_file(key, file)
+        except KeyError:
+            # cache miss, load into cache
+            fp = await self._dstore.open(key)
+            try:
+                await self.cache.put_file(key, fp)
+            finally:
+                await fp.close()
+
+            # return from cache
+            return await self.cache.get_file(key, file)
+        # if an IOError occured, file pointer may be dirty - cannot proceed
+        # safely
+
+    async def open(self, key):
+        try:
+            return await self.cache.open(key)
+        except KeyError:
+            # cache miss, load into cache
+            fp = await self._dstore.open(key)
+            try:
+                await self.cache.put_file(key, fp)
+            finally:
+                await fp.close()
+
+            return await self.cache.open(key)
+        except IOError:
+            # cache error, ignore completely and return from backend
+            return await self._dstore.open(key)
+
+    async def put(self, key, data):
+        try:
+            return await self._dstore.put(key, data)
+        finally:
+            await self.cache.delete(key)
+
+    async def put_file(self, key, file):
+        try:
+            return await self._dstore.put_file(key, file)
+        finally:
+            await self.cache.delete(key)
+
+    async def put_many(self, items):
+        items = _list_items(items)
+        try:
+            return await self._dstore.put_many(items)
+        finally:
+            await self.cache.delete_many([key for key, data in items])
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import hashlib
+import hmac
+import os
+import tempfile
+
+from ..crypt import _HMACFileReader, VerificationException
+from .. import _list_items
+from . import _maybe_await
+from .decorator import AsyncStoreDecorator
+
+
+class _AsyncHMACFileReader(_HMACFileReader):
+    def __init__(self, hm, source, buffer):
+        # the buffer needs to be preloaded by the caller, as this cannot be
+        # awaited here
+        self.hm = hm
+        self.source = source
+        self.buffer = buffer
+
+        if not len(self.buffer) == self.hm.digest_size:
+            raise VerificationException('Source does not contain HMAC hash '
+                                        '(too small)')
+
+    async def read(self, n=None):
+        if n is not None and n < 0:
+            n = None
+
+        if b'' == self.buffer or 0 == n:
+            return b''
+
+        new_read = await (self.source.read(n) if n is not None
+                          else self.source.read())
+        return self._feed(new_read, n)
+
+    async def close(self):
+        await _maybe_await(self.source.close())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+class AsyncHMACDecorator(AsyncStoreDecorator):
+    """The asynchronous counterpart of :class:`~simplekv.crypt.HMACDecorator`.
+    Values are stored in the same format, so both decorators can be used on
+    the same data.
+    """
+
+    def __init__(self, secret_key, decorated_store, hashfunc=hashlib.sha256):
+        super(AsyncHMACDecorator, self).__init__(decorated_store)
+
+        self.__hashfunc = hashfunc
+        self.__secret_key = bytes(secret_key)
+
+    def __new_hmac(self, key, msg=None):
+        if not msg:
+            msg = b''
+
+        # item key is used as salt for secret_key
+        hm = hmac.HMAC(
+            key=key.encode('ascii') + self.__secret_key,
+            msg=msg,
+            digestmod=self.__hashfunc)
+
+        return hm
+
+    def __verify(self, key, buf):
+        hm = self.__new_hmac(key)
+        hash = buf[-hm.digest_size:]
+
+        # shorten buf
+        buf = buf[:-hm.digest_size]
+
+        hm.update(buf)
+
+        if not hm.digest() == hash:
+            raise VerificationException('Invalid hash on key %r' % key)
+
+        return buf
+
+    async def get(self, key):
+        return self.__verify(key, await self._dstore.get(key))
+
+    async def get_many(self, keys):
+        return dict((key, self.__verify(key, buf)) for key, buf in
+                    (await self._dstore.get_many(keys)).items())
+
+    async def get_file(self, key, file):
+        if isinstance(file, str):
+            try:
+                f = open(file, 'wb')
+            except (OSError, IOError) as e:
+                raise IOError('Error opening %s for writing: %r' % (
+                    file, e
+                ))
+
+            # file is open, now we call ourself again with a proper file
+            try:
+                await self.get_file(key, f)
+            finally:
+                f.close()
+        else:
+            # this will check the HMAC as well
+            source = await self.open(key)
+
+            bufsize = 1024 * 1024
+
+            try:
+                while True:
+                    buf = await source.read(bufsize)
+                    await _maybe_await(file.write(buf))
+
+                    if len(buf) != bufsize:
+                        break
+            finally:
+                await source.close()
+
+    async def open(self, key):
+        hm = self.__new_hmac(key)
+        source = await self._dstore.open(key)
+        try:
+            buffer = await source.read(hm.digest_size)
+            return _AsyncHMACFileReader(hm, source, buffer)
+        except BaseException:
+            await source.close()
+            raise
+
+    async def put(self, key, value, *args, **kwargs):
+        # just append hmac and put. join accepts any bytes-like value
+        data = b''.join([value, self.__new_hmac(key, value).digest()])
+        return await self._dstore.put(key, data, *args, **kwargs)
+
+    async def put_many(self, items, *args, **kwargs):
+        return await self._dstore.put_many(
+            [(key, b''.join([value, self.__new_hmac(key, value).digest()]))
+             for key, value in _list_items(items)],
+            *args, **kwargs)
+
+    async def put_file(self, key, file, *args, **kwargs):
+        hm = self.__new_hmac(key)
+        bufsize = 1024 * 1024
+
+        if isinstance(file, str):
+            # see HMACDecorator.put_file
+            with open(file, 'rb+') as source:
+                while True:
+                    buf = source.read(bufsize)
+                    hm.update(buf)
+
+                    if len(buf) < bufsize:
+                        break
+
+                # file has been read, append hash
+                source.write(hm.digest())
+
+            # after the file has been closed, hand it over
+            return await self._dstore.put_file(key, file, *args, **kwargs)
+        else:
+            tmpfile = tempfile.NamedTemporaryFile(delete=False)
+            try:
+                while True:
+                    buf = await _maybe_await(file.read(bufsize))
+                    hm.update(buf)
+                    tmpfile.write(buf)
+
+                    if len(buf) < bufsize:
+                        break
+
+                tmpfile.write(hm.digest())
+                tmpfile.close()
+
+                return await self._dstore.put_file(
+                    key, tmpfile.name, *args, **kwargs
+                )
+            finally:
+                try:
+                    os.unlink(tmpfile.name)
+                except OSError as e:
+                    if 2 != e.errno:
+                        raise  # otherwise, the file has been moved already
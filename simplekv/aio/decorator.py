@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding=utf8
+from ..decorator import PrefixDecorator
+from .. import _list_items
+
+
+class AsyncStoreDecorator(object):
+    """Base class for decorators of an
+    :class:`~simplekv.aio.AsyncKeyValueStore`. Works like
+    :class:`~simplekv.decorator.StoreDecorator`.
+    """
+
+    def __init__(self, store):
+        self._dstore = store
+
+    def __getattr__(self, attr):
+        store = object.__getattribute__(self, "_dstore")
+        return getattr(store, attr)
+
+    def __aiter__(self, *args, **kwargs):
+        return self._dstore.__aiter__(*args, **kwargs)
+
+
+class AsyncKeyTransformingDecorator(AsyncStoreDecorator):
+    # see KeyTransformingDecorator
+    def _map_key(self, key):
+        return key
+
+    def _map_key_prefix(self, key_prefix):
+        return key_prefix
+
+    def _unmap_key(self, key):
+        return key
+
+    def _filter(self, key):
+        return True
+
+    def __aiter__(self):
+        return self.iter_keys()
+
+    async def contains(self, key):
+        return await self._dstore.contains(self._map_key(key))
+
+    async def contains_many(self, keys):
+        mapped = dict((self._map_key(k), k) for k in keys)
+        return dict((mapped[k], v) for k, v in
+                    (await self._dstore.contains_many(list(mapped))).items())
+
+    async def delete(self, key):
+        return await self._dstore.delete(self._map_key(key))
+
+    async def delete_many(self, keys):
+        return await self._dstore.delete_many([self._map_key(k) for k in keys])
+
+    async def get(self, key, *args, **kwargs):
+        return await self._dstore.get(self._map_key(key), *args, **kwargs)
+
+    async def get_file(self, key, *args, **kwargs):
+        return await self._dstore.get_file(self._map_key(key), *args, **kwargs)
+
+    async def get_many(self, keys):
+        mapped = dict((self._map_key(k), k) for k in keys)
+        return dict((mapped[k], v) for k, v in
+                    (await self._dstore.get_many(list(mapped))).items())
+
+    async def iter_keys(self, prefix=u""):
+        async for k in self._dstore.iter_keys(self._map_key_prefix(prefix)):
+            if self._filter(k):
+                yield self._unmap_key(k)
+
+    async def iter_prefixes(self, delimiter, prefix=u""):
+        dlen = len(delimiter)
+        plen = len(prefix)
+        memory = set()
+
+        async for k in self.iter_keys(prefix):
+            pos = k.find(delimiter, plen)
+            if pos >= 0:
+                k = k[: pos + dlen]
+
+            if k not in memory:
+                yield k
+                memory.add(k)
+
+    async def keys(self, prefix=u""):
+        return [k async for k in self.iter_keys(prefix)]
+
+    async def open(self, key):
+        return await self._dstore.open(self._map_key(key))
+
+    async def put(self, key, *args, **kwargs):
+        return self._unmap_key(
+            await self._dstore.put(self._map_key(key), *args, **kwargs))
+
+    async def put_file(self, key, *args, **kwargs):
+        return self._unmap_key(
+            await self._dstore.put_file(self._map_key(key), *args, **kwargs))
+
+    async def put_many(self, items, *args, **kwargs):
+        items = [(self._map_key(k), v) for k, v in _list_items(items)]
+        return [self._unmap_key(k) for k in
+                await self._dstore.put_many(items, *args, **kwargs)]
+
+
+class AsyncPrefixDecorator(AsyncKeyTransformingDecorator):
+    """The asynchronous counterpart of
+    :class:`~simplekv.decorator.PrefixDecorator`.
+
+    :param store: The store to pass keys on to.
+    :param prefix: Prefix to add.
+    """
+
+    def __init__(self, prefix, store):
+        super(AsyncPrefixDecorator, self).__init__(store)
+        self.prefix = prefix
+
+    # mapping keys works exactly like in the synchronous decorator
+    _filter = PrefixDecorator._filter
+    _map_key = PrefixDecorator._map_key
+    _map_key_prefix = PrefixDecorator._map_key_prefix
+    _unmap_key = PrefixDecorator._unmap_key
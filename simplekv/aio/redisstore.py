@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from io import BytesIO
+import re
+
+from .. import NOT_SET, FOREVER
+from . import AsyncKeyValueStore, AsyncTimeToLiveMixin, AsyncFile, _maybe_await
+
+
+class AsyncRedisStore(AsyncTimeToLiveMixin, AsyncKeyValueStore):
+    """Uses a redis-database as the backend, through the natively asynchronous
+    client in :mod:`redis.asyncio`.
+
+    :param redis: An instance of :py:class:`redis.asyncio.Redis`.
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def _delete(self, key):
+        return await self.redis.delete(key)
+
+    async def _delete_many(self, keys):
+        if keys:
+            await self.redis.delete(*keys)
+
+    async def keys(self, prefix=u""):
+        return [b.decode() for b in
+                await self.redis.keys(pattern=re.escape(prefix) + '*')]
+
+    async def iter_keys(self, prefix=u""):
+        for key in await self.keys(prefix):
+            yield key
+
+    async def _has_key(self, key):
+        return bool(await self.redis.exists(key))
+
+    async def _contains_many(self, keys):
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.exists(key)
+        return dict(
+            (key, bool(found)) for key, found in zip(keys, await pipe.execute())
+        )
+
+    async def _get(self, key):
+        val = await self.redis.get(key)
+
+        if val is None:
+            raise KeyError(key)
+        return val
+
+    async def _get_many(self, keys):
+        if not keys:
+            return {}
+
+        rv = {}
+        for key, val in zip(keys, await self.redis.mget(keys)):
+            if val is None:
+                raise KeyError(key)
+            rv[key] = val
+        return rv
+
+    async def _get_file(self, key, file):
+        await _maybe_await(file.write(await self._get(key)))
+
+    async def _open(self, key):
+        return AsyncFile(BytesIO(await self._get(key)))
+
+    async def _put(self, key, value, ttl_secs):
+        await self._set(self.redis, key, value, ttl_secs)
+        return key
+
+    async def _put_many(self, items, ttl_secs):
+        if not items:
+            pass
+        elif ttl_secs in (NOT_SET, FOREVER):
+            # like SET, MSET clears any timeout
+            await self.redis.mset(dict(items))
+        else:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in items:
+                self._set_ttl(pipe, key, value, ttl_secs)
+            await pipe.execute()
+        return [key for key, value in items]
+
+    async def _set(self, redis, key, value, ttl_secs):
+        if ttl_secs in (NOT_SET, FOREVER):
+            # see RedisStore._set
+            await redis.set(key, value)
+        else:
+            await self._set_ttl(redis, key, value, ttl_secs)
+
+    def _set_ttl(self, redis, key, value, ttl_secs):
+        # returns an awaitable, unless redis is a pipeline
+        ittl = None
+        try:
+            ittl = int(ttl_secs)
+        except ValueError:
+            pass  # let it blow up further down
+
+        if ittl == ttl_secs:
+            return redis.setex(key, ittl, value)
+        else:
+            return redis.psetex(key, int(ttl_secs * 1000), value)
+
+    async def _put_file(self, key, file, ttl_secs):
+        await self._put(key, await _maybe_await(file.read()), ttl_secs)
+        return key
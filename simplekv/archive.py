@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import io
+import mmap
+import struct
+import tarfile
+import time
+import zipfile
+import zlib
+from bisect import bisect_left
+
+from . import KeyValueStore, KeyStat
+from ._compat import PY2, text_type
+
+# signature, versions, flags, method, time, date, crc32, sizes and the
+# lengths of the name and the extra field of a local file header
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+
+
+class _SliceFile(io.RawIOBase):
+    """A read-only, seekable file reading the range *start* to *end* of
+    *buf* without copying it first."""
+
+    def __init__(self, buf, start, end):
+        self._buf = buf
+        self._start = start
+        self._end = end
+        self._pos = start
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(min(len(b), self._end - self._pos), 0)
+        b[:n] = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def tell(self):
+        return self._pos - self._start
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence == io.SEEK_END:
+            offset += self._end - self._start
+        if offset < 0:
+            raise ValueError('Negative seek position %d' % offset)
+        self._pos = self._start + offset
+        return offset
+
+
+class _ArchiveStore(KeyValueStore):
+    """Serves the members of an archive from a memory map of it.
+
+    Subclasses fill ``_members`` with a ``(data offset, stored size, size,
+    compressed, crc32, mtime)`` tuple per key.
+    """
+
+    def __init__(self, path):
+        super(_ArchiveStore, self).__init__()
+        self.path = path
+        self._file = io.open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            self._members = dict((k, v) for k, v in self._read_index().items()
+                                 if self._is_valid_key(k))
+        except BaseException:
+            self._file.close()
+            raise
+        # for prefix listings
+        self._keys = sorted(self._members)
+
+    def _read_index(self):
+        raise NotImplementedError
+
+    def _is_valid_key(self, name):
+        # members that could not be read with their name are not listed
+        try:
+            self._check_valid_key(name)
+        except ValueError:
+            return False
+        return True
+
+    def close(self):
+        """Closes the archive."""
+        self._map.close()
+        self._file.close()
+
+    def _member(self, key):
+        try:
+            return self._members[key]
+        except KeyError:
+            raise KeyError(key)
+
+    def _get(self, key):
+        offset, stored, size, compressed, crc, _ = self._member(key)
+        data = self._map[offset:offset + stored]
+        if compressed:
+            data = zlib.decompress(data, -15)
+        if crc is not None and zlib.crc32(data) & 0xffffffff != crc:
+            raise IOError('Checksum mismatch reading %r' % key)
+        return data
+
+    def _get_range(self, key, offset, length):
+        # get_range() returns bytes, which copies the range out of the map,
+        # but only the range; open_mmap() returns views without copying
+        start, stored, size, compressed, _, _ = self._member(key)
+        if compressed:
+            data = self._get(key)
+            return data[offset:] if length is None \
+                else data[offset:offset + length]
+
+        end = start + size
+        if length is not None:
+            end = min(end, start + offset + length)
+        return self._map[min(start + offset, end):end]
+
+    def _has_key(self, key):
+        return key in self._members
+
+    def _open(self, key):
+        offset, _, size, compressed, _, _ = self._member(key)
+        if compressed:
+            return io.BytesIO(self._get(key))
+        return _SliceFile(self._map, offset, offset + size)
+
+    def _stat(self, key):
+        _, _, size, _, crc, mtime = self._member(key)
+        return KeyStat(size, mtime, None if crc is None else '%08x' % crc)
+
+    def open_mmap(self, key):
+        """Returns a read-only :class:`memoryview` of the value for *key*.
+
+        Members stored without compression are mapped from the archive
+        without copying them, compressed members are decompressed. Slicing the
+        view reads ranges of a member without copying them, unlike
+        :meth:`~simplekv.KeyValueStore.get_range`, which returns a copy of the
+        range.
+
+        On Python 2, where memory maps do not support memoryviews, stored
+        members are copied out of the map instead.
+
+        :param key: The key to be read
+
+        :raises exceptions.ValueError: If the key is not valid.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        offset, _, size, compressed, _, _ = self._member(key)
+        if compressed:
+            return memoryview(self._get(key))
+        if not size:
+            return memoryview(b'')
+        if PY2:
+            return memoryview(self._map[offset:offset + size])
+
+        # a mapping of its own, the archive can be closed while it is used
+        start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        m = mmap.mmap(self._file.fileno(), offset - start + size,
+                      offset=start, access=mmap.ACCESS_READ)
+        return memoryview(m)[offset - start:]
+
+    def iter_keys(self, prefix=u""):
+        """Iterates over the keys starting with *prefix*, in sorted order."""
+        for i in range(bisect_left(self._keys, prefix), len(self._keys)):
+            key = self._keys[i]
+            if not key.startswith(prefix):
+                return
+            yield key
+
+
+class ZipStore(_ArchiveStore):
+    """A read-only store serving the members of a zip archive.
+
+    The central directory is read once when the store is opened. Members
+    stored without compression are read straight from a memory map of the
+    archive, deflated members are decompressed in one go. Directories,
+    members using other compression methods or encryption and members whose
+    names are not valid keys are not listed.
+
+    :meth:`~simplekv.KeyValueStore.get_range` copies only the requested range
+    of stored members out of the map into a new bytestring, use
+    :meth:`open_mmap` to access them without any copy.
+
+    Member names usually contain slashes, use the
+    :class:`~simplekv.contrib.ExtendedKeyspaceMixin` to read them::
+
+        class ArchiveStore(ExtendedKeyspaceMixin, ZipStore):
+            pass
+    """
+
+    def __init__(self, path):
+        """Open the zip archive *path*.
+
+        :param path: the name of the archive
+        """
+        super(ZipStore, self).__init__(path)
+
+    def _read_index(self):
+        members = {}
+        with zipfile.ZipFile(self._file) as z:
+            infos = z.infolist()
+
+        for info in infos:
+            if info.filename.endswith('/') or info.flag_bits & 0x1:
+                continue
+            if info.compress_type not in (zipfile.ZIP_STORED,
+                                          zipfile.ZIP_DEFLATED):
+                continue
+
+            header = _ZIP_LOCAL_HEADER.unpack_from(self._map,
+                                                   info.header_offset)
+            if header[0] != b'PK\x03\x04':
+                raise IOError('Invalid local header for %r' % info.filename)
+            offset = info.header_offset + _ZIP_LOCAL_HEADER.size + \
+                header[-2] + header[-1]
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+
+            name = info.filename
+            if not isinstance(name, text_type):
+                # python 2 leaves names not flagged as utf-8 undecoded
+                name = name.decode('cp437')
+            members[name] = (
+                offset, info.compress_size, info.file_size,
+                info.compress_type == zipfile.ZIP_DEFLATED, info.CRC, mtime)
+        return members
+
+
+class TarStore(_ArchiveStore):
+    """A read-only store serving the regular files of an uncompressed tar
+    archive.
+
+    The headers of all members are read once when the store is opened, after
+    which members are read straight from a memory map of the archive. As a
+    compressed tar archive can only be read front to back, it needs to be
+    decompressed first.
+
+    Like for the :class:`ZipStore`, member names containing slashes need the
+    :class:`~simplekv.contrib.ExtendedKeyspaceMixin`, members whose names are
+    not valid keys are not listed, and
+    :meth:`~simplekv.KeyValueStore.get_range` copies the requested range,
+    while :meth:`open_mmap` does not.
+    """
+
+    def __init__(self, path):
+        """Open the tar archive *path*.
+
+        :param path: the name of the archive
+        """
+        super(TarStore, self).__init__(path)
+
+    def _read_index(self):
+        members = {}
+        with tarfile.open(fileobj=self._file, mode='r:') as t:
+            for info in t:
+                if info.isfile() and not info.issparse():
+                    name = info.name
+                    if not isinstance(name, text_type):
+                        # undecoded on python 2
+                        name = name.decode('utf-8', 'replace')
+                    # later members replace earlier ones, like when extracting
+                    members[name] = (info.offset_data, info.size,
+                                     info.size, False, None,
+                                     float(info.mtime))
+        return members
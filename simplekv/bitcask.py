@@ -0,0 +1,652 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import contextlib
+import errno
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    # not available on windows
+    fcntl = None
+
+from . import KeyValueStore, KeyStat, CopyMixin, _read_chunks, _remaining
+from ._compat import BytesIO, ifilter, PY2
+from .fs import _fdatasync, _replace
+
+_pread = getattr(os, 'pread', None)
+
+# crc32, sequence number, timestamp, key length and value length of a record,
+# followed by the key and the value. the crc covers everything after itself
+_HEADER = struct.Struct('>IQdHI')
+_CRC = struct.Struct('>I')
+
+# sequence number, value offset, value length, timestamp and key length of a
+# record in a hint file, followed by the key
+_HINT = struct.Struct('>QQIdH')
+
+# the value length of a record marking a deleted key
+_TOMBSTONE = 0xffffffff
+
+
+def _record_size(key_length, size):
+    if size == _TOMBSTONE:
+        size = 0
+    return _HEADER.size + key_length + size
+
+
+if PY2:
+    def _tail(data, start):
+        # zlib does not accept memoryviews on python 2
+        return buffer(data, start)
+else:
+    def _tail(data, start):
+        return memoryview(data)[start:]
+
+
+def _key_length(key):
+    return len(key.encode('utf-8'))
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _scan(filename):
+    """Yields the records of the segment *filename* as ``(key, seq, offset,
+    size, timestamp)`` tuples, up to the first incomplete or corrupt record,
+    which is what an interrupted write leaves behind."""
+    with io.open(filename, 'rb') as f:
+        offset = 0
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            crc, seq, timestamp, key_length, size = _HEADER.unpack(header)
+            n = key_length + (0 if size == _TOMBSTONE else size)
+            body = f.read(n)
+            if len(body) < n:
+                return
+            if zlib.crc32(body, zlib.crc32(header[_CRC.size:])) & \
+                    0xffffffff != crc:
+                return
+
+            offset += _HEADER.size + key_length
+            yield (body[:key_length].decode('utf-8'), seq, offset, size,
+                   timestamp)
+            offset += n - key_length
+
+
+def _read_hints(filename):
+    with io.open(filename, 'rb') as f:
+        data = f.read()
+
+    pos = 0
+    while pos < len(data):
+        seq, offset, size, timestamp, key_length = _HINT.unpack_from(data, pos)
+        pos += _HINT.size
+        key = data[pos:pos + key_length].decode('utf-8')
+        pos += key_length
+        yield key, seq, offset, size, timestamp
+
+
+class BitcaskStore(KeyValueStore, CopyMixin):
+    """Store values by appending them to segment files in a directory, after
+    the design of `Bitcask <https://riak.com/assets/bitcask-intro.pdf>`_.
+
+    All keys are kept in memory, each pointing to the segment and offset of
+    its value, so that reading a value needs a single ``pread()`` and writing
+    one a single ``write()``. This is much cheaper than creating a file per
+    value for large numbers of small values, at the cost of memory for the
+    keys and of rewriting segments to reclaim the space of values that have
+    been overwritten or deleted.
+
+    Values are checked against the checksum of their record when they are
+    read. :meth:`~simplekv.KeyValueStore.get_range` reads only the requested
+    bytes, ranged reads are not verified.
+
+    Only one :class:`BitcaskStore` may use a directory at a time, a second
+    one raises an :exc:`IOError`. :meth:`close` releases the directory.
+    """
+
+    def __init__(self, path, max_segment_size=64 * 1024 * 1024, sync=False,
+                 compact_ratio=0.5):
+        """Open or create a store in the directory *path*.
+
+        New values are appended to the active segment, until it grows beyond
+        *max_segment_size* bytes and a new one is started. When a segment is
+        closed, a hint file holding the keys and offsets of its records is
+        written next to it, which is read instead of the whole segment when
+        the store is opened again.
+
+        With *sync*, every write is flushed to disk before it returns.
+        Otherwise, a crash may lose the latest writes, but never corrupts
+        values written before.
+
+        Once at least *compact_ratio* of the bytes in the closed segments
+        belong to values that have been overwritten or deleted, the segments
+        are compacted in a background thread, see :meth:`compact`. `None`
+        disables automatic compaction.
+
+        :param path: the directory for the segments
+        :param max_segment_size: size in bytes after which a new segment is
+                                 started
+        :param sync: flush every write to disk
+        :param compact_ratio: fraction of dead bytes that triggers compaction
+        """
+        super(BitcaskStore, self).__init__()
+        self.path = path
+        self.max_segment_size = max_segment_size
+        self.sync = sync
+        self.compact_ratio = compact_ratio
+        self.bufsize = 1024 * 1024
+
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+
+        # key -> (seq, segment, value offset, value size, timestamp)
+        self._keydir = {}
+        # segment -> file opened for reading
+        self._segments = {}
+        # file -> number of reads using it, and files of removed segments
+        # that are closed once the last of them is done
+        self._readers = {}
+        self._retired = set()
+        # segment -> bytes written and bytes of values still in the keydir
+        self._sizes = {}
+        self._live = {}
+
+        self._closed = False
+        self._seq = 0
+        self._next_segment = 0
+        self._active = None
+        self._fd = None
+        # records of the active segment, written to its hint file
+        self._hints = []
+
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            if not os.path.isdir(path):
+                raise e
+
+        self._lockfile = self._acquire_lock()
+        try:
+            self._finish_compaction()
+            self._load()
+        except BaseException:
+            os.close(self._lockfile)
+            raise
+
+    def _filename(self, segment, ext):
+        return os.path.join(self.path, '%010d.%s' % (segment, ext))
+
+    def _acquire_lock(self):
+        fd = os.open(os.path.join(self.path, 'LOCK'), os.O_RDWR | os.O_CREAT,
+                     0o666)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                os.close(fd)
+                raise IOError('%s is used by another store' % self.path)
+        return fd
+
+    def _finish_compaction(self):
+        """Removes the segments replaced by a compaction that was interrupted
+        after its new segments had been written."""
+        manifest = os.path.join(self.path, 'MERGE')
+        try:
+            with io.open(manifest, 'r') as f:
+                segments = [int(line) for line in f if line.strip()]
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return
+
+        self._remove_segments(segments)
+        os.unlink(manifest)
+
+    def _remove_segments(self, segments):
+        for segment in segments:
+            for ext in ('data', 'hint'):
+                try:
+                    os.unlink(self._filename(segment, ext))
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+
+    def _load(self):
+        segments = sorted(int(name[:-5]) for name in os.listdir(self.path)
+                          if name.endswith('.data'))
+
+        for segment in segments:
+            filename = self._filename(segment, 'data')
+            if os.path.exists(self._filename(segment, 'hint')):
+                records = _read_hints(self._filename(segment, 'hint'))
+            else:
+                # the active segment when the store was not closed
+                records = list(_scan(filename))
+                self._write_hints(segment, records)
+
+            for key, seq, offset, size, timestamp in records:
+                entry = self._keydir.get(key)
+                if entry is None or entry[0] < seq:
+                    self._keydir[key] = (seq, segment, offset, size,
+                                         timestamp)
+                self._seq = max(self._seq, seq)
+
+            self._segments[segment] = io.FileIO(filename, 'rb')
+            self._sizes[segment] = os.path.getsize(filename)
+            self._live[segment] = 0
+            self._next_segment = segment + 1
+
+        # the latest record of a key may be a deletion
+        for key, entry in list(self._keydir.items()):
+            if entry[3] == _TOMBSTONE:
+                del self._keydir[key]
+            else:
+                self._live[entry[1]] += _record_size(_key_length(key),
+                                                     entry[3])
+
+    def _write_hints(self, segment, records):
+        chunks = []
+        for key, seq, offset, size, timestamp in records:
+            k = key.encode('utf-8')
+            chunks.append(_HINT.pack(seq, offset, size, timestamp, len(k)))
+            chunks.append(k)
+
+        # a partially written hint file is never read
+        filename = self._filename(segment, 'hint')
+        tmp = filename + '.tmp'
+        with io.open(tmp, 'wb') as f:
+            f.write(b''.join(chunks))
+            if self.sync:
+                f.flush()
+                _fdatasync(f.fileno())
+        _replace(tmp, filename)
+
+    def _new_segment(self):
+        """Creates an empty segment and returns its number and a file
+        descriptor to append to it. Must be called with the lock held."""
+        segment = self._next_segment
+        self._next_segment += 1
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        fd = os.open(self._filename(segment, 'data'),
+                     flags | getattr(os, 'O_BINARY', 0), 0o666)
+        return segment, fd
+
+    def _rotate(self):
+        """Closes the active segment and starts a new one. Must be called
+        with the lock held."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._write_hints(self._active, self._hints)
+            self._hints = []
+
+        segment, self._fd = self._new_segment()
+        self._segments[segment] = io.FileIO(self._filename(segment, 'data'),
+                                            'rb')
+        self._sizes[segment] = 0
+        self._live[segment] = 0
+        self._active = segment
+
+        if self.compact_ratio is not None and self._needs_compaction():
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self.compact)
+                self._compactor.daemon = True
+                self._compactor.start()
+
+    def _needs_compaction(self):
+        closed = [s for s in self._sizes if s != self._active]
+        total = sum(self._sizes[s] for s in closed)
+        dead = total - sum(self._live[s] for s in closed)
+        return total > 0 and dead >= total * self.compact_ratio
+
+    def _check_open(self):
+        """Raises an :exc:`IOError` once the store is closed. Must be called
+        with the lock held."""
+        if self._closed:
+            raise IOError('%s is closed' % self.path)
+
+    def _append(self, items):
+        """Appends a record for every ``(key, data)`` pair of *items* with a
+        single write, a *data* of `None` deletes the key."""
+        with self._lock:
+            self._check_open()
+            if self._fd is None or \
+                    self._sizes[self._active] >= self.max_segment_size:
+                self._rotate()
+
+            segment = self._active
+            offset = self._sizes[segment]
+            timestamp = time.time()
+            chunks = []
+            entries = []
+            for key, data in items:
+                if data is None:
+                    # nothing to delete
+                    if key not in self._keydir:
+                        continue
+                    size = _TOMBSTONE
+                    data = b''
+                else:
+                    size = len(data)
+
+                k = key.encode('utf-8')
+                self._seq += 1
+                rest = _HEADER.pack(0, self._seq, timestamp, len(k),
+                                    size)[_CRC.size:]
+                crc = zlib.crc32(data, zlib.crc32(k, zlib.crc32(rest)))
+                chunks.extend((_CRC.pack(crc & 0xffffffff), rest, k, data))
+
+                offset += _HEADER.size + len(k)
+                entries.append((key, len(k), (self._seq, segment, offset,
+                                              size, timestamp)))
+                offset += len(data)
+
+            if not chunks:
+                return
+
+            _write_all(self._fd, b''.join(chunks))
+            if self.sync:
+                _fdatasync(self._fd)
+            self._sizes[segment] = offset
+
+            for key, key_length, entry in entries:
+                self._hints.append((key,) + entry[:1] + entry[2:])
+                self._discard(key)
+                if entry[3] != _TOMBSTONE:
+                    self._keydir[key] = entry
+                    self._live[segment] += _record_size(key_length, entry[3])
+
+    def _discard(self, key):
+        """Removes *key* from the keydir, with the lock held."""
+        entry = self._keydir.pop(key, None)
+        if entry is not None and entry[1] in self._live:
+            self._live[entry[1]] -= _record_size(_key_length(key), entry[3])
+
+    @contextlib.contextmanager
+    def _locate(self, key):
+        """Yields the keydir entry of *key* and the file of its segment,
+        which stays open even if the segment is compacted meanwhile."""
+        with self._lock:
+            self._check_open()
+            try:
+                entry = self._keydir[key]
+            except KeyError:
+                raise KeyError(key)
+            f = self._segments[entry[1]]
+            self._readers[f] = self._readers.get(f, 0) + 1
+        try:
+            yield entry, f
+        finally:
+            with self._lock:
+                n = self._readers.pop(f) - 1
+                if n:
+                    self._readers[f] = n
+                elif f in self._retired:
+                    self._retired.remove(f)
+                    f.close()
+
+    def _read(self, segment, n, offset):
+        if _pread is None:
+            with self._lock:
+                segment.seek(offset)
+                return segment.read(n)
+        return _pread(segment.fileno(), n, offset)
+
+    def _read_record(self, key, entry, segment):
+        _, _, offset, size, _ = entry
+        start = offset - _HEADER.size - _key_length(key)
+        record = self._read(segment, offset + size - start, start)
+        crc, = _CRC.unpack_from(record)
+        if zlib.crc32(_tail(record, _CRC.size)) & 0xffffffff != crc:
+            raise IOError('Checksum mismatch reading %r' % key)
+        return record
+
+    def compact(self):
+        """Rewrites the values still in use from all segments but the active
+        one into new segments and removes the old segments, reclaiming the
+        space of values that have been overwritten or deleted.
+
+        Reads and writes continue while compacting. A compaction that is
+        interrupted is either finished or discarded when the store is opened
+        again.
+        """
+        with self._compact_lock:
+            with self._lock:
+                self._check_open()
+                old = sorted(s for s in self._segments if s != self._active)
+            if not old:
+                return
+
+            moved = []
+            written = []
+            out, f_out, hints, size = None, None, [], 0
+            try:
+                for segment in old:
+                    f = self._segments[segment]
+                    for key, seq, offset, _, _ in _read_hints(
+                            self._filename(segment, 'hint')):
+                        entry = self._keydir.get(key)
+                        if entry is None or entry[1:3] != (segment, offset):
+                            continue
+                        record = self._read_record(key, entry, f)
+
+                        if out is None or size >= self.max_segment_size:
+                            if out is not None:
+                                self._close_output(out, f_out, hints)
+                            with self._lock:
+                                out, fd = self._new_segment()
+                            f_out = io.open(fd, 'wb')
+                            written.append(out)
+                            hints, size = [], 0
+
+                        f_out.write(record)
+                        new = (seq, out, size + len(record) - entry[3],
+                               entry[3], entry[4])
+                        hints.append((key,) + new[:1] + new[2:])
+                        moved.append((key, entry, new, len(record)))
+                        size += len(record)
+
+                if out is not None:
+                    self._close_output(out, f_out, hints)
+            except BaseException:
+                if f_out is not None:
+                    f_out.close()
+                self._remove_segments(written)
+                raise
+
+            with self._lock:
+                for segment in written:
+                    filename = self._filename(segment, 'data')
+                    self._segments[segment] = io.FileIO(filename, 'rb')
+                    self._sizes[segment] = os.path.getsize(filename)
+                    self._live[segment] = 0
+                for key, entry, new, n in moved:
+                    # unless overwritten or deleted while compacting
+                    if self._keydir.get(key) == entry:
+                        self._keydir[key] = new
+                        self._live[new[1]] += n
+                for segment in old:
+                    # readers may still use the file, it is closed by the
+                    # last of them
+                    f = self._segments.pop(segment)
+                    if f in self._readers:
+                        self._retired.add(f)
+                    else:
+                        f.close()
+                    del self._sizes[segment]
+                    del self._live[segment]
+
+            # the new segments are complete, the old ones are removed when
+            # the store is opened again, should the removal be interrupted
+            manifest = os.path.join(self.path, 'MERGE')
+            with io.open(manifest + '.tmp', 'w') as f:
+                f.write(u''.join(u'%d\n' % s for s in old))
+                f.flush()
+                _fdatasync(f.fileno())
+            _replace(manifest + '.tmp', manifest)
+            self._remove_segments(old)
+            os.unlink(manifest)
+
+    def _close_output(self, segment, f, hints):
+        # always durable, as the old segments are removed afterwards
+        f.flush()
+        _fdatasync(f.fileno())
+        f.close()
+        self._write_hints(segment, hints)
+
+    def close(self):
+        """Waits for a running compaction, writes the hint file of the active
+        segment and releases the directory. Reading or writing afterwards
+        raises an :exc:`IOError`."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+        with self._compact_lock, self._lock:
+            self._closed = True
+            if self._fd is not None:
+                os.close(self._fd)
+                self._write_hints(self._active, self._hints)
+                self._fd = None
+                self._active = None
+                self._hints = []
+            for f in list(self._segments.values()) + list(self._retired):
+                f.close()
+            self._segments.clear()
+            self._retired.clear()
+            if self._lockfile is not None:
+                os.close(self._lockfile)
+                self._lockfile = None
+
+    def _delete(self, key):
+        self._append([(key, None)])
+
+    def _delete_many(self, keys):
+        self._append([(key, None) for key in keys])
+
+    def _get(self, key):
+        with self._locate(key) as (entry, segment):
+            record = self._read_record(key, entry, segment)
+        return record[len(record) - entry[3]:]
+
+    def _get_range(self, key, offset, length):
+        # only the requested bytes are read, without checking the crc
+        with self._locate(key) as (entry, segment):
+            size = entry[3]
+            if offset >= size:
+                return b''
+            if length is None or offset + length > size:
+                length = size - offset
+            return self._read(segment, length, entry[2] + offset)
+
+    def _has_key(self, key):
+        return key in self._keydir
+
+    def _open(self, key):
+        return BytesIO(self._get(key))
+
+    def _copy(self, source, dest):
+        self._append([(dest, self._get(source))])
+        return dest
+
+    def _move(self, source, dest):
+        data = self._get(source)
+        if source != dest:
+            self._append([(dest, data), (source, None)])
+        return dest
+
+    def _put(self, key, data):
+        self._append([(key, data)])
+        return key
+
+    def _put_file(self, key, file):
+        size = _remaining(file)
+        if size is None or size >= _TOMBSTONE:
+            # the size is needed up front, for the header of the record
+            return self._put(key, b''.join(_read_chunks(file, self.bufsize)))
+
+        k = key.encode('utf-8')
+        with self._lock:
+            self._check_open()
+            if self._fd is None or \
+                    self._sizes[self._active] >= self.max_segment_size:
+                self._rotate()
+
+            segment = self._active
+            start = self._sizes[segment]
+            timestamp = time.time()
+            self._seq += 1
+            rest = _HEADER.pack(0, self._seq, timestamp, len(k),
+                                size)[_CRC.size:]
+
+            # the value is streamed after a zero crc, which is filled in
+            # last. until then, the record is seen as an interrupted write
+            crc = zlib.crc32(k, zlib.crc32(rest))
+            try:
+                _write_all(self._fd, b''.join((_CRC.pack(0), rest, k)))
+                remaining = size
+                while remaining:
+                    chunk = file.read(min(remaining, self.bufsize))
+                    if not chunk:
+                        raise IOError('File was truncated while reading')
+                    _write_all(self._fd, chunk)
+                    crc = zlib.crc32(chunk, crc)
+                    remaining -= len(chunk)
+                self._write_crc(segment, start, crc & 0xffffffff)
+            except BaseException:
+                # later records must not follow a corrupt one
+                os.ftruncate(self._fd, start)
+                raise
+
+            if self.sync:
+                _fdatasync(self._fd)
+
+            offset = start + _HEADER.size + len(k)
+            entry = (self._seq, segment, offset, size, timestamp)
+            self._sizes[segment] = offset + size
+            self._hints.append((key,) + entry[:1] + entry[2:])
+            self._discard(key)
+            self._keydir[key] = entry
+            self._live[segment] += _record_size(len(k), size)
+        return key
+
+    def _write_crc(self, segment, offset, crc):
+        # the active segment is opened for appending, which ignores offsets
+        fd = os.open(self._filename(segment, 'data'),
+                     os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            _write_all(fd, _CRC.pack(crc))
+        finally:
+            os.close(fd)
+
+    def _put_many(self, items):
+        self._append(items)
+        return [key for key, _ in items]
+
+    def _stat(self, key):
+        with self._lock:
+            self._check_open()
+            try:
+                entry = self._keydir[key]
+            except KeyError:
+                raise KeyError(key)
+        return KeyStat(entry[3], entry[4], '%x' % entry[0])
+
+    def iter_keys(self, prefix=u""):
+        with self._lock:
+            keys = list(self._keydir)
+        return ifilter(lambda k: k.startswith(prefix), keys)
@@ -2,6 +2,7 @@
 # coding=utf8
 
 from .decorator import StoreDecorator
+from . import _list_items
 
 
 class CacheDecorator(StoreDecorator):
@@ -36,6 +37,25 @@ class CacheDecorator(StoreDecorator):
         self._dstore.delete(key)
         self.cache.delete(key)
 
+    def delete_many(self, keys):
+        """Implementation of :meth:`~simplekv.KeyValueStore.delete_many`.
+
+        If an exception occurs in either the cache or backing store, all are
+        passing on.
+        """
+        keys = list(keys)
+        self._dstore.delete_many(keys)
+        self.cache.delete_many(keys)
+
+    def delete_prefix(self, prefix):
+        """Implementation of :meth:`~simplekv.KeyValueStore.delete_prefix`.
+
+        If an exception occurs in either the cache or backing store, all are
+        passing on.
+        """
+        self._dstore.delete_prefix(prefix)
+        self.cache.delete_prefix(prefix)
+
     def get(self, key):
         """Implementation of :meth:`~simplekv.KeyValueStore.get`.
 
@@ -61,6 +81,33 @@ class CacheDecorator(StoreDecorator):
             # cache error, ignore completely and return from backend
             return self._dstore.get(key)
 
+    def get_many(self, keys):
+        """Implementation of :meth:`~simplekv.KeyValueStore.get_many`.
+
+        Keys found in the cache are read from it, all others are retrieved
+        from the backing store in a single call and then stored in the cache.
+
+        If the cache raises an :exc:`~exceptions.IOError`, the cache is
+        ignored, and the backing store is consulted directly.
+        """
+        keys = list(keys)
+        try:
+            cached = self.cache.contains_many(keys)
+            rv = self.cache.get_many([k for k in keys if cached[k]])
+        except (KeyError, IOError):
+            # cache error or a key vanished from the cache in the meantime,
+            # ignore completely and return from backend
+            return self._dstore.get_many(keys)
+
+        missing = [k for k in keys if k not in rv]
+        if missing:
+            data = self._dstore.get_many(missing)
+
+            # store in cache and return
+            self.cache.put_many(data)
+            rv.update(data)
+        return rv
+
     def get_file(self, key, file):
         """Implementation of :meth:`~simplekv.KeyValueStore.get_file`.
 
@@ -86,6 +133,61 @@ class CacheDecorator(StoreDecorator):
         # if an IOError occured, file pointer may be dirty - cannot proceed
         # safely
 
+    def get_into(self, key, buf):
+        """Implementation of :meth:`~simplekv.KeyValueStore.get_into`.
+
+        If a cache miss occurs, the value is retrieved, stored in the cache,
+        then read from the cache into *buf*.
+
+        If the cache raises an :exc:`~exceptions.IOError`, the cache is
+        ignored, and the backing store is consulted directly.
+
+        It is possible for a caching error to occur while attempting to store
+        the value in the cache. It will not be handled as well.
+        """
+        try:
+            return self.cache.get_into(key, buf)
+        except KeyError:
+            # cache miss, load into cache
+            fp = self._dstore.open(key)
+            try:
+                self.cache.put_file(key, fp)
+            finally:
+                fp.close()
+
+            return self.cache.get_into(key, buf)
+        except IOError:
+            # cache error, ignore completely and read from backend. buf is
+            # overwritten from the start, so partial writes do not matter
+            return self._dstore.get_into(key, buf)
+
+    def iter_chunks(self, key, chunk_size=1024 * 1024):
+        """Implementation of :meth:`~simplekv.KeyValueStore.iter_chunks`.
+
+        If a cache miss occurs, the value is streamed into the cache, then
+        the chunks are read from the cache.
+
+        If the cache raises an :exc:`~exceptions.IOError`, the cache is
+        ignored, and the backing store is consulted directly.
+
+        It is possible for a caching error to occur while attempting to store
+        the value in the cache. It will not be handled as well.
+        """
+        try:
+            return self.cache.iter_chunks(key, chunk_size)
+        except KeyError:
+            # cache miss, load into cache
+            fp = self._dstore.open(key)
+            try:
+                self.cache.put_file(key, fp)
+            finally:
+                fp.close()
+
+            return self.cache.iter_chunks(key, chunk_size)
+        except IOError:
+            # cache error, ignore completely and return from backend
+            return self._dstore.iter_chunks(key, chunk_size)
+
     def open(self, key):
         """Implementation of :meth:`~simplekv.KeyValueStore.open`.
 
@@ -146,3 +248,28 @@ class CacheDecorator(StoreDecorator):
             return self._dstore.put_file(key, file)
         finally:
             self.cache.delete(key)
+
+    def put_iter(self, key, chunks):
+        """Implementation of :meth:`~simplekv.KeyValueStore.put_iter`.
+
+        Will store the value in the backing store. After a successful or
+        unsuccessful store, the cache will be invalidated by deleting the key
+        from it.
+        """
+        try:
+            return self._dstore.put_iter(key, chunks)
+        finally:
+            self.cache.delete(key)
+
+    def put_many(self, items):
+        """Implementation of :meth:`~simplekv.KeyValueStore.put_many`.
+
+        Will store the values in the backing store. After a successful or
+        unsuccessful store, the cache will be invalidated by deleting the keys
+        from it.
+        """
+        items = _list_items(items)
+        try:
+            return self._dstore.put_many(items)
+        finally:
+            self.cache.delete_many([key for key, data in items])
@@ -3,10 +3,9 @@
 
 import hashlib
 import hmac
-import os
-import tempfile
 
 from .decorator import StoreDecorator
+from . import _list_items, _read_chunks, _writable_view, _BufferWriter
 
 
 class _HMACFileReader(object):
@@ -25,6 +24,9 @@ class _HMACFileReader(object):
             return b''
 
         new_read = self.source.read(n) if n is not None else self.source.read()
+        return self._feed(new_read, n)
+
+    def _feed(self, new_read, n):
         finished = (n is None or len(new_read) != n)
         self.buffer += new_read
 
@@ -55,6 +57,37 @@ class _HMACFileReader(object):
         self.close()
 
 
+def _append_hmac(hm, chunks):
+    """Passes on the data of *chunks*, followed by its hash."""
+    for chunk in chunks:
+        hm.update(chunk)
+        yield chunk
+    yield hm.digest()
+
+
+def _verify_chunks(hm, chunks):
+    """Passes on the data of *chunks*, except for the trailing hash, which is
+    checked once all chunks have been read."""
+    tail = b''
+    try:
+        for chunk in chunks:
+            buf = tail + chunk
+            offset = max(0, len(buf) - hm.digest_size)
+            rv, tail = buf[:offset], buf[offset:]
+
+            if rv:
+                hm.update(rv)
+                yield rv
+    finally:
+        chunks.close()
+
+    if not len(tail) == hm.digest_size:
+        raise VerificationException('Source does not contain HMAC hash '
+                                    '(too small)')
+    if not tail == hm.digest():
+        raise VerificationException('HMAC verification failed.')
+
+
 class VerificationException(Exception):
     """This exception is thrown whenever there was an error with an
     authenticity check performed by any of the decorators in this module."""
@@ -74,18 +107,24 @@ class HMACDecorator(StoreDecorator):
     stored therefore takes up an additional ``hmac_digestsize`` bytes.
 
     Upon retrieval using any of :meth:`.KeyValueStore.get`,
-    :meth:`.KeyValueStore.get_file` or :meth:`.KeyValueStore.open` methods, the
-    data is checked as soon as the hash is readable. Since hashes are stored at
-    the end, almost no extra memory is used when using streaming methods.
-    However, :meth:`.KeyValueStore.get_file` and :meth:`.KeyValueStore.open`
-    will only check the hash value once it is read, that is, at the end of the
-    retrieval.
+    :meth:`.KeyValueStore.get_file`, :meth:`.KeyValueStore.iter_chunks` or
+    :meth:`.KeyValueStore.open` methods, the data is checked as soon as the
+    hash is readable. Since hashes are stored at the end, almost no extra
+    memory is used when using streaming methods. However,
+    :meth:`.KeyValueStore.get_file`, :meth:`.KeyValueStore.iter_chunks` and
+    :meth:`.KeyValueStore.open` will only check the hash value once it is
+    read, that is, at the end of the retrieval.
 
     The decorator will protect against any modification of the stored data and
     ensures that only those with knowledge of the ``__secret_key``
     can alter any data. The key used to store data is also used to extend the
     HMAC secret key, making it impossible to copy a valid message over to a
     different key.
+
+    :meth:`.KeyValueStore.stat` and :meth:`.KeyValueStore.iter_stats` report
+    the size of the original data, without the hash. Since the hash covers the
+    whole value, :meth:`.KeyValueStore.get_range` and
+    :meth:`.KeyValueStore.get_ranges` retrieve and check all of it.
     """
 
     def __init__(self, secret_key, decorated_store, hashfunc=hashlib.sha256):
@@ -106,8 +145,7 @@ class HMACDecorator(StoreDecorator):
 
         return hm
 
-    def get(self, key):
-        buf = self._dstore.get(key)
+    def __verify(self, key, buf):
         hm = self.__new_hmac(key)
         hash = buf[-hm.digest_size:]
 
@@ -121,6 +159,35 @@ class HMACDecorator(StoreDecorator):
 
         return buf
 
+    def get(self, key):
+        return self.__verify(key, self._dstore.get(key))
+
+    def get_many(self, keys):
+        return dict((key, self.__verify(key, buf))
+                    for key, buf in self._dstore.get_many(keys).items())
+
+    def get_into(self, key, buf):
+        # like get_file, the hash is checked once all data has been written
+        writer = _BufferWriter(_writable_view(buf))
+        self.get_file(key, writer)
+        return writer.size
+
+    def get_range(self, key, offset, length=None):
+        return self.get_ranges(key, [(offset, length)])[0]
+
+    def get_ranges(self, key, ranges):
+        ranges = list(ranges)
+        for offset, length in ranges:
+            self._check_valid_range(offset, length)
+
+        data = self.get(key)
+        return [data[offset:] if length is None
+                else data[offset:offset + length] for offset, length in ranges]
+
+    def open_mmap(self, key):
+        # a mapping of the stored data would bypass the verification
+        return memoryview(self.get(key))
+
     def get_file(self, key, file):
         if isinstance(file, str):
             try:
@@ -136,29 +203,42 @@ class HMACDecorator(StoreDecorator):
             finally:
                 f.close()
         else:
-            # need to use open, no way around it it seems
             # this will check the HMAC as well
-            source = self.open(key)
-
-            bufsize = 1024 * 1024
+            chunks = self.iter_chunks(key)
+            try:
+                for buf in chunks:
+                    file.write(buf)
+            finally:
+                chunks.close()
 
-            # copy
-            while True:
-                buf = source.read(bufsize)
-                file.write(buf)
+    def iter_chunks(self, key, chunk_size=1024 * 1024):
+        hm = self.__new_hmac(key)
+        return _verify_chunks(hm, self._dstore.iter_chunks(key, chunk_size))
 
-                if len(buf) != bufsize:
-                    break
+    def iter_stats(self, prefix=u""):
+        digest_size = self.__hashfunc().digest_size
+        return ((key, stat._replace(size=stat.size - digest_size))
+                for key, stat in self._dstore.iter_stats(prefix))
 
     def open(self, key):
         source = self._dstore.open(key)
         return _HMACFileReader(self.__new_hmac(key), source)
 
     def put(self, key, value, *args, **kwargs):
-        # just append hmac and put
-        data = value + self.__new_hmac(key, value).digest()
+        # just append hmac and put. join accepts any bytes-like value
+        data = b''.join([value, self.__new_hmac(key, value).digest()])
         return self._dstore.put(key, data, *args, **kwargs)
 
+    def put_many(self, items, *args, **kwargs):
+        return self._dstore.put_many(
+            [(key, b''.join([value, self.__new_hmac(key, value).digest()]))
+             for key, value in _list_items(items)],
+            *args, **kwargs)
+
+    def stat(self, key):
+        stat = self._dstore.stat(key)
+        return stat._replace(size=stat.size - self.__hashfunc().digest_size)
+
     def copy(self, source, dest):
         raise NotImplementedError
 
@@ -183,21 +263,12 @@ class HMACDecorator(StoreDecorator):
             # after the file has been closed, hand it over
             return self._dstore.put_file(key, file, *args, **kwargs)
         else:
-            tmpfile = tempfile.NamedTemporaryFile(delete=False)
-            try:
-                while True:
-                    buf = file.read(bufsize)
-                    hm.update(buf)
-                    tmpfile.write(buf)
-
-                    if len(buf) < bufsize:
-                        break
-
-                tmpfile.write(hm.digest())
-                tmpfile.close()
-
-                return self._dstore.put_file(
-                    key, tmpfile.name, *args, **kwargs
-                )
-            finally:
-                os.unlink(tmpfile.name)
+            return self._dstore.put_iter(
+                key, _append_hmac(hm, _read_chunks(file, bufsize)),
+                *args, **kwargs
+            )
+
+    def put_iter(self, key, chunks, *args, **kwargs):
+        return self._dstore.put_iter(
+            key, _append_hmac(self.__new_hmac(key), chunks), *args, **kwargs
+        )
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import contextlib
+from io import BytesIO
+
+from .. import KeyValueStore, KeyStat, CopyMixin
+from ..fs import _successor
+
+# keys listed per read transaction, which are kept short, as long-lived
+# readers keep LMDB from reusing pages
+_BATCH_SIZE = 1000
+
+
+def _encode(key):
+    return key.encode('utf-8')
+
+
+@contextlib.contextmanager
+def map_lmdb_exceptions():
+    """Map lmdb-specific exceptions to the simplekv-API."""
+    import lmdb
+    try:
+        yield
+    except lmdb.BadValsizeError as e:
+        # e.g. a key longer than the maximum key size of the environment
+        raise ValueError(str(e))
+    except lmdb.Error as e:
+        raise IOError(str(e))
+
+
+class LMDBStore(KeyValueStore, CopyMixin):
+    """Stores data in an `LMDB <http://www.lmdb.tech/doc/>`_ database.
+
+    Reads run in read-only transactions on the memory map of the database,
+    writes of several keys (:meth:`~simplekv.KeyValueStore.put_many`,
+    :meth:`~simplekv.KeyValueStore.delete_many`, ...) in a single write
+    transaction. Keys are kept in sorted order, listings and prefixes use
+    cursors.
+
+    :param env: An :class:`lmdb.Environment`, e.g. from :func:`lmdb.open`.
+    :param db: A named database of *env*, or `None` for the main database.
+    """
+
+    def __init__(self, env, db=None):
+        self.env = env
+        self.db = db
+
+    @contextlib.contextmanager
+    def _read(self):
+        with map_lmdb_exceptions(), \
+                self.env.begin(db=self.db, buffers=True) as txn:
+            yield txn
+
+    @contextlib.contextmanager
+    def _write(self):
+        # errors when committing are mapped as well
+        with map_lmdb_exceptions(), \
+                self.env.begin(db=self.db, write=True) as txn:
+            yield txn
+
+    @contextlib.contextmanager
+    def view(self, key):
+        """Returns a context manager yielding a read-only
+        :class:`memoryview` of the value for *key*, which points into the
+        memory map of the database.
+
+        No data is copied, but the view is only valid inside the
+        ``with``-block, which holds a read transaction open::
+
+            with store.view(u'key') as value:
+                header = bytes(value[:16])
+
+        :param key: The key to be read
+
+        :raises exceptions.ValueError: If the key is not valid.
+        :raises exceptions.IOError: If the value could not be read.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        with self._read() as txn:
+            value = txn.get(_encode(key))
+            if value is None:
+                raise KeyError(key)
+            yield value
+
+    def _has_key(self, key):
+        with self._read() as txn:
+            return txn.get(_encode(key)) is not None
+
+    def _contains_many(self, keys):
+        with self._read() as txn:
+            return dict((key, txn.get(_encode(key)) is not None)
+                        for key in keys)
+
+    def _delete(self, key):
+        with self._write() as txn:
+            txn.delete(_encode(key))
+
+    def _delete_many(self, keys):
+        with self._write() as txn:
+            for key in keys:
+                txn.delete(_encode(key))
+
+    def _delete_prefix(self, prefix):
+        p = _encode(prefix)
+        with self._write() as txn:
+            cursor = txn.cursor()
+            if not cursor.set_range(p):
+                return
+            # deleting moves the cursor to the next key
+            while cursor.key().startswith(p):
+                if not cursor.delete():
+                    break
+
+    def _get(self, key):
+        with self._read() as txn:
+            value = txn.get(_encode(key))
+            if value is None:
+                raise KeyError(key)
+            return bytes(value)
+
+    def _get_into(self, key, buf):
+        with self._read() as txn:
+            value = txn.get(_encode(key))
+            if value is None:
+                raise KeyError(key)
+            if len(value) > len(buf):
+                raise ValueError('Buffer too small, need %d bytes' %
+                                 len(value))
+            buf[:len(value)] = value
+            return len(value)
+
+    def _get_many(self, keys):
+        rv = {}
+        with self._read() as txn:
+            for key in keys:
+                value = txn.get(_encode(key))
+                if value is None:
+                    raise KeyError(key)
+                rv[key] = bytes(value)
+        return rv
+
+    def _get_range(self, key, offset, length):
+        with self._read() as txn:
+            value = txn.get(_encode(key))
+            if value is None:
+                raise KeyError(key)
+            end = None if length is None else offset + length
+            return bytes(value[offset:end])
+
+    def _open(self, key):
+        return BytesIO(self._get(key))
+
+    def _copy(self, source, dest):
+        with self._write() as txn:
+            value = txn.get(_encode(source))
+            if value is None:
+                raise KeyError(source)
+            txn.put(_encode(dest), value)
+        return dest
+
+    def _move(self, source, dest):
+        with self._write() as txn:
+            value = txn.get(_encode(source))
+            if value is None:
+                raise KeyError(source)
+            if source != dest:
+                txn.put(_encode(dest), value)
+                txn.delete(_encode(source))
+        return dest
+
+    def _put(self, key, data):
+        with self._write() as txn:
+            txn.put(_encode(key), data)
+        return key
+
+    def _put_file(self, key, file):
+        return self._put(key, file.read())
+
+    def _put_many(self, items):
+        with self._write() as txn:
+            for key, data in items:
+                txn.put(_encode(key), data)
+        return [key for key, data in items]
+
+    def _stat(self, key):
+        with self._read() as txn:
+            value = txn.get(_encode(key))
+            if value is None:
+                raise KeyError(key)
+            return KeyStat(len(value), None, None)
+
+    def _iter_items(self, prefix):
+        """Yields the keys starting with *prefix* and the lengths of their
+        values, in sorted order."""
+        p = _encode(prefix)
+        lower, skip = p, False
+        while True:
+            batch = []
+            with self._read() as txn:
+                cursor = txn.cursor()
+                if not cursor.set_range(lower):
+                    return
+                for k, value in cursor:
+                    k = bytes(k)
+                    if skip and k == lower:
+                        continue
+                    if not k.startswith(p):
+                        break
+                    batch.append((k, len(value)))
+                    if len(batch) == _BATCH_SIZE:
+                        break
+
+            for k, size in batch:
+                yield k.decode('utf-8'), size
+            if len(batch) < _BATCH_SIZE:
+                return
+            # continues after the last key in a new transaction
+            lower, skip = batch[-1][0], True
+
+    def iter_keys(self, prefix=u""):
+        return (key for key, _ in self._iter_items(prefix))
+
+    def iter_stats(self, prefix=u""):
+        return ((key, KeyStat(size, None, None))
+                for key, size in self._iter_items(prefix))
+
+    def iter_prefixes(self, delimiter, prefix=u""):
+        # skips over all keys below a prefix once it has been found
+        lower = prefix
+        while lower is not None:
+            with self._read() as txn:
+                cursor = txn.cursor()
+                if not cursor.set_range(_encode(lower)):
+                    return
+                key = bytes(cursor.key()).decode('utf-8')
+            if not key.startswith(prefix):
+                return
+
+            pos = key.find(delimiter, len(prefix))
+            if pos < 0:
+                yield key
+                lower = key + u'\0'
+            else:
+                key = key[:pos + len(delimiter)]
+                yield key
+                lower = _successor(key)
@@ -6,6 +6,7 @@ from .._compat import BytesIO
 
 from .._compat import pickle
 from bson.binary import Binary
+from pymongo import UpdateOne
 import re
 
 
@@ -23,9 +24,17 @@ class MongoStore(KeyValueStore):
     def _has_key(self, key):
         return self.db[self.collection].count_documents({"_id": key}) > 0
 
+    def _contains_many(self, keys):
+        found = set(item["_id"] for item in self.db[self.collection].find(
+            {"_id": {"$in": keys}}, projection={"_id": True}))
+        return dict((key, key in found) for key in keys)
+
     def _delete(self, key):
         return self.db[self.collection].delete_one({"_id": key})
 
+    def _delete_many(self, keys):
+        return self.db[self.collection].delete_many({"_id": {"$in": keys}})
+
     def _get(self, key):
         try:
             item = next(self.db[self.collection].find({"_id": key}))
@@ -33,16 +42,36 @@ class MongoStore(KeyValueStore):
         except StopIteration:
             raise KeyError(key)
 
+    def _get_many(self, keys):
+        rv = {}
+        for item in self.db[self.collection].find({"_id": {"$in": keys}}):
+            rv[item["_id"]] = pickle.loads(item["v"])
+
+        for key in keys:
+            if key not in rv:
+                raise KeyError(key)
+        return rv
+
     def _open(self, key):
         return BytesIO(self._get(key))
 
     def _put(self, key, value):
         self.db[self.collection].update_one(
             {"_id": key},
-            {"$set": {"v": Binary(pickle.dumps(value))}},
+            {"$set": {"v": Binary(pickle.dumps(bytes(value)))}},
             upsert=True)
         return key
 
+    def _put_many(self, items):
+        if items:
+            self.db[self.collection].bulk_write([
+                UpdateOne({"_id": key},
+                          {"$set": {"v": Binary(pickle.dumps(bytes(value)))}},
+                          upsert=True)
+                for key, value in items
+            ])
+        return [key for key, value in items]
+
     def _put_file(self, key, file):
         return self._put(key, file.read())
 
@@ -4,9 +4,26 @@
 from io import BytesIO
 
 from .._compat import imap, text_type
-from .. import KeyValueStore, CopyMixin
+from .. import KeyValueStore, KeyStat, CopyMixin
 
-from sqlalchemy import Table, Column, String, LargeBinary, select, exists
+from sqlalchemy import Table, Column, String, LargeBinary, select, exists, \
+    func
+
+# some databases limit the number of parameters in a single statement, e.g.
+# older versions of SQLite allow at most 999
+_BATCH_SIZE = 500
+
+
+def _batches(seq):
+    for i in range(0, len(seq), _BATCH_SIZE):
+        yield seq[i:i + _BATCH_SIZE]
+
+
+def _starts_with(column, prefix):
+    # _ and % are wildcards in LIKE patterns, but valid in keys
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%') \
+        .replace('_', '\\_')
+    return column.like(escaped + '%', escape='\\')
 
 
 class SQLAlchemyStore(KeyValueStore, CopyMixin):
@@ -26,11 +43,31 @@ class SQLAlchemyStore(KeyValueStore, CopyMixin):
             select([exists().where(self.table.c.key == key)])
         ).scalar()
 
+    def _contains_many(self, keys):
+        found = set()
+        for batch in _batches(keys):
+            found.update(row[0] for row in self.bind.execute(
+                select([self.table.c.key], self.table.c.key.in_(batch))
+            ))
+        return dict((key, key in found) for key in keys)
+
     def _delete(self, key):
         self.bind.execute(
             self.table.delete(self.table.c.key == key)
         )
 
+    def _delete_many(self, keys):
+        for batch in _batches(keys):
+            self.bind.execute(
+                self.table.delete(self.table.c.key.in_(batch))
+            )
+
+    def _delete_prefix(self, prefix):
+        query = self.table.delete()
+        if prefix != "":
+            query = query.where(_starts_with(self.table.c.key, prefix))
+        self.bind.execute(query)
+
     def _get(self, key):
         rv = self.bind.execute(
             select([self.table.c.value], self.table.c.key == key).limit(1)
@@ -41,6 +78,32 @@ class SQLAlchemyStore(KeyValueStore, CopyMixin):
 
         return rv
 
+    def _get_many(self, keys):
+        rv = {}
+        for batch in _batches(keys):
+            rv.update((row[0], row[1]) for row in self.bind.execute(
+                select([self.table.c.key, self.table.c.value],
+                       self.table.c.key.in_(batch))
+            ))
+
+        for key in keys:
+            if key not in rv:
+                raise KeyError(key)
+        return rv
+
+    def _get_range(self, key, offset, length):
+        # SQL strings are indexed starting at 1
+        args = [offset + 1] if length is None else [offset + 1, length]
+        part = func.substr(self.table.c.value, *args, type_=LargeBinary)
+        row = self.bind.execute(
+            select([part], self.table.c.key == key).limit(1)
+        ).first()
+
+        if row is None:
+            raise KeyError(key)
+
+        return row[0]
+
     def _open(self, key):
         return BytesIO(self._get(key))
 
@@ -79,12 +142,47 @@ class SQLAlchemyStore(KeyValueStore, CopyMixin):
         con.close()
         return key
 
+    def _put_many(self, items):
+        # later values win, like with repeated calls to put
+        values = dict(items)
+        keys = list(values)
+
+        con = self.bind.connect()
+        with con.begin():
+            for batch in _batches(keys):
+                con.execute(self.table.delete(self.table.c.key.in_(batch)))
+
+            if keys:
+                con.execute(self.table.insert(), [
+                    {'key': key, 'value': values[key]} for key in keys
+                ])
+        con.close()
+        return [key for key, data in items]
+
     def _put_file(self, key, file):
         return self._put(key, file.read())
 
+    def _stat(self, key):
+        row = self.bind.execute(
+            select([func.length(self.table.c.value)],
+                   self.table.c.key == key).limit(1)
+        ).first()
+
+        if row is None:
+            raise KeyError(key)
+
+        return KeyStat(row[0], None, None)
+
+    def iter_stats(self, prefix=u""):
+        query = select([self.table.c.key, func.length(self.table.c.value)])
+        if prefix != "":
+            query = query.where(_starts_with(self.table.c.key, prefix))
+        return ((text_type(row[0]), KeyStat(row[1], None, None))
+                for row in self.bind.execute(query))
+
     def iter_keys(self, prefix=u""):
         query = select([self.table.c.key])
         if prefix != "":
-            query = query.where(self.table.c.key.like(prefix + '%'))
+            query = query.where(_starts_with(self.table.c.key, prefix))
         return imap(lambda v: text_type(v[0]),
                     self.bind.execute(query))
@@ -0,0 +1,446 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import contextlib
+import io
+import sqlite3
+import threading
+import weakref
+
+from .. import KeyValueStore, KeyStat, CopyMixin, _remaining
+from ..fs import _successor
+
+# keys listed per query, the read transaction is not kept open while the
+# caller iterates
+_PAGE_SIZE = 1000
+
+# chunk size for copying files into blobs
+_BUFSIZE = 1024 * 1024
+
+# idle connections kept for open(), further ones are closed
+_MAX_READERS = 8
+
+# upserts keeping the rowid of a key need SQLite 3.24
+_HAS_UPSERT = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+# incremental blob I/O needs Python 3.11
+_HAS_BLOBOPEN = hasattr(sqlite3.Connection, 'blobopen')
+
+
+class _BlobFile(io.RawIOBase):
+    """A read-only, seekable file reading an open :class:`sqlite3.Blob`.
+
+    *release* is called once the blob is closed."""
+
+    def __init__(self, blob, release):
+        self._blob = blob
+        self._release = release
+        self._size = len(blob)
+        self._pos = 0
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        self._check_open()
+        n = max(min(len(b), self._size - self._pos), 0)
+        if n:
+            try:
+                self._blob.seek(self._pos)
+                b[:n] = self._blob.read(n)
+            except sqlite3.Error as e:
+                raise IOError('Reading the value failed: %s' % e)
+            self._pos += n
+        return n
+
+    def tell(self):
+        self._check_open()
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._check_open()
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise IOError('Negative seek position %d' % offset)
+        self._pos = offset
+        return offset
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._blob.close()
+            except sqlite3.ProgrammingError:
+                # the store was closed, and the blob with it
+                pass
+            finally:
+                self._release()
+        super(_BlobFile, self).close()
+
+
+class _ValueFile(io.BytesIO):
+    """A value read into memory, returned by ``open()`` without incremental
+    blob I/O. Seeks like :class:`_BlobFile`."""
+
+    def __init__(self, value):
+        super(_ValueFile, self).__init__(value)
+        self._size = len(value)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise IOError('Negative seek position %d' % offset)
+        return super(_ValueFile, self).seek(offset)
+
+
+class _ThreadConnection(object):
+    """Holds the connection of a thread, in thread-local storage. Once the
+    thread exits, the holder is freed and the connection closed."""
+
+    def __init__(self, store, conn):
+        self._store = weakref.ref(store)
+        self.conn = conn
+
+    def __del__(self):
+        store = self._store()
+        if store is not None:
+            store._discard(self.conn)
+        else:
+            self.conn.close()
+
+
+class SQLiteStore(KeyValueStore, CopyMixin):
+    """Stores data in a table of an SQLite database, using the :mod:`sqlite3`
+    module of the standard library.
+
+    Every thread uses a connection of its own, which caches the prepared
+    statements of the store and is closed once the thread exits. The
+    database is put into WAL mode, so that readers do not block the writer,
+    and read through a memory map of up to *mmap_size* bytes.
+
+    On Python 3.11 and later, :meth:`~simplekv.KeyValueStore.open` returns a
+    file reading the value incrementally and
+    :meth:`~simplekv.KeyValueStore.put_file` copies seekable files into the
+    database in chunks, instead of holding the whole value in memory. Every
+    file returned by ``open()`` reads through a connection of its own, taken
+    from a pool of up to eight idle connections, and keeps reading the value as it was
+    when it was opened until it is closed, even if the value is replaced or
+    deleted in the meantime.
+
+    As every thread connects to the database separately, in-memory databases
+    are not supported.
+
+    :param filename: The database file, created if it does not exist.
+    :param tablename: The name of the table, created if it does not exist.
+    :param mmap_size: The number of bytes of the database to memory map, `0`
+                      disables it.
+    :param synchronous: The ``synchronous`` setting of SQLite. With the
+                        default ``'NORMAL'``, the last transactions can be
+                        lost on power loss, but the database stays consistent.
+    :param timeout: The number of seconds to wait for a lock held by another
+                    connection.
+    """
+
+    def __init__(self, filename, tablename='simplekv', mmap_size=256 * 2 ** 20,
+                 synchronous='NORMAL', timeout=5.0):
+        if filename in ('', ':memory:'):
+            raise ValueError('SQLiteStore needs a database file, every '
+                             'connection would see a different in-memory '
+                             'database')
+        self.filename = filename
+        self.tablename = tablename
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        self.timeout = timeout
+
+        self._local = threading.local()
+        # reentrant, connections of exiting threads are discarded whenever
+        # their thread-local storage is freed
+        self._lock = threading.RLock()
+        self._connections = []
+        # connections without open blobs, for open()
+        self._readers = []
+
+        table = '"%s"' % tablename.replace('"', '""')
+
+        def upsert(rows):
+            if _HAS_UPSERT:
+                return ('INSERT INTO %s (key, value) %s ON CONFLICT (key) '
+                        'DO UPDATE SET value = excluded.value' % (table, rows))
+            return 'INSERT OR REPLACE INTO %s (key, value) %s' % (table, rows)
+
+        self._sql = {
+            'create': 'CREATE TABLE IF NOT EXISTS %s '
+                      '(key TEXT PRIMARY KEY, value BLOB NOT NULL)' % table,
+            'has': 'SELECT 1 FROM %s WHERE key = ?' % table,
+            'get': 'SELECT value FROM %s WHERE key = ?' % table,
+            'rowid': 'SELECT rowid FROM %s WHERE key = ?' % table,
+            'length': 'SELECT length(value) FROM %s WHERE key = ?' % table,
+            'range': 'SELECT substr(value, ?, ?) FROM %s WHERE key = ?' % table,
+            'tail': 'SELECT substr(value, ?) FROM %s WHERE key = ?' % table,
+            'put': upsert('VALUES (?, ?)'),
+            'reserve': upsert('VALUES (?, zeroblob(?))'),
+            # the WHERE clause keeps ON CONFLICT from being parsed as a join
+            'copy': upsert('SELECT ?, value FROM %s WHERE key = ?' % table),
+            'delete': 'DELETE FROM %s WHERE key = ?' % table,
+            'delete_from': 'DELETE FROM %s WHERE key >= ?' % table,
+            'delete_range': 'DELETE FROM %s WHERE key >= ? AND key < ?' %
+                            table,
+            'list_from': 'SELECT key, length(value) FROM %s WHERE key %%s ? '
+                         'ORDER BY key LIMIT ?' % table,
+            'list_range': 'SELECT key, length(value) FROM %s WHERE key %%s ? '
+                          'AND key < ? ORDER BY key LIMIT ?' % table,
+        }
+
+        with self._transaction() as conn:
+            conn.execute(self._sql['create'])
+
+    def _connect(self):
+        conn = sqlite3.connect(self.filename, timeout=self.timeout,
+                               isolation_level=None, check_same_thread=False,
+                               cached_statements=256)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=%s' % self.synchronous)
+        conn.execute('PRAGMA mmap_size=%d' % self.mmap_size)
+        return conn
+
+    @property
+    def _conn(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            conn = self._connect()
+            with self._lock:
+                self._connections.append(conn)
+            holder = self._local.holder = _ThreadConnection(self, conn)
+        return holder.conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._connections = [c for c in self._connections
+                                 if c is not conn]
+        conn.close()
+
+    def close(self):
+        """Closes the connections of all threads."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._readers = []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def _reader(self):
+        with self._lock:
+            if self._readers:
+                return self._readers.pop()
+        conn = self._connect()
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _release(self, conn):
+        with self._lock:
+            # unless the store was closed in the meantime
+            if not any(c is conn for c in self._connections):
+                return
+            if len(self._readers) < _MAX_READERS:
+                self._readers.append(conn)
+                return
+        self._discard(conn)
+
+    @contextlib.contextmanager
+    def _transaction(self, mode='IMMEDIATE'):
+        conn = self._conn
+        # writers take the lock right away, instead of failing to upgrade a
+        # read lock when another connection wrote in the meantime
+        conn.execute('BEGIN %s' % mode)
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _one(self, sql, params, conn=None):
+        conn = conn or self._conn
+        rows = conn.execute(self._sql[sql], params).fetchall()
+        return rows[0][0] if rows else None
+
+    def _has_key(self, key):
+        return self._one('has', (key,)) is not None
+
+    def _contains_many(self, keys):
+        return dict((key, self._has_key(key)) for key in keys)
+
+    def _delete(self, key):
+        self._conn.execute(self._sql['delete'], (key,))
+
+    def _delete_many(self, keys):
+        with self._transaction() as conn:
+            conn.executemany(self._sql['delete'], ((key,) for key in keys))
+
+    def _delete_prefix(self, prefix):
+        upper = _successor(prefix)
+        if upper is None:
+            self._conn.execute(self._sql['delete_from'], (prefix,))
+        else:
+            self._conn.execute(self._sql['delete_range'], (prefix, upper))
+
+    def _get(self, key):
+        value = self._one('get', (key,))
+        if value is None:
+            raise KeyError(key)
+        # a buffer on python 2
+        return bytes(value)
+
+    def _get_many(self, keys):
+        rv = {}
+        # a single read transaction, all values are from the same snapshot
+        with self._transaction('DEFERRED'):
+            for key in keys:
+                rv[key] = self._get(key)
+        return rv
+
+    def _get_range(self, key, offset, length):
+        # SQL strings are indexed starting at 1
+        if length is None:
+            value = self._one('tail', (offset + 1, key))
+        else:
+            value = self._one('range', (offset + 1, length, key))
+        if value is None:
+            raise KeyError(key)
+        return bytes(value)
+
+    def _open(self, key):
+        if not _HAS_BLOBOPEN:
+            return _ValueFile(self._get(key))
+
+        # a connection of its own, writes through the connection of this
+        # thread would abort the blob
+        conn = self._reader()
+        try:
+            while True:
+                rowid = self._one('rowid', (key,), conn)
+                if rowid is None:
+                    raise KeyError(key)
+                try:
+                    blob = conn.blobopen(self.tablename, 'value', rowid,
+                                         readonly=True)
+                except sqlite3.OperationalError:
+                    # retried only if the row was deleted in the meantime
+                    if self._one('rowid', (key,), conn) == rowid:
+                        raise
+                    continue
+
+                # the open blob holds a read transaction, in which the key has
+                # to still be in the row that was opened
+                if self._one('rowid', (key,), conn) == rowid:
+                    return _BlobFile(blob, lambda: self._release(conn))
+                blob.close()
+        except BaseException:
+            self._release(conn)
+            raise
+
+    def _copy(self, source, dest):
+        cursor = self._conn.execute(self._sql['copy'], (dest, source))
+        if not cursor.rowcount:
+            raise KeyError(source)
+        return dest
+
+    def _move(self, source, dest):
+        with self._transaction() as conn:
+            self._copy(source, dest)
+            if source != dest:
+                conn.execute(self._sql['delete'], (source,))
+        return dest
+
+    def _put(self, key, data):
+        # bound as a blob, python 2 would bind bytes as text
+        self._conn.execute(self._sql['put'], (key, sqlite3.Binary(data)))
+        return key
+
+    def _put_file(self, key, file):
+        size = _remaining(file) if _HAS_BLOBOPEN else None
+        if size is None:
+            return self._put(key, file.read())
+
+        with self._transaction() as conn:
+            conn.execute(self._sql['reserve'], (key, size))
+            rowid = self._one('rowid', (key,))
+            with conn.blobopen(self.tablename, 'value', rowid) as blob:
+                while size:
+                    chunk = file.read(min(size, _BUFSIZE))
+                    if not chunk:
+                        raise IOError('File was truncated while reading')
+                    blob.write(chunk)
+                    size -= len(chunk)
+        return key
+
+    def _put_many(self, items):
+        with self._transaction() as conn:
+            conn.executemany(self._sql['put'],
+                             ((key, sqlite3.Binary(data))
+                              for key, data in items))
+        return [key for key, data in items]
+
+    def _stat(self, key):
+        size = self._one('length', (key,))
+        if size is None:
+            raise KeyError(key)
+        return KeyStat(size, None, None)
+
+    def _iter_rows(self, lower, upper, page_size=None):
+        """Yields the keys from *lower* up to *upper* (excluded, `None` for
+        no limit) and the lengths of their values, in sorted order."""
+        page_size = page_size or _PAGE_SIZE
+        op = '>='
+        while True:
+            if upper is None:
+                rows = self._conn.execute(self._sql['list_from'] % op,
+                                          (lower, page_size)).fetchall()
+            else:
+                rows = self._conn.execute(self._sql['list_range'] % op,
+                                          (lower, upper, page_size)).fetchall()
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            lower, op = rows[-1][0], '>'
+
+    def iter_keys(self, prefix=u""):
+        return (key for key, _ in self._iter_rows(prefix, _successor(prefix)))
+
+    def iter_stats(self, prefix=u""):
+        return ((key, KeyStat(size, None, None))
+                for key, size in self._iter_rows(prefix, _successor(prefix)))
+
+    def iter_prefixes(self, delimiter, prefix=u""):
+        # skips over all keys below a prefix once it has been found
+        upper = _successor(prefix)
+        lower = prefix
+        while lower is not None:
+            for key, _ in self._iter_rows(lower, upper, 1):
+                break
+            else:
+                return
+
+            pos = key.find(delimiter, len(prefix))
+            if pos < 0:
+                yield key
+                lower = key + u'\0'
+            else:
+                key = key[:pos + len(delimiter)]
+                yield key
+                lower = _successor(key)
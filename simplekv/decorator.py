@@ -1,6 +1,12 @@
 #!/usr/bin/env python
 # coding=utf8
+import os
+import threading
+from bisect import bisect_left
+from timeit import default_timer
+
 from ._compat import quote_plus, unquote_plus, text_type, binary_type
+from . import _list_items, _bytes_like
 
 
 class StoreDecorator(object):
@@ -46,15 +52,43 @@ class KeyTransformingDecorator(StoreDecorator):
     def __iter__(self):
         return self.iter_keys()
 
+    def contains_many(self, keys):
+        mapped = dict((self._map_key(k), k) for k in keys)
+        return dict((mapped[k], v) for k, v in
+                    self._dstore.contains_many(list(mapped)).items())
+
     def delete(self, key):
         return self._dstore.delete(self._map_key(key))
 
+    def delete_many(self, keys):
+        return self._dstore.delete_many([self._map_key(k) for k in keys])
+
+    def delete_prefix(self, prefix):
+        return self._dstore.delete_prefix(self._map_key_prefix(prefix))
+
     def get(self, key, *args, **kwargs):
         return self._dstore.get(self._map_key(key), *args, **kwargs)
 
     def get_file(self, key, *args, **kwargs):
         return self._dstore.get_file(self._map_key(key), *args, **kwargs)
 
+    def get_into(self, key, *args, **kwargs):
+        return self._dstore.get_into(self._map_key(key), *args, **kwargs)
+
+    def get_many(self, keys):
+        mapped = dict((self._map_key(k), k) for k in keys)
+        return dict((mapped[k], v) for k, v in
+                    self._dstore.get_many(list(mapped)).items())
+
+    def get_range(self, key, *args, **kwargs):
+        return self._dstore.get_range(self._map_key(key), *args, **kwargs)
+
+    def get_ranges(self, key, ranges):
+        return self._dstore.get_ranges(self._map_key(key), ranges)
+
+    def iter_chunks(self, key, *args, **kwargs):
+        return self._dstore.iter_chunks(self._map_key(key), *args, **kwargs)
+
     def iter_keys(self, prefix=u""):
         return (self._unmap_key(k) for k in self._dstore.iter_keys(self._map_key_prefix(prefix))
                 if self._filter(k))
@@ -73,6 +107,11 @@ class KeyTransformingDecorator(StoreDecorator):
                 yield k
                 memory.add(k)
 
+    def iter_stats(self, prefix=u""):
+        return ((self._unmap_key(k), stat) for k, stat in
+                self._dstore.iter_stats(self._map_key_prefix(prefix))
+                if self._filter(k))
+
     def keys(self, prefix=u""):
         """Return a list of keys currently in store, in any order
 
@@ -83,6 +122,9 @@ class KeyTransformingDecorator(StoreDecorator):
     def open(self, key):
         return self._dstore.open(self._map_key(key))
 
+    def open_mmap(self, key):
+        return self._dstore.open_mmap(self._map_key(key))
+
     def put(self, key, *args, **kwargs):
         return self._unmap_key(
             self._dstore.put(self._map_key(key), *args, **kwargs))
@@ -91,6 +133,18 @@ class KeyTransformingDecorator(StoreDecorator):
         return self._unmap_key(
             self._dstore.put_file(self._map_key(key), *args, **kwargs))
 
+    def put_iter(self, key, *args, **kwargs):
+        return self._unmap_key(
+            self._dstore.put_iter(self._map_key(key), *args, **kwargs))
+
+    def put_many(self, items, *args, **kwargs):
+        items = [(self._map_key(k), v) for k, v in _list_items(items)]
+        return [self._unmap_key(k)
+                for k in self._dstore.put_many(items, *args, **kwargs)]
+
+    def stat(self, key):
+        return self._dstore.stat(self._map_key(key))
+
     # support for UrlMixin
     def url_for(self, key, *args, **kwargs):
         return self._dstore.url_for(self._map_key(key), *args, **kwargs)
@@ -150,7 +204,9 @@ class ReadOnlyDecorator(StoreDecorator):
     A read-only view of an underlying simplekv store
 
     Provides only access to the following methods/attributes of the
-    underlying store: get, iter_keys, keys, open, get_file.
+    underlying store: get, iter_keys, keys, open, get_file, get_many,
+    contains_many, stat, iter_stats, get_range, get_ranges, get_into,
+    iter_chunks, open_mmap.
     It also forwards __contains__.
     Accessing any other method will raise AttributeError.
 
@@ -161,7 +217,404 @@ class ReadOnlyDecorator(StoreDecorator):
     """
 
     def __getattr__(self, attr):
-        if attr in ('get', 'iter_keys', 'keys', 'open', 'get_file'):
+        if attr in ('get', 'iter_keys', 'keys', 'open', 'get_file',
+                    'get_many', 'contains_many', 'stat', 'iter_stats',
+                    'get_range', 'get_ranges', 'get_into', 'iter_chunks',
+                    'open_mmap'):
             return super(ReadOnlyDecorator, self).__getattr__(attr)
         else:
             raise AttributeError
+
+
+def _error_name(e):
+    if isinstance(e, KeyError):
+        return 'KeyError'
+    if isinstance(e, EnvironmentError):
+        return 'IOError'
+    return 'other'
+
+
+class _CountingFile(object):
+    """Wraps a file-like object, passing the number of bytes read from or
+    written to it to *count*."""
+
+    def __init__(self, file, count):
+        self._file = file
+        self._count = count
+
+    def __getattr__(self, attr):
+        return getattr(self._file, attr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._file.close()
+
+    def read(self, *args):
+        data = self._file.read(*args)
+        self._count(len(data))
+        return data
+
+    def read1(self, *args):
+        data = self._file.read1(*args)
+        self._count(len(data))
+        return data
+
+    def readinto(self, buf):
+        n = self._file.readinto(buf)
+        self._count(n or 0)
+        return n
+
+    def readline(self, *args):
+        line = self._file.readline(*args)
+        self._count(len(line))
+        return line
+
+    def readlines(self, *args):
+        lines = self._file.readlines(*args)
+        self._count(sum(len(line) for line in lines))
+        return lines
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    next = __next__
+
+    def write(self, data):
+        rv = self._file.write(data)
+        self._count(len(_bytes_like(data)))
+        return rv
+
+
+class StatsDecorator(StoreDecorator):
+    """Records call counts, latencies, transferred bytes and errors of every
+    method called on the decorated store.
+
+    Wrapping each layer of a stack of decorators separately shows where time
+    is spent, e.g.
+    ``StatsDecorator(CacheDecorator(cache, StatsDecorator(store, 'backend')),
+    'cache')``.
+
+    Latencies of the iterating methods (``iter_keys``, ``iter_chunks``, ...)
+    cover the whole iteration. Bytes read from file objects returned by
+    ``open()`` and transferred through ``get_file()``, ``put_file()`` and
+    ``put_iter()`` are counted as well. Errors are split into ``KeyError``,
+    ``IOError`` and ``other``.
+
+    :param store: The store to record metrics of.
+    :param name: An optional name, exported as the ``store`` label by
+                 :meth:`prometheus_text`.
+    :param buckets: Upper bounds of the latency histogram buckets in seconds.
+    :param callback: If given, called as ``callback(method, seconds, error)``
+                     after every call, e.g. to send timings to statsd.
+                     *error* is ``None`` for successful calls.
+    """
+
+    def __init__(self, store, name=None,
+                 buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25,
+                          .5, 1.0, 2.5, 5.0, 10.0),
+                 callback=None):
+        super(StatsDecorator, self).__init__(store)
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _method_stats(self, method):
+        stats = self._stats.get(method)
+        if stats is None:
+            stats = self._stats[method] = {
+                'calls': 0,
+                'errors': {'KeyError': 0, 'IOError': 0, 'other': 0},
+                'bytes_in': 0,
+                'bytes_out': 0,
+                'latency_sum': 0.0,
+                # the last bucket is +Inf
+                'latency_buckets': [0] * (len(self.buckets) + 1),
+            }
+        return stats
+
+    def _record(self, method, seconds, error=None):
+        with self._lock:
+            stats = self._method_stats(method)
+            stats['calls'] += 1
+            stats['latency_sum'] += seconds
+            stats['latency_buckets'][bisect_left(self.buckets, seconds)] += 1
+            if error is not None:
+                stats['errors'][error] += 1
+
+        if self.callback is not None:
+            try:
+                self.callback(method, seconds, error)
+            except Exception:
+                # the error of the call itself takes precedence
+                if error is None:
+                    raise
+
+    def _add_bytes(self, method, bytes_in=0, bytes_out=0):
+        with self._lock:
+            stats = self._method_stats(method)
+            stats['bytes_in'] += bytes_in
+            stats['bytes_out'] += bytes_out
+
+    def _call(self, method, *args, **kwargs):
+        return self._timed(method, getattr(self._dstore, method),
+                           *args, **kwargs)
+
+    def _timed(self, method, fn, *args, **kwargs):
+        """Calls *fn*, recording its latency and errors for *method*."""
+        start = default_timer()
+        error = None
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            error = _error_name(e)
+            raise
+        finally:
+            self._record(method, default_timer() - start, error)
+
+    def _call_iter(self, method, count, *args, **kwargs):
+        start = default_timer()
+        try:
+            it = getattr(self._dstore, method)(*args, **kwargs)
+        except Exception as e:
+            self._record(method, default_timer() - start, _error_name(e))
+            raise
+        return self._iterate(method, start, it, count)
+
+    def _iterate(self, method, start, it, count):
+        error = None
+        try:
+            for item in it:
+                if count is not None:
+                    self._add_bytes(method, bytes_out=count(item))
+                yield item
+        except Exception as e:
+            error = _error_name(e)
+            raise
+        finally:
+            # releases what the store holds on to if the caller stopped early
+            close = getattr(it, 'close', None)
+            try:
+                if close is not None:
+                    close()
+            finally:
+                self._record(method, default_timer() - start, error)
+
+    def _call_file(self, method, direction, key, file, *args, **kwargs):
+        def count(n):
+            self._add_bytes(method, **{direction: n})
+
+        if isinstance(file, str):
+            def call():
+                # errors looking up the size are recorded as well
+                if direction == 'bytes_in':
+                    size = os.path.getsize(file)
+                rv = getattr(self._dstore, method)(key, file, *args, **kwargs)
+                if direction == 'bytes_out':
+                    size = os.path.getsize(file)
+                count(size)
+                return rv
+
+            return self._timed(method, call)
+
+        try:
+            start = file.tell()
+        except (AttributeError, EnvironmentError, ValueError):
+            # not seekable, count the bytes passing through instead
+            return self._call(method, key, _CountingFile(file, count),
+                              *args, **kwargs)
+
+        rv = self._call(method, key, file, *args, **kwargs)
+        try:
+            count(file.tell() - start)
+        except (EnvironmentError, ValueError):
+            # closed by the store
+            pass
+        return rv
+
+    def __contains__(self, key):
+        return self._call('__contains__', key)
+
+    def __iter__(self):
+        return self.iter_keys()
+
+    def contains_many(self, keys):
+        return self._call('contains_many', keys)
+
+    def copy(self, source, dest):
+        return self._call('copy', source, dest)
+
+    def delete(self, key):
+        return self._call('delete', key)
+
+    def delete_many(self, keys):
+        return self._call('delete_many', keys)
+
+    def delete_prefix(self, prefix):
+        return self._call('delete_prefix', prefix)
+
+    def get(self, key):
+        data = self._call('get', key)
+        self._add_bytes('get', bytes_out=len(data))
+        return data
+
+    def get_file(self, key, file):
+        return self._call_file('get_file', 'bytes_out', key, file)
+
+    def get_into(self, key, buf):
+        n = self._call('get_into', key, buf)
+        self._add_bytes('get_into', bytes_out=n)
+        return n
+
+    def get_many(self, keys):
+        values = self._call('get_many', keys)
+        self._add_bytes('get_many',
+                        bytes_out=sum(len(v) for v in values.values()))
+        return values
+
+    def get_range(self, key, offset, length=None):
+        data = self._call('get_range', key, offset, length)
+        self._add_bytes('get_range', bytes_out=len(data))
+        return data
+
+    def get_ranges(self, key, ranges):
+        values = self._call('get_ranges', key, ranges)
+        self._add_bytes('get_ranges', bytes_out=sum(len(v) for v in values))
+        return values
+
+    def iter_chunks(self, key, *args, **kwargs):
+        return self._call_iter('iter_chunks', len, key, *args, **kwargs)
+
+    def iter_keys(self, prefix=u""):
+        return self._call_iter('iter_keys', None, prefix)
+
+    def iter_prefixes(self, delimiter, prefix=u""):
+        return self._call_iter('iter_prefixes', None, delimiter, prefix)
+
+    def iter_stats(self, prefix=u""):
+        return self._call_iter('iter_stats', None, prefix)
+
+    def keys(self, prefix=u""):
+        return self._call('keys', prefix)
+
+    def move(self, source, dest):
+        return self._call('move', source, dest)
+
+    def open(self, key):
+        return _CountingFile(
+            self._call('open', key),
+            lambda n: self._add_bytes('open', bytes_out=n))
+
+    def open_mmap(self, key):
+        return self._call('open_mmap', key)
+
+    def put(self, key, data, *args, **kwargs):
+        rv = self._call('put', key, data, *args, **kwargs)
+        self._add_bytes('put', bytes_in=len(_bytes_like(data)))
+        return rv
+
+    def put_file(self, key, file, *args, **kwargs):
+        return self._call_file('put_file', 'bytes_in', key, file,
+                               *args, **kwargs)
+
+    def put_iter(self, key, chunks, *args, **kwargs):
+        def counting(chunks):
+            for chunk in chunks:
+                self._add_bytes('put_iter', bytes_in=len(_bytes_like(chunk)))
+                yield chunk
+
+        return self._call('put_iter', key, counting(chunks), *args, **kwargs)
+
+    def put_many(self, items, *args, **kwargs):
+        items = _list_items(items)
+        rv = self._call('put_many', items, *args, **kwargs)
+        self._add_bytes('put_many', bytes_in=sum(len(_bytes_like(v))
+                                                 for _, v in items))
+        return rv
+
+    def stat(self, key):
+        return self._call('stat', key)
+
+    def url_for(self, key, *args, **kwargs):
+        return self._call('url_for', key, *args, **kwargs)
+
+    def snapshot(self):
+        """Returns a copy of the metrics recorded so far.
+
+        The result maps method names to dictionaries with the keys ``calls``,
+        ``errors`` (a dictionary of counts by error type), ``bytes_in``,
+        ``bytes_out``, ``latency_sum`` and ``latency_buckets``. The latter
+        holds the number of calls per bucket of :attr:`buckets`, plus one for
+        calls that took longer.
+        """
+        with self._lock:
+            return dict((method, dict(stats,
+                                      errors=dict(stats['errors']),
+                                      latency_buckets=list(
+                                          stats['latency_buckets'])))
+                        for method, stats in self._stats.items())
+
+    def reset(self):
+        """Discards all metrics recorded so far."""
+        with self._lock:
+            self._stats = {}
+
+    def prometheus_text(self, prefix='simplekv'):
+        """Returns the metrics recorded so far in the Prometheus text
+        exposition format.
+
+        :param prefix: Prefix of the metric names.
+        """
+        def labels(method, **extra):
+            pairs = [('method', method)] + sorted(extra.items())
+            if self.name is not None:
+                pairs.insert(0, ('store', self.name))
+            return '{%s}' % ','.join(
+                '%s="%s"' % (k, str(v).replace('\\', '\\\\')
+                             .replace('"', '\\"').replace('\n', '\\n'))
+                for k, v in pairs)
+
+        counters = [('calls_total', 'Number of calls.'),
+                    ('errors_total', 'Number of failed calls.'),
+                    ('bytes_in_total', 'Number of bytes written.'),
+                    ('bytes_out_total', 'Number of bytes read.')]
+
+        stats = sorted(self.snapshot().items())
+        lines = []
+        for metric, help in counters:
+            lines.append('# HELP %s_%s %s' % (prefix, metric, help))
+            lines.append('# TYPE %s_%s counter' % (prefix, metric))
+            for method, s in stats:
+                if metric == 'errors_total':
+                    for error, n in sorted(s['errors'].items()):
+                        lines.append('%s_%s%s %d' % (
+                            prefix, metric, labels(method, error=error), n))
+                else:
+                    lines.append('%s_%s%s %d' % (
+                        prefix, metric, labels(method),
+                        s[metric[:-len('_total')]]))
+
+        lines.append('# HELP %s_latency_seconds Latency of calls.' % prefix)
+        lines.append('# TYPE %s_latency_seconds histogram' % prefix)
+        for method, s in stats:
+            total = 0
+            bounds = ['%r' % float(b) for b in self.buckets] + ['+Inf']
+            for bound, n in zip(bounds, s['latency_buckets']):
+                total += n
+                lines.append('%s_latency_seconds_bucket%s %d' % (
+                    prefix, labels(method, le=bound), total))
+            lines.append('%s_latency_seconds_sum%s %r' % (
+                prefix, labels(method), s['latency_sum']))
+            lines.append('%s_latency_seconds_count%s %d' % (
+                prefix, labels(method), s['calls']))
+
+        return '\n'.join(lines) + '\n'
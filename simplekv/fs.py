@@ -1,12 +1,439 @@
 #!/usr/bin/env python
 # coding=utf8
 
+import contextlib
+import errno
+import io
+import mmap
 import os
 import os.path
 import shutil
+import socket
+import stat
+import sys
+import threading
+import time
+import uuid
+import zlib
 
-from . import KeyValueStore, UrlMixin, CopyMixin
-from ._compat import url_quote, text_type
+try:
+    import fcntl
+except ImportError:
+    # not available on windows
+    fcntl = None
+
+from . import KeyValueStore, KeyStat, UrlMixin, CopyMixin, _read_chunks
+from ._compat import url_quote, text_type, scandir, unichr, PY2
+
+if hasattr(os, 'pread'):
+    _pread = os.pread
+else:
+    def _pread(fd, n, offset):
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, n)
+
+_fdatasync = getattr(os, 'fdatasync', os.fsync)
+_replace = getattr(os, 'replace', os.rename)
+
+# separates temporary files from keys, as it is not valid in keys
+_TEMP_MARKER = u';'
+
+# holds the key index inside the root, never listed as it is not a valid key
+_INDEX_DIR = _TEMP_MARKER + u'index'
+
+_syncfs = None
+if sys.platform.startswith('linux'):
+    try:
+        import ctypes
+        _syncfs = ctypes.CDLL(None, use_errno=True).syncfs
+    except (ImportError, OSError, AttributeError):
+        pass
+
+
+def _sync_fds(fds):
+    """Flushes the data of the open files *fds* to disk."""
+    if len(fds) > 1 and _syncfs is not None:
+        # a single flush per filesystem instead of one per file
+        devices = dict((os.fstat(fd).st_dev, fd) for fd in fds)
+        if all(_syncfs(fd) == 0 for fd in devices.values()):
+            return
+
+    for fd in fds:
+        _fdatasync(fd)
+
+
+def _sync_dirs(paths):
+    """Flushes the entries of the directories *paths* to disk."""
+    for path in set(paths):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+# errors signalling that a kernel copy is not supported for the descriptors
+_NO_KERNEL_COPY = frozenset(getattr(errno, name) for name in (
+    'EINVAL', 'ENOSYS', 'EXDEV', 'EOPNOTSUPP', 'ENOTSUP', 'EBADF', 'ESPIPE',
+    'ENOTSOCK') if hasattr(errno, name))
+
+_KERNEL_COPY_SIZE = 1 << 30
+
+# ioctl to share the data of another file (a reflink), from linux/fs.h
+_FICLONE = 0x40049409
+
+
+def _current_umask():
+    """Returns the umask of the process, without changing it if possible."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (IOError, OSError, ValueError):
+        pass
+
+    # briefly changes the umask for all threads
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def _fchmod(f, filename, mode):
+    if hasattr(os, 'fchmod'):
+        os.fchmod(f.fileno(), mode)
+    else:
+        os.chmod(filename, mode)
+
+
+def _fileno(file):
+    """Returns the file descriptor of *file* if it is a plain file or socket,
+    i.e. reading or writing the descriptor directly is the same as using the
+    file object. Returns `None` otherwise."""
+    raw = getattr(file, 'raw', file)
+    if not isinstance(raw, (io.FileIO, getattr(socket, 'SocketIO', ()))):
+        return None
+    try:
+        return file.fileno()
+    except (EnvironmentError, ValueError):
+        return None
+
+
+def _tell(file):
+    try:
+        return file.tell()
+    except (EnvironmentError, ValueError):
+        # not seekable
+        return None
+
+
+def _kernel_copy(src, src_offset, dst, dst_offset):
+    """Copies all data from file descriptor *src*, starting at *src_offset*,
+    to file descriptor *dst* at *dst_offset* inside the kernel.
+
+    An offset of `None` reads from or writes to the current position of a
+    stream, such as a socket or pipe. Returns the number of bytes copied or
+    `None` if the kernel does not support copying between the descriptors.
+    """
+    if src_offset is None:
+        return _splice(src, dst, dst_offset)
+
+    n = 0
+    if dst_offset is not None and hasattr(os, 'copy_file_range'):
+        try:
+            while True:
+                copied = os.copy_file_range(src, dst, _KERNEL_COPY_SIZE,
+                                            src_offset + n, dst_offset + n)
+                if not copied:
+                    return n
+                n += copied
+        except OSError as e:
+            if n or e.errno not in _NO_KERNEL_COPY:
+                raise
+
+    if not hasattr(os, 'sendfile'):
+        return None
+
+    if dst_offset is not None:
+        os.lseek(dst, dst_offset, os.SEEK_SET)
+    try:
+        while True:
+            copied = os.sendfile(dst, src, src_offset + n, _KERNEL_COPY_SIZE)
+            if not copied:
+                return n
+            n += copied
+    except OSError as e:
+        if n or e.errno not in _NO_KERNEL_COPY:
+            raise
+    return None
+
+
+def _clone(src, dst):
+    """Makes file descriptor *dst* share the data of *src* on filesystems
+    supporting reflinks, such as btrfs or XFS. Returns `False` if that is not
+    possible."""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+
+    try:
+        fcntl.ioctl(dst, _FICLONE, src)
+    except (IOError, OSError) as e:
+        if e.errno in _NO_KERNEL_COPY or e.errno in (errno.ENOTTY,
+                                                     errno.EPERM):
+            return False
+        raise
+    return True
+
+
+def _splice(src, dst, dst_offset):
+    """Moves all data from the stream *src* to *dst* through a pipe."""
+    if not hasattr(os, 'splice'):
+        return None
+
+    r, w = os.pipe()
+    try:
+        n = 0
+        while True:
+            try:
+                pending = os.splice(src, w, _KERNEL_COPY_SIZE)
+            except OSError as e:
+                if n or e.errno not in _NO_KERNEL_COPY:
+                    raise
+                return None
+            if not pending:
+                return n
+
+            while pending:
+                offset = None if dst_offset is None else dst_offset + n
+                moved = os.splice(r, dst, pending, offset_dst=offset)
+                pending -= moved
+                n += moved
+    finally:
+        os.close(r)
+        os.close(w)
+
+
+class _Batch(object):
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+
+
+class _GroupCommit(object):
+    """Coalesces the flushes of concurrent writers.
+
+    Items passed by concurrent callers are collected in a batch. The first
+    caller becomes the leader, waits for *window* seconds and flushes the
+    whole batch with a single call of *flush*, while the other callers wait
+    for it. Callers arriving in the meantime form the next batch. Every call
+    returns after its own item has been flushed.
+    """
+
+    def __init__(self, flush, window=0):
+        self.flush = flush
+        self.window = window
+        self._cond = threading.Condition()
+        self._batch = _Batch()
+        self._flushing = False
+
+    def __call__(self, item):
+        with self._cond:
+            batch = self._batch
+            batch.items.append(item)
+
+            # whenever no flush is running, all previous batches are done
+            while self._flushing and not batch.done:
+                self._cond.wait()
+
+            if not batch.done:
+                self._flushing = True
+
+        if not batch.done:
+            if self.window:
+                time.sleep(self.window)
+
+            with self._cond:
+                self._batch = _Batch()
+
+            try:
+                self.flush(batch.items)
+            except BaseException as e:
+                batch.error = e
+
+            with self._cond:
+                batch.done = True
+                self._flushing = False
+                self._cond.notify_all()
+
+        if batch.error is not None:
+            raise batch.error
+
+
+def _mtime_ns(st):
+    return getattr(st, 'st_mtime_ns', None) or int(st.st_mtime * 1e9)
+
+
+def _successor(prefix):
+    """Returns the smallest string greater than all strings starting with
+    *prefix*, or `None` for the empty prefix."""
+    if not prefix:
+        return None
+    return prefix[:-1] + unichr(ord(prefix[-1]) + 1)
+
+
+def _subdir(root, head):
+    """Returns the directory *head* below *root*, or `None` if *head* is not a
+    normalized relative path that stays inside *root*, also after resolving
+    symlinks."""
+    if not head:
+        return root
+    if os.path.isabs(head) or os.path.normpath(head) != head or \
+            os.pardir in head.split(os.sep):
+        return None
+    path = os.path.join(root, head)
+    inside = os.path.realpath(root).rstrip(os.sep) + os.sep
+    if not os.path.realpath(path).startswith(inside):
+        return None
+    return path
+
+
+@contextlib.contextmanager
+def _closing(entries):
+    """Closes a :func:`scandir` iterator, if it supports it."""
+    try:
+        yield entries
+    finally:
+        close = getattr(entries, 'close', None)
+        if close is not None:
+            close()
+
+
+class _KeyIndex(object):
+    """A sorted index of the keys of a :class:`FilesystemStore`, kept in an
+    SQLite database.
+
+    Every key is stored with the directory its file is in, relative to the
+    root. The modification times of all directories are recorded as well, so
+    that only directories that changed since the last scan need to be listed
+    again to pick up changes made outside of the store.
+    """
+
+    # bumped whenever the schema changes
+    VERSION = 1
+
+    def __init__(self, filename, layout=0):
+        # only needed with an index, some builds of Python lack sqlite3
+        import sqlite3
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # the index can always be rebuilt, losing the last commits is fine
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+
+        version = (self.VERSION << 16) | layout
+        with self._lock, self._conn:
+            current = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if current != version:
+                self._conn.execute('DROP TABLE IF EXISTS keys')
+                self._conn.execute('DROP TABLE IF EXISTS dirs')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS keys '
+                               '(key TEXT PRIMARY KEY, dir TEXT NOT NULL) '
+                               'WITHOUT ROWID')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS keys_dir '
+                               'ON keys (dir)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS dirs '
+                               '(path TEXT PRIMARY KEY, mtime INTEGER)')
+            self._conn.execute('PRAGMA user_version=%d' % version)
+
+    def _write(self, sql, params=()):
+        with self._lock, self._conn:
+            self._conn.execute(sql, params)
+
+    def _first(self, sql, params):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def add(self, key, directory):
+        self._write('INSERT OR REPLACE INTO keys VALUES (?, ?)',
+                    (key, directory))
+
+    def discard(self, key):
+        self._write('DELETE FROM keys WHERE key = ?', (key,))
+
+    def discard_prefix(self, prefix):
+        upper = _successor(prefix)
+        if upper is None:
+            self._write('DELETE FROM keys')
+        else:
+            self._write('DELETE FROM keys WHERE key >= ? AND key < ?',
+                        (prefix, upper))
+
+    def __contains__(self, key):
+        return self._first('SELECT 1 FROM keys WHERE key = ?',
+                           (key,)) is not None
+
+    def _next_key(self, lower, strict, upper):
+        sql = 'SELECT key FROM keys WHERE key %s ?' % ('>' if strict else '>=')
+        params = [lower]
+        if upper is not None:
+            sql += ' AND key < ?'
+            params.append(upper)
+        return sql + ' ORDER BY key', params
+
+    def iter_keys(self, prefix=u'', page_size=1000):
+        upper = _successor(prefix)
+        lower, strict = prefix, False
+        while True:
+            # a page at a time, so that the lock is not held while iterating
+            sql, params = self._next_key(lower, strict, upper)
+            with self._lock:
+                rows = self._conn.execute(sql + ' LIMIT %d' % page_size,
+                                          params).fetchall()
+            for row in rows:
+                yield row[0]
+            if len(rows) < page_size:
+                return
+            lower, strict = rows[-1][0], True
+
+    def iter_prefixes(self, delimiter, prefix=u''):
+        # skips over all keys below a prefix once it has been found
+        upper = _successor(prefix)
+        lower, strict = prefix, False
+        while True:
+            sql, params = self._next_key(lower, strict, upper)
+            row = self._first(sql + ' LIMIT 1', params)
+            if row is None:
+                return
+            key = row[0]
+            pos = key.find(delimiter, len(prefix))
+            if pos < 0:
+                yield key
+                lower, strict = key, True
+            else:
+                key = key[:pos + len(delimiter)]
+                yield key
+                lower, strict = _successor(key), False
+
+    def dirs(self):
+        with self._lock:
+            return dict(self._conn.execute('SELECT path, mtime FROM dirs'))
+
+    def update_dir(self, path, mtime, keys):
+        """Replaces the keys in the directory *path* with *keys*."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM keys WHERE dir = ?', (path,))
+            self._conn.executemany('INSERT OR REPLACE INTO keys VALUES (?, ?)',
+                                   ((key, path) for key in keys))
+            self._conn.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?)',
+                               (path, mtime))
+
+    def drop_dirs(self, paths):
+        with self._lock, self._conn:
+            for path in paths:
+                self._conn.execute('DELETE FROM keys WHERE dir = ?', (path,))
+                self._conn.execute('DELETE FROM dirs WHERE path = ?', (path,))
 
 
 class FilesystemStore(KeyValueStore, UrlMixin, CopyMixin):
@@ -18,64 +445,398 @@ class FilesystemStore(KeyValueStore, UrlMixin, CopyMixin):
     Any call to :meth:`.url_for` will result in a `file://`-URL pointing
     towards the internal storage to be generated.
     """
-    def __init__(self, root, perm=None, **kwargs):
+    def __init__(self, root, perm=None, atomic=False, sync=None,
+                 group_commit=False, commit_window=0, shard_depth=0,
+                 shard_width=2, defer_cleanup=False, index=False, **kwargs):
         """Initialize new FilesystemStore
 
         When files are created, they will receive permissions depending on the
         current umask if *perm* is `None`. Otherwise, permissions are set
         expliicitly.
 
+        The umask is read once, when the store is created. Permissions that
+        depend on it, such as those of files moved into the store by
+        :func:`put_file`, keep following that umask if the process changes it
+        later on; create a new store after changing the umask.
+
         Note that when using :func:`put_file` with a filename, an attempt to
         move the file will be made. Permissions and ownership of the file will
         be preserved that way. If *perm* is set, permissions will be changed.
 
+        With *atomic* writes, values are written to a temporary file in the
+        target directory first, which is then renamed to the key. Readers
+        never see partially written values and a crash cannot leave a torn
+        file behind. Temporary files contain a ``;`` in their names and are
+        never listed as keys. As without *atomic*, replaced values keep the
+        permissions of their file if *perm* is `None`.
+
+        *sync* controls how durable a value is once a write returns:
+        `None` leaves flushing to the operating system, ``'file'`` flushes the
+        written data to disk and ``'directory'`` also flushes the directory,
+        so that the new directory entry survives a crash as well.
+
+        With *group_commit*, the flushes of writes from concurrent threads
+        are coalesced: one thread flushes the files (using a single
+        ``syncfs()`` per filesystem on Linux) and directories of all writes
+        that are waiting, optionally after waiting *commit_window* seconds
+        for more writes to arrive. Every write still returns only after its
+        value is durable.
+
+        With a *shard_depth* above zero, files are spread over nested
+        directories named after the CRC32 of their key, e.g.
+        ``root/3f/a0/key`` for a depth of 2 and a *shard_width* of 2 hex
+        digits, which keeps directories small for large flat keyspaces. The
+        layout is transparent to all methods of the store, but values written
+        with a different layout cannot be found.
+
+        Deleting the last key in a directory removes the directory, unless
+        *defer_cleanup* is set. Empty directories are then only removed by
+        :meth:`compact`, which is much cheaper after deleting many keys.
+
+        With *index*, the store keeps a sorted index of its keys in an SQLite
+        database inside the root, which is updated on every write and delete.
+        Listing keys and prefixes and checking whether a key exists then no
+        longer touch the directory tree. Changes made by other processes
+        through a store with an index are seen immediately, files added or
+        removed by other means only after :meth:`refresh_index`, which is
+        called when the store is created.
+
         :param root: the base directory for the store
         :param perm: the permissions for files in the filesystem store
+        :param atomic: write values to a temporary file and rename it
+        :param sync: `None`, ``'file'`` or ``'directory'``
+        :param group_commit: coalesce flushes of concurrent writes, requires
+                             *sync*
+        :param commit_window: seconds to wait for more writes before flushing
+        :param shard_depth: number of directory levels to spread files over
+        :param shard_width: hex digits of the hash per directory level
+        :param defer_cleanup: leave empty directories for :meth:`compact`
+        :param index: keep an index of all keys
         """
         super(FilesystemStore, self).__init__(**kwargs)
+        if sync not in (None, 'file', 'directory'):
+            raise ValueError('Invalid sync policy: %r' % (sync,))
+        if group_commit and sync is None:
+            raise ValueError('group_commit requires a sync policy')
+        if shard_depth and not 0 < shard_depth * shard_width <= 8:
+            raise ValueError('Sharding needs 1 to 8 hex digits of the hash')
         self.root = text_type(root)
         self.perm = perm
+        self.atomic = atomic
+        self.sync = sync
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+        self.defer_cleanup = defer_cleanup
         self.bufsize = 1024 * 1024  # 1m
 
-    def _remove_empty_parents(self, path):
-        parents = os.path.relpath(path, os.path.abspath(self.root))
-        while len(parents) > 0:
-            absparent = os.path.join(self.root, parents)
-            if os.path.isdir(absparent):
-                if len(os.listdir(absparent)) == 0:
-                    os.rmdir(absparent)
-                else:
+        # umask() can only be read by setting it, which affects all threads
+        self._umask = _current_umask()
+
+        if group_commit:
+            self._sync_fd = _GroupCommit(_sync_fds, commit_window)
+            self._sync_dir = _GroupCommit(_sync_dirs, commit_window)
+
+        self._index = None
+        if index:
+            path = os.path.join(os.path.abspath(self.root), _INDEX_DIR)
+            self._ensure_dir_exists(path)
+            # an index built for another layout is rebuilt
+            self._index = _KeyIndex(os.path.join(path, 'keys.sqlite'),
+                                    (shard_depth << 8) | shard_width)
+            self.refresh_index()
+
+    def _sync_fd(self, fd):
+        _sync_fds([fd])
+
+    def _sync_dir(self, path):
+        _sync_dirs([path])
+
+    def _remove_empty_dirs(self, path):
+        """Removes the directory *path* and its parents below the root, as
+        long as they are empty."""
+        if self.defer_cleanup:
+            return
+
+        # rmdir fails on directories that are not empty, no need to list them
+        root = os.path.abspath(self.root)
+        rel = os.path.relpath(path, root)
+        if os.path.isabs(rel) or os.pardir in rel.split(os.sep):
+            return
+        while rel and rel != os.curdir:
+            try:
+                os.rmdir(os.path.join(root, rel))
+            except OSError as e:
+                if e.errno in (errno.ENOTEMPTY, errno.EEXIST):
                     break
-            parents = os.path.dirname(parents)
+                if e.errno != errno.ENOENT:
+                    raise
+            rel = os.path.dirname(rel)
+
+    def compact(self):
+        """Removes all empty directories below the root in a single pass.
+
+        Only needed with *defer_cleanup*, when deletes leave empty
+        directories behind.
+        """
+        root = os.path.abspath(self.root)
+        for dirpath, _, filenames in os.walk(root, topdown=False):
+            if dirpath == root or filenames:
+                continue
+            try:
+                os.rmdir(dirpath)
+            except OSError as e:
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST,
+                                   errno.ENOENT):
+                    raise
+
+    def refresh_index(self):
+        """Updates the index with files added or removed without going
+        through a store with an index.
+
+        Every directory is checked for changes, but only those whose
+        modification time changed since the last refresh are listed again.
+        Does nothing if the store has no index.
+        """
+        if self._index is None:
+            return
+
+        known = self._index.dirs()
+        children = {}
+        for path in known:
+            if path:
+                children.setdefault(os.path.dirname(path), []).append(path)
+
+        root = os.path.abspath(self.root)
+        started = time.time()
+        seen = set()
+        pending = [u'']
+        while pending:
+            rel = pending.pop()
+            path = os.path.join(root, rel)
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    raise
+                continue
+            seen.add(rel)
+
+            mtime = _mtime_ns(st)
+            if known.get(rel) == mtime:
+                pending.extend(children.get(rel, ()))
+                continue
+
+            # files above the lowest level of sharding are not keys
+            depth = rel.count(os.sep) + 1 if rel else 0
+            keys = []
+            for entry in scandir(path):
+                if _TEMP_MARKER in entry.name:
+                    continue
+                name = os.path.join(rel, entry.name)
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        pending.append(name)
+                elif depth >= self.shard_depth:
+                    keys.append(name.split(os.sep, self.shard_depth)[-1])
+
+            # changes within the resolution of the timestamp could go
+            # unnoticed, a directory modified during the scan is listed again
+            if st.st_mtime >= started - 1:
+                mtime = None
+            self._index.update_dir(rel, mtime, keys)
+
+        self._index.drop_dirs(set(known) - seen)
+
+    def _add_to_index(self, key):
+        if self._index is not None:
+            self._index.add(key, os.path.dirname(
+                os.path.join(*(self._shard(key) + [key]))))
+
+    def _shard(self, key):
+        """Returns the names of the directories *key* is sharded into."""
+        if not self.shard_depth:
+            return []
+        digest = '%08x' % (zlib.crc32(key.encode('utf-8')) & 0xffffffff)
+        w = self.shard_width
+        return [digest[i * w:(i + 1) * w] for i in range(self.shard_depth)]
 
     def _build_filename(self, key):
-        return os.path.abspath(os.path.join(self.root, key))
+        parts = self._shard(key) + [key]
+        return os.path.abspath(os.path.join(self.root, *parts))
 
     def _delete(self, key):
         try:
             targetname = self._build_filename(key)
             os.unlink(targetname)
-            self._remove_empty_parents(targetname)
         except OSError as e:
             if not e.errno == 2:
                 raise
+        else:
+            self._remove_empty_dirs(os.path.dirname(targetname))
 
-    def _fix_permissions(self, filename):
-        current_umask = os.umask(0)
-        os.umask(current_umask)
+        if self._index is not None:
+            self._index.discard(key)
+
+    def _delete_prefix(self, prefix):
+        head, _, tail = prefix.rpartition(os.sep)
+        root = os.path.abspath(self.root)
+        # prefixes that need normalization or leave the root are deleted key
+        # by key, from the keys listed below the root
+        if _subdir(root, head) is None:
+            return super(FilesystemStore, self)._delete_prefix(prefix)
+
+        if self.shard_depth:
+            dirs = list(self._iter_shard_dirs(root, self.shard_depth))
+        else:
+            dirs = [root]
+
+        for d in dirs:
+            path = _subdir(d, head)
+            if path is None:
+                continue
+            try:
+                entries = list(scandir(path))
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    continue
+                raise
+
+            # whole subtrees at once instead of key by key
+            for entry in entries:
+                if _TEMP_MARKER in entry.name:
+                    continue
+                if not entry.name.startswith(tail):
+                    continue
+                if not entry.is_dir():
+                    try:
+                        os.unlink(entry.path)
+                    except OSError as e:
+                        if e.errno != errno.ENOENT:
+                            raise
+                elif not entry.is_symlink():
+                    shutil.rmtree(entry.path)
+
+            if path != root:
+                self._remove_empty_dirs(path)
+
+        if self._index is not None:
+            self._index.discard_prefix(prefix)
+
+    def _get(self, key):
+        with self._open(key) as f:
+            return f.read()
+
+    def _get_file(self, key, file):
+        fd = _fileno(file)
+        if fd is None:
+            return super(FilesystemStore, self)._get_file(key, file)
+
+        with self._open(key, buffering=0) as f:
+            file.flush()
+            offset = _tell(file)
+            n = _kernel_copy(f.fileno(), 0, fd, offset)
+            if n is None:
+                for buf in _read_chunks(f, self.bufsize):
+                    file.write(buf)
+            elif offset is not None:
+                # advance the file as if it had been written to
+                file.seek(offset + n)
+
+    def _get_into(self, key, buf):
+        # unbuffered, readinto reads directly into buf
+        with self._open(key, buffering=0) as f:
+            n = 0
+            while n < len(buf):
+                read = f.readinto(buf[n:])
+                if not read:
+                    break
+                n += read
+
+            if n == len(buf) and f.read(1):
+                raise ValueError('Buffer too small for %r' % key)
+        return n
+
+    def _iter_chunks(self, key, chunk_size):
+        # unbuffered, every chunk is read directly into a new bytes object
+        f = self._open(key, buffering=0)
+        if hasattr(os, 'posix_fadvise'):
+            # the file is read once from start to end, allow for aggressive
+            # readahead
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        return _read_chunks(f, chunk_size, close=True)
+
+    def _get_range(self, key, offset, length):
+        try:
+            fd = os.open(self._build_filename(key),
+                         os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        except OSError as e:
+            if 2 == e.errno:
+                raise KeyError(key)
+            raise
 
+        try:
+            if length is None:
+                length = os.fstat(fd).st_size - offset
+
+            # a single pread may return less than requested for large reads
+            parts = []
+            while length > 0:
+                part = _pread(fd, length, offset)
+                if not part:
+                    break
+                parts.append(part)
+                offset += len(part)
+                length -= len(part)
+            return b''.join(parts)
+        finally:
+            os.close(fd)
+
+    def _fix_permissions(self, filename):
         perm = self.perm
         if self.perm is None:
-            perm = 0o666 & (0o777 ^ current_umask)
+            perm = 0o666 & (0o777 ^ self._umask)
 
         os.chmod(filename, perm)
 
     def _has_key(self, key):
+        if self._index is not None:
+            return key in self._index
         return os.path.exists(self._build_filename(key))
 
-    def _open(self, key):
+    def open_mmap(self, key):
+        """Maps the value for *key* into memory and returns a read-only
+        :class:`memoryview` of it.
+
+        No data is copied: slices are views as well and processes mapping
+        the same value share the page cache. The mapping remains valid after
+        the key is deleted or overwritten, unless the file is rewritten in
+        place; use *atomic* writes if values are replaced while mapped.
+
+        On Python 2, where memory maps do not support memoryviews, the value
+        is read into memory instead.
+
+        :param key: The key to be read
+
+        :returns: A read-only memoryview of the value
+
+        :raises exceptions.ValueError: If the key is not valid.
+        :raises exceptions.IOError: If the file could not be read.
+        :raises exceptions.KeyError: If the key was not found.
+        """
+        self._check_valid_key(key)
+        with self._open(key, buffering=0) as f:
+            if PY2:
+                return memoryview(f.read())
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                # empty files cannot be mapped
+                return memoryview(b'')
+            return memoryview(mmap.mmap(f.fileno(), size,
+                                        access=mmap.ACCESS_READ))
+
+    def _open(self, key, buffering=-1):
         try:
-            f = open(self._build_filename(key), 'rb')
+            f = open(self._build_filename(key), 'rb', buffering=buffering)
             return f
         except IOError as e:
             if 2 == e.errno:
@@ -84,19 +845,69 @@ class FilesystemStore(KeyValueStore, UrlMixin, CopyMixin):
                 raise
 
     def _copy(self, source, dest):
-        try:
-            source_file_name = self._build_filename(source)
-            dest_file_name = self._build_filename(dest)
+        with self._open(source, buffering=0) as src:
+            def write(f):
+                # a reflink if possible, then a copy inside the kernel
+                fd = f.fileno()
+                if _clone(src.fileno(), fd):
+                    return
+                if _kernel_copy(src.fileno(), 0, fd, 0) is None:
+                    for buf in _read_chunks(src, self.bufsize):
+                        f.write(buf)
 
-            self._ensure_dir_exists(os.path.dirname(dest_file_name))
-            shutil.copy(source_file_name, dest_file_name)
-            self._fix_permissions(dest_file_name)
-            return dest
-        except IOError as e:
-            if 2 == e.errno:
+            self._write(dest, write)
+        return dest
+
+    def _move(self, source, dest):
+        source_file_name = self._build_filename(source)
+        dest_file_name = self._build_filename(dest)
+
+        try:
+            self._rename(source_file_name, dest_file_name)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
                 raise KeyError(source)
-            else:
+            if e.errno != errno.EXDEV:
                 raise
+            # on another filesystem mounted below the root
+            return super(FilesystemStore, self)._move(source, dest)
+
+        self._add_to_index(dest)
+        if self._index is not None:
+            self._index.discard(source)
+
+        if self.sync == 'directory':
+            self._sync_dir(os.path.dirname(dest_file_name))
+            self._sync_dir(os.path.dirname(source_file_name))
+
+        self._remove_empty_dirs(os.path.dirname(source_file_name))
+        return dest
+
+    def _rename(self, source, dest):
+        """Renames *source* to *dest*, creating the directory of *dest* only
+        if it turns out to be missing."""
+        try:
+            _replace(source, dest)
+            return
+        except OSError as e:
+            if e.errno != errno.ENOENT or not os.path.exists(source):
+                raise
+        self._ensure_dir_exists(os.path.dirname(dest))
+        _replace(source, dest)
+
+    def _create(self, filename):
+        """Opens *filename* for writing and returns its file descriptor. The
+        directory is created only if it turns out to be missing."""
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | \
+            getattr(os, 'O_BINARY', 0) | getattr(os, 'O_CLOEXEC', 0)
+        mode = 0o666 if self.perm is None else self.perm
+        try:
+            return os.open(filename, flags, mode)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        self._ensure_dir_exists(os.path.dirname(filename))
+        return os.open(filename, flags, mode)
 
     def _ensure_dir_exists(self, path):
         if not os.path.isdir(path):
@@ -106,56 +917,220 @@ class FilesystemStore(KeyValueStore, UrlMixin, CopyMixin):
                 if not os.path.isdir(path):
                     raise e
 
+    def _put(self, key, data):
+        # a single write, no matter if data is bytes or a memoryview
+        return self._put_iter(key, (data,))
+
     def _put_file(self, key, file):
-        bufsize = self.bufsize
+        fd = _fileno(file)
+        if fd is None:
+            return self._put_iter(key, _read_chunks(file, self.bufsize))
 
-        target = self._build_filename(key)
-        self._ensure_dir_exists(os.path.dirname(target))
+        # unbuffered streams can be spliced, everything else needs to be
+        # seekable to start at the current position
+        offset = _tell(file)
+        if offset is None and getattr(file, 'raw', file) is not file:
+            return self._put_iter(key, _read_chunks(file, self.bufsize))
 
-        with open(target, 'wb') as f:
-            while True:
-                buf = file.read(bufsize)
+        def write(f):
+            n = _kernel_copy(fd, offset, f.fileno(), 0)
+            if n is None:
+                for buf in _read_chunks(file, self.bufsize):
+                    f.write(buf)
+            elif offset is not None:
+                # advance the file as if it had been read
+                file.seek(offset + n)
+
+        return self._write(key, write)
+
+    def _put_iter(self, key, chunks):
+        def write(f):
+            for buf in chunks:
                 f.write(buf)
-                if len(buf) < bufsize:
-                    break
 
-        # when using umask, correct permissions are automatically applied
-        # only chmod is necessary
-        if self.perm is not None:
-            self._fix_permissions(target)
+        return self._write(key, write)
+
+    def _write(self, key, write):
+        """Writes the value of *key* by calling *write* with a file opened for
+        writing, according to the store's write mode and sync policy."""
+        target = self._build_filename(key)
+        filename = self._begin_write(target)
+
+        try:
+            with io.open(self._create(filename), 'wb') as f:
+                # new files are created with perm, less the bits removed by
+                # the umask. existing files keep their permissions, which a
+                # temporary file replacing them has to copy
+                perm = self.perm
+                if perm is not None:
+                    if filename == target or perm & self._umask:
+                        _fchmod(f, filename, perm)
+                elif filename != target:
+                    perm = self._existing_mode(target)
+                    if perm is not None:
+                        _fchmod(f, filename, perm)
+
+                write(f)
+
+                if self.sync is not None:
+                    f.flush()
+                    self._sync_fd(f.fileno())
 
+            self._finish_write(filename, target, synced=True)
+        except BaseException:
+            self._abort_write(filename, target)
+            raise
+
+        self._add_to_index(key)
         return key
 
+    def _existing_mode(self, filename):
+        """Returns the permissions of *filename*, or `None` if it does not
+        exist."""
+        try:
+            return stat.S_IMODE(os.stat(filename).st_mode)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        return None
+
     def _put_filename(self, key, filename):
         target = self._build_filename(key)
-        self._ensure_dir_exists(os.path.dirname(target))
-        shutil.move(filename, target)
+        tmp = self._begin_write(target)
 
-        # we do not know the permissions of the source file, rectify
-        self._fix_permissions(target)
+        try:
+            try:
+                self._rename(filename, tmp)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # copies to another filesystem
+                shutil.move(filename, tmp)
+
+            # we do not know the permissions of the source file, rectify
+            self._fix_permissions(tmp)
+            self._finish_write(tmp, target)
+        except BaseException:
+            self._abort_write(tmp, target)
+            raise
+
+        self._add_to_index(key)
         return key
 
+    def _begin_write(self, target):
+        """Prepares writing the file *target* and returns the name of the file
+        to write to instead, which is a temporary file for atomic writes."""
+        if not self.atomic:
+            return target
+        return os.path.join(os.path.dirname(target),
+                            _TEMP_MARKER + uuid.uuid4().hex)
+
+    def _finish_write(self, filename, target, synced=False):
+        """Makes a file written after :meth:`_begin_write` durable according
+        to the sync policy and moves it into place."""
+        if self.sync is not None and not synced:
+            fd = os.open(filename, os.O_RDONLY)
+            try:
+                self._sync_fd(fd)
+            finally:
+                os.close(fd)
+
+        if filename != target:
+            _replace(filename, target)
+
+        if self.sync == 'directory':
+            self._sync_dir(os.path.dirname(target))
+
+    def _abort_write(self, filename, target):
+        if filename != target:
+            try:
+                os.unlink(filename)
+            except OSError:
+                pass
+
+    def _stat(self, key):
+        try:
+            st = os.stat(self._build_filename(key))
+        except OSError as e:
+            if 2 == e.errno:
+                raise KeyError(key)
+            raise
+        # changes whenever the file is rewritten or replaced
+        etag = '%x-%x-%x' % (st.st_ino, int(st.st_mtime * 1e6), st.st_size)
+        return KeyStat(st.st_size, st.st_mtime, etag)
+
     def _url_for(self, key):
         full = os.path.abspath(self._build_filename(key))
         parts = full.split(os.sep)
         location = '/'.join(url_quote(p, safe='') for p in parts)
         return 'file://' + location
 
-    def keys(self, prefix=u""):
+    def iter_keys(self, prefix=u""):
+        if self._index is not None:
+            return self._index.iter_keys(prefix)
+
         root = os.path.abspath(self.root)
-        result = []
-        for dp, dn, fn in os.walk(root):
-            for f in fn:
-                key = os.path.join(dp, f)[len(root) + 1:]
-                if key.startswith(prefix):
-                    result.append(key)
-        return result
 
-    def iter_keys(self, prefix=u""):
-        return iter(self.keys(prefix))
+        if self.shard_depth:
+            return (k for d in self._iter_shard_dirs(root, self.shard_depth)
+                    for k in self._iter_keys_in(d, u'', prefix))
+
+        # start in the deepest directory named by the prefix, unless it needs
+        # normalization or leaves the root and would not produce the same keys
+        head = prefix.rpartition(os.sep)[0]
+        path = _subdir(root, head)
+        if head and path is not None:
+            return self._iter_keys_in(path, head, prefix)
+        return self._iter_keys_in(root, u'', prefix)
+
+    def _iter_shard_dirs(self, path, depth):
+        """Yields the directories at the lowest level of sharding."""
+        if not depth:
+            yield path
+            return
+
+        try:
+            entries = scandir(path)
+        except OSError:
+            return
+
+        with _closing(entries):
+            for entry in entries:
+                if _TEMP_MARKER in entry.name or entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    for d in self._iter_shard_dirs(entry.path, depth - 1):
+                        yield d
+
+    def _iter_keys_in(self, path, rel, prefix):
+        try:
+            entries = scandir(path)
+        except OSError:
+            # does not exist (anymore)
+            return
+
+        # closed right away if the caller stops iterating early
+        with _closing(entries):
+            for entry in entries:
+                if _TEMP_MARKER in entry.name:
+                    continue
+                key = os.path.join(rel, entry.name) if rel else entry.name
+                if entry.is_dir():
+                    # like os.walk, symlinks to directories are neither
+                    # followed nor returned
+                    if entry.is_symlink():
+                        continue
+                    sub = key + os.sep
+                    if sub.startswith(prefix) or prefix.startswith(sub):
+                        for k in self._iter_keys_in(entry.path, key, prefix):
+                            yield k
+                elif key.startswith(prefix):
+                    yield key
 
     def iter_prefixes(self, delimiter, prefix=u""):
-        if delimiter != os.sep:
+        if self._index is not None:
+            return self._index.iter_prefixes(delimiter, prefix)
+        if delimiter != os.sep or self.shard_depth:
             return super(FilesystemStore, self).iter_prefixes(
                 delimiter,
                 prefix,
@@ -166,13 +1141,18 @@ class FilesystemStore(KeyValueStore, UrlMixin, CopyMixin):
         if delimiter in prefix:
             pos = prefix.rfind(delimiter)
             search_prefix = prefix[:pos]
-            path = os.path.join(self.root, search_prefix)
+            # no keys are below directories outside of the root
+            path = _subdir(self.root, search_prefix)
+            if path is None:
+                return
         else:
             search_prefix = None
             path = self.root
 
         try:
             for k in os.listdir(path):
+                if _TEMP_MARKER in k:
+                    continue
                 subpath = os.path.join(path, k)
 
                 if search_prefix is not None:
@@ -226,10 +1206,11 @@ class WebFilesystemStore(FilesystemStore):
         self.url_prefix = url_prefix
 
     def _url_for(self, key):
-        rel = key
+        rel = '/'.join(url_quote(p, safe='')
+                       for p in self._shard(key) + [key])
 
         if callable(self.url_prefix):
             stem = self.url_prefix(self, key)
         else:
             stem = self.url_prefix
-        return stem + url_quote(rel, safe='')
+        return stem + rel
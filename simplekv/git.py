@@ -175,7 +175,7 @@ class GitCommitStore(KeyValueStore):
         commit.message = (
             'Updated key {}'.format(self.subdir + '/' + key)).encode('utf8')
 
-        blob = Blob.from_string(data)
+        blob = Blob.from_string(bytes(data))
 
         try:
             parent_commit = self.repo[self._refname]
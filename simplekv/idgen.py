@@ -23,14 +23,19 @@ import uuid
 
 from .decorator import StoreDecorator
 from ._compat import text_type
+from . import _IterReader
 
 
 class HashDecorator(StoreDecorator):
     """Hash function decorator
 
-    Overrides :meth:`.KeyValueStore.put` and :meth:`.KeyValueStore.put_file`.
-    If a key of *None* is passed, the data/file is hashed using
-    ``hashfunc``, which defaults to *hashlib.sha1*. """
+    Overrides :meth:`.KeyValueStore.put`, :meth:`.KeyValueStore.put_file` and
+    :meth:`.KeyValueStore.put_iter`. If a key of *None* is passed, the
+    data/file is hashed using ``hashfunc``, which defaults to *hashlib.sha1*.
+
+    Since the key has to be known before storing, data passed to
+    :meth:`.KeyValueStore.put_iter` or as a file object is written to a
+    temporary file first. """
 
     def __init__(self, decorated_store, hashfunc=hashlib.sha1, template=u'{}'):
         self.hashfunc = hashfunc
@@ -86,12 +91,19 @@ class HashDecorator(StoreDecorator):
                             raise
         return self._dstore.put_file(key, file, *args, **kwargs)
 
+    def put_iter(self, key, chunks, *args, **kwargs):
+        if not key:
+            return self.put_file(key, _IterReader(chunks), *args, **kwargs)
+
+        return self._dstore.put_iter(key, chunks, *args, **kwargs)
+
 
 class UUIDDecorator(StoreDecorator):
     """UUID generating decorator
 
-    Overrides :meth:`.KeyValueStore.put` and :meth:`.KeyValueStore.put_file`.
-    If a key of *None* is passed, a new UUID will be generated as the key. The
+    Overrides :meth:`.KeyValueStore.put`, :meth:`.KeyValueStore.put_file` and
+    :meth:`.KeyValueStore.put_iter`. If a key of *None* is passed, a new UUID
+    will be generated as the key. The
     attribute `uuidfunc` determines which UUID-function to use and defaults to
     'uuid1'.
 
@@ -122,3 +134,11 @@ class UUIDDecorator(StoreDecorator):
         return self._dstore.put_file(
             self._template.format(key), file, *args, **kwargs
         )
+
+    def put_iter(self, key, chunks, *args, **kwargs):
+        if not key:
+            key = text_type(getattr(uuid, self.uuidfunc)())
+
+        return self._dstore.put_iter(
+            self._template.format(key), chunks, *args, **kwargs
+        )
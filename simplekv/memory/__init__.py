@@ -4,7 +4,7 @@
 from io import BytesIO
 from .._compat import ifilter
 
-from .. import KeyValueStore, CopyMixin
+from .. import KeyValueStore, KeyStat, CopyMixin
 
 
 class DictStore(KeyValueStore, CopyMixin):
@@ -19,6 +19,17 @@ class DictStore(KeyValueStore, CopyMixin):
     def _delete(self, key):
         self.d.pop(key, None)
 
+    def _get_into(self, key, buf):
+        data = self.d[key]
+        if len(data) > len(buf):
+            raise ValueError('Buffer too small, need %d bytes' % len(data))
+        buf[:len(data)] = data
+        return len(data)
+
+    def _get_range(self, key, offset, length):
+        data = self.d[key]
+        return data[offset:] if length is None else data[offset:offset + length]
+
     def _has_key(self, key):
         return key in self.d
 
@@ -28,9 +39,17 @@ class DictStore(KeyValueStore, CopyMixin):
     def _copy(self, source, dest):
         self.d[dest] = self.d[source]
 
+    def _put(self, key, data):
+        # the caller may still modify a bytes-like value, keep a copy
+        self.d[key] = bytes(data)
+        return key
+
     def _put_file(self, key, file):
         self.d[key] = file.read()
         return key
 
+    def _stat(self, key):
+        return KeyStat(len(self.d[key]), None, None)
+
     def iter_keys(self, prefix=u""):
         return ifilter(lambda k: k.startswith(prefix), iter(self.d))
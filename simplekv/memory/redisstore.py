@@ -3,7 +3,7 @@
 
 from io import BytesIO
 
-from .. import KeyValueStore, TimeToLiveMixin, NOT_SET, FOREVER
+from .. import KeyValueStore, KeyStat, TimeToLiveMixin, NOT_SET, FOREVER
 import re
 
 
@@ -19,15 +19,39 @@ class RedisStore(TimeToLiveMixin, KeyValueStore):
     def _delete(self, key):
         return self.redis.delete(key)
 
+    def _delete_many(self, keys):
+        if keys:
+            self.redis.delete(*keys)
+
     def keys(self, prefix=u""):
         return list(map(lambda b: b.decode(), self.redis.keys(pattern=re.escape(prefix) + '*')))
 
     def iter_keys(self, prefix=u""):
         return iter(self.keys(prefix))
 
+    def iter_stats(self, prefix=u""):
+        keys = self.keys(prefix)
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            # STRLEN reports 0 for missing keys, EXISTS tells them apart
+            pipe.exists(key)
+            pipe.strlen(key)
+        results = pipe.execute()
+        for i, key in enumerate(keys):
+            if results[2 * i]:
+                yield key, KeyStat(results[2 * i + 1], None, None)
+
     def _has_key(self, key):
         return self.redis.exists(key)
 
+    def _contains_many(self, keys):
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.exists(key)
+        return dict(
+            (key, bool(found)) for key, found in zip(keys, pipe.execute())
+        )
+
     def _get(self, key):
         val = self.redis.get(key)
 
@@ -35,19 +59,78 @@ class RedisStore(TimeToLiveMixin, KeyValueStore):
             raise KeyError(key)
         return val
 
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+
+        rv = {}
+        for key, val in zip(keys, self.redis.mget(keys)):
+            if val is None:
+                raise KeyError(key)
+            rv[key] = val
+        return rv
+
     def _get_file(self, key, file):
         file.write(self._get(key))
 
+    def _get_range(self, key, offset, length):
+        return self._get_ranges(key, [(offset, length)])[0]
+
+    def _get_ranges(self, key, ranges):
+        # a single round trip, so there is no need to merge ranges
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.exists(key)
+        for offset, length in ranges:
+            if length != 0:
+                # the end offset of GETRANGE is inclusive, -1 means the end
+                pipe.getrange(key, offset,
+                              -1 if length is None else offset + length - 1)
+        results = pipe.execute()
+
+        if not results[0]:
+            raise KeyError(key)
+
+        parts = iter(results[1:])
+        return [b'' if length == 0 else next(parts)
+                for offset, length in ranges]
+
     def _open(self, key):
         return BytesIO(self._get(key))
 
     def _put(self, key, value, ttl_secs):
+        self._set(self.redis, key, value, ttl_secs)
+        return key
+
+    def _put_many(self, items, ttl_secs):
+        if not items:
+            pass
+        elif ttl_secs in (NOT_SET, FOREVER):
+            # like SET, MSET clears any timeout
+            self.redis.mset(dict(items))
+        else:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in items:
+                self._set(pipe, key, value, ttl_secs)
+            pipe.execute()
+        return [key for key, value in items]
+
+    def _stat(self, key):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.exists(key)
+        pipe.strlen(key)
+        found, size = pipe.execute()
+        if not found:
+            raise KeyError(key)
+        return KeyStat(size, None, None)
+
+    def _set(self, redis, key, value, ttl_secs):
+        # redis may be a pipeline as well
         if ttl_secs in (NOT_SET, FOREVER):
             # if we do not care about ttl, just use set
             # in redis, using SET will also clear the timeout
             # note that this assumes that there is no way in redis
             # to set a default timeout on keys
-            self.redis.set(key, value)
+            redis.set(key, value)
         else:
             ittl = None
             try:
@@ -56,11 +139,9 @@ class RedisStore(TimeToLiveMixin, KeyValueStore):
                 pass  # let it blow up further down
 
             if ittl == ttl_secs:
-                self.redis.setex(key, ittl, value)
+                redis.setex(key, ittl, value)
             else:
-                self.redis.psetex(key, int(ttl_secs * 1000), value)
-
-        return key
+                redis.psetex(key, int(ttl_secs * 1000), value)
 
     def _put_file(self, key, file, ttl_secs):
         self._put(key, file.read(), ttl_secs)
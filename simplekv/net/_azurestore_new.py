@@ -2,16 +2,22 @@
 This implements the AzureBlockBlobStore for `azure-storage-blob~=12`
 """
 import io
+import tempfile
 from contextlib import contextmanager
 
 from .._compat import PY2
-from .. import KeyValueStore
+from .. import KeyValueStore, KeyStat
 
 from ._azurestore_common import (
     _byte_buffer_md5,
     _file_md5,
 )
-from ._net_common import lazy_property, LAZY_PROPERTY_ATTR_PREFIX
+from ._net_common import (
+    BufferReader,
+    datetime_to_timestamp,
+    lazy_property,
+    LAZY_PROPERTY_ATTR_PREFIX,
+)
 
 if PY2:
 
@@ -104,6 +110,27 @@ class AzureBlockBlobStore(KeyValueStore):
             downloader = blob_client.download_blob(max_concurrency=self.max_connections)
             return downloader.readall()
 
+    def _iter_chunks(self, key, chunk_size):
+        with map_azure_exceptions(key):
+            blob_client = self.blob_container_client.get_blob_client(key)
+            downloader = blob_client.download_blob(max_concurrency=self.max_connections)
+        return _split_chunks(downloader.chunks(), chunk_size)
+
+    def _get_range(self, key, offset, length):
+        blob_client = self.blob_container_client.get_blob_client(key)
+        if length == 0:
+            with map_azure_exceptions(key):
+                blob_client.get_blob_properties()
+            return b""
+
+        # offset lies beyond the end
+        with map_azure_exceptions(key, error_codes_pass=("InvalidRange",)):
+            downloader = blob_client.download_blob(
+                offset, length, max_concurrency=self.max_connections
+            )
+            return downloader.readall()
+        return b""
+
     def _has_key(self, key):
         blob_client = self.blob_container_client.get_blob_client(key)
         with map_azure_exceptions(key, ("BlobNotFound",)):
@@ -121,6 +148,16 @@ class AzureBlockBlobStore(KeyValueStore):
                     yield _blobname_to_texttype(blob.name)
         return gen_names()
 
+    def iter_stats(self, prefix=u""):
+        with map_azure_exceptions():
+            blobs = self.blob_container_client.list_blobs(name_starts_with=prefix)
+
+        def gen_stats():
+            with map_azure_exceptions():
+                for blob in blobs:
+                    yield _blobname_to_texttype(blob.name), _blob_stat(blob)
+        return gen_stats()
+
     def iter_prefixes(self, delimiter, prefix=u""):
         return (
             _blobname_to_texttype(blob_prefix.name)
@@ -134,6 +171,11 @@ class AzureBlockBlobStore(KeyValueStore):
             blob_client = self.blob_container_client.get_blob_client(key)
             return IOInterface(blob_client, self.max_connections)
 
+    def _stat(self, key):
+        with map_azure_exceptions(key):
+            blob_client = self.blob_container_client.get_blob_client(key)
+            return _blob_stat(blob_client.get_blob_properties())
+
     def _put(self, key, data):
         from azure.storage.blob import ContentSettings
 
@@ -144,11 +186,17 @@ class AzureBlockBlobStore(KeyValueStore):
         else:
             content_settings = ContentSettings()
 
+        length = len(data)
+        if isinstance(data, memoryview):
+            # upload_blob would iterate over a memoryview item by item
+            data = BufferReader(data)
+
         with map_azure_exceptions(key):
             blob_client = self.blob_container_client.get_blob_client(key)
 
             blob_client.upload_blob(
                 data,
+                length=length,
                 overwrite=True,
                 content_settings=content_settings,
                 max_concurrency=self.max_connections,
@@ -174,6 +222,17 @@ class AzureBlockBlobStore(KeyValueStore):
             )
         return key
 
+    def _put_iter(self, key, chunks):
+        if not self.checksum:
+            return super(AzureBlockBlobStore, self)._put_iter(key, chunks)
+
+        # the checksum has to be known before uploading
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in chunks:
+                tmp.write(chunk)
+            tmp.seek(0)
+            return self._put_file(key, tmp)
+
     def _get_file(self, key, file):
         with map_azure_exceptions(key):
             blob_client = self.blob_container_client.get_blob_client(key)
@@ -189,6 +248,23 @@ class AzureBlockBlobStore(KeyValueStore):
         }
 
 
+def _split_chunks(chunks, chunk_size):
+    """The size of the chunks azure downloads is configured on the client,
+    split them up further if they are larger than *chunk_size*."""
+    with map_azure_exceptions():
+        for chunk in chunks:
+            if len(chunk) <= chunk_size:
+                yield chunk
+            else:
+                for i in range(0, len(chunk), chunk_size):
+                    yield chunk[i:i + chunk_size]
+
+
+def _blob_stat(props):
+    return KeyStat(props.size, datetime_to_timestamp(props.last_modified),
+                   props.etag)
+
+
 class IOInterface(io.BufferedIOBase):
     """
     Class which provides a file-like interface to selectively read from a blob in the blob store.
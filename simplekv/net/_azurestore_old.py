@@ -2,6 +2,7 @@
 This implements the AzureBlockBlobStore for `azure-storage-blob<12`
 """
 import io
+import tempfile
 from contextlib import contextmanager
 
 from ._azurestore_common import (
@@ -9,10 +10,15 @@ from ._azurestore_common import (
     _file_md5,
     _filename_md5,
 )
-from ._net_common import lazy_property, LAZY_PROPERTY_ATTR_PREFIX
+from ._net_common import (
+    BufferReader,
+    datetime_to_timestamp,
+    lazy_property,
+    LAZY_PROPERTY_ATTR_PREFIX,
+)
 
 from .._compat import binary_type
-from .. import KeyValueStore
+from .. import KeyValueStore, KeyStat
 
 
 @contextmanager
@@ -88,6 +94,30 @@ class AzureBlockBlobStore(KeyValueStore):
                 max_connections=self.max_connections,
             ).content
 
+    def _get_range(self, key, offset, length):
+        from azure.common import AzureHttpError
+
+        if length == 0:
+            with map_azure_exceptions(key=key):
+                self.block_blob_service.get_blob_properties(self.container, key)
+            return b''
+
+        with map_azure_exceptions(key=key):
+            try:
+                return self.block_blob_service.get_blob_to_bytes(
+                    container_name=self.container,
+                    blob_name=key,
+                    start_range=offset,
+                    # end_range is inclusive
+                    end_range=None if length is None else offset + length - 1,
+                    max_connections=self.max_connections,
+                ).content
+            except AzureHttpError as ex:
+                # offset lies beyond the end
+                if ex.status_code != 416:
+                    raise
+        return b''
+
     def _has_key(self, key):
         with map_azure_exceptions(key=key):
             return self.block_blob_service.exists(self.container, key)
@@ -100,6 +130,14 @@ class AzureBlockBlobStore(KeyValueStore):
             return (blob.decode('utf-8') if isinstance(blob, binary_type)
                     else blob for blob in blobs)
 
+    def iter_stats(self, prefix=u""):
+        if prefix == "":
+            prefix = None
+        with map_azure_exceptions():
+            blobs = self.block_blob_service.list_blobs(self.container, prefix=prefix)
+            return ((blob.name.decode('utf-8') if isinstance(blob.name, binary_type)
+                     else blob.name, _blob_stat(blob)) for blob in blobs)
+
     def iter_prefixes(self, delimiter, prefix=u""):
         if prefix == "":
             prefix = None
@@ -114,9 +152,19 @@ class AzureBlockBlobStore(KeyValueStore):
         with map_azure_exceptions(key=key):
             return IOInterface(self.block_blob_service, self.container, key, self.max_connections)
 
+    def _stat(self, key):
+        with map_azure_exceptions(key=key):
+            return _blob_stat(
+                self.block_blob_service.get_blob_properties(self.container, key)
+            )
+
     def _put(self, key, data):
         from azure.storage.blob.models import ContentSettings
 
+        if isinstance(data, memoryview):
+            # create_blob_from_bytes only accepts bytes
+            return self._put_file(key, BufferReader(data))
+
         if self.checksum:
             content_settings = ContentSettings(content_md5=_byte_buffer_md5(data))
         else:
@@ -150,6 +198,17 @@ class AzureBlockBlobStore(KeyValueStore):
             )
             return key
 
+    def _put_iter(self, key, chunks):
+        if not self.checksum:
+            return super(AzureBlockBlobStore, self)._put_iter(key, chunks)
+
+        # the checksum has to be known before uploading
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in chunks:
+                tmp.write(chunk)
+            tmp.seek(0)
+            return self._put_file(key, tmp)
+
     def _get_file(self, key, file):
         with map_azure_exceptions(key=key):
             self.block_blob_service.get_blob_to_stream(
@@ -195,6 +254,12 @@ class AzureBlockBlobStore(KeyValueStore):
         }
 
 
+def _blob_stat(blob):
+    props = blob.properties
+    return KeyStat(props.content_length,
+                   datetime_to_timestamp(props.last_modified), props.etag)
+
+
 class IOInterface(io.BufferedIOBase):
     """
     Class which provides a file-like interface to selectively read from a blob in the blob store.
@@ -1,6 +1,57 @@
+import calendar
+import io
+
 LAZY_PROPERTY_ATTR_PREFIX = "_lazy_"
 
 
+class BufferReader(io.RawIOBase):
+    """A seekable file-like object reading from a bytes-like object, like
+    :class:`io.BytesIO`, but without copying it first. Used to upload
+    memoryviews with APIs that only accept `bytes` or files."""
+
+    def __init__(self, buf):
+        super(BufferReader, self).__init__()
+        self.view = memoryview(buf)
+        self.pos = 0
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else self.pos + size
+        rv = self.view[self.pos:end].tobytes()
+        self.pos += len(rv)
+        return rv
+
+    def readinto(self, b):
+        n = min(len(b), max(0, len(self.view) - self.pos))
+        b[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def readable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.pos = offset
+        return self.pos
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+
+def datetime_to_timestamp(dt):
+    """Converts a :class:`datetime.datetime`, as returned by the various cloud
+    APIs, to seconds since the epoch. Naive datetimes are assumed to be UTC."""
+    if dt is None:
+        return None
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
 def lazy_property(fn):
     """Decorator that makes a property lazy-evaluated.
 
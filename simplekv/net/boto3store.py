@@ -2,7 +2,9 @@
 # coding=utf8
 
 from .._compat import imap
-from .. import KeyValueStore, UrlMixin, CopyMixin
+from .. import KeyValueStore, KeyStat, UrlMixin, CopyMixin, _IterReader, \
+    _read_chunks
+from ._net_common import BufferReader, datetime_to_timestamp
 from contextlib import contextmanager
 from shutil import copyfileobj
 import io
@@ -118,9 +120,31 @@ class Boto3Store(KeyValueStore, UrlMixin, CopyMixin):
             return imap(lambda k: k.key[prefix_len:],
                         self.bucket.objects.filter(Prefix=self.prefix + prefix))
 
+    def iter_stats(self, prefix=u""):
+        # the listing already carries size, date and etag of every object
+        with map_boto3_exceptions():
+            prefix_len = len(self.prefix)
+            return imap(lambda k: (k.key[prefix_len:], KeyStat(
+                k.size, datetime_to_timestamp(k.last_modified), k.e_tag)),
+                self.bucket.objects.filter(Prefix=self.prefix + prefix))
+
     def _delete(self, key):
         self.bucket.Object(self.prefix + key).delete()
 
+    def _delete_many(self, keys):
+        # a single DeleteObjects request accepts up to 1000 keys
+        for i in range(0, len(keys), 1000):
+            with map_boto3_exceptions():
+                response = self.bucket.delete_objects(Delete={
+                    'Objects': [{'Key': self.prefix + key}
+                                for key in keys[i:i + 1000]],
+                    'Quiet': True,
+                })
+            errors = response.get('Errors')
+            if errors:
+                raise IOError('Could not delete %s: %s' % (
+                    errors[0]['Key'], errors[0].get('Message')))
+
     def _get(self, key):
         obj = self.__new_object(key)
         with map_boto3_exceptions(key=key):
@@ -140,12 +164,51 @@ class Boto3Store(KeyValueStore, UrlMixin, CopyMixin):
             with open(filename, 'wb') as file:
                 return copyfileobj(obj['Body'], file)
 
+    def _iter_chunks(self, key, chunk_size):
+        obj = self.__new_object(key)
+        with map_boto3_exceptions(key=key):
+            body = obj.get()['Body']
+        # closes the response if the caller stops iterating early
+        return _read_chunks(body, chunk_size, close=True)
+
+    def _get_range(self, key, offset, length):
+        from botocore.exceptions import ClientError
+
+        obj = self.__new_object(key)
+        if length == 0:
+            # a range cannot be empty, only check for existence
+            with map_boto3_exceptions(key=key):
+                obj.load()
+            return b''
+
+        if length is None:
+            range_header = "bytes=%d-" % offset
+        else:
+            range_header = "bytes=%d-%d" % (offset, offset + length - 1)
+
+        with map_boto3_exceptions(key=key):
+            try:
+                return obj.get(Range=range_header)['Body'].read()
+            except ClientError as ex:
+                # offset lies beyond the end
+                if ex.response['Error']['Code'] != 'InvalidRange':
+                    raise
+        return b''
+
     def _open(self, key):
         obj = self.__new_object(key)
         with map_boto3_exceptions(key=key):
             obj.load()
             return Boto3SimpleKeyFile(obj)
 
+    def _stat(self, key):
+        obj = self.__new_object(key)
+        with map_boto3_exceptions(key=key):
+            # a HEAD request
+            obj.load()
+        return KeyStat(obj.content_length,
+                       datetime_to_timestamp(obj.last_modified), obj.e_tag)
+
     def _copy(self, source, dest):
         obj = self.__new_object(dest)
         parameters = {
@@ -162,6 +225,9 @@ class Boto3Store(KeyValueStore, UrlMixin, CopyMixin):
 
     def _put(self, key, data):
         obj = self.__new_object(key)
+        if isinstance(data, memoryview):
+            # boto3 accepts bytes or files, but no other bytes-like objects
+            data = BufferReader(data)
         parameters = {'Body': data, 'Metadata': self.metadata}
         if self.public:
             parameters['ACL'] = 'public-read'
@@ -178,6 +244,19 @@ class Boto3Store(KeyValueStore, UrlMixin, CopyMixin):
         with open(filename, 'rb') as file:
             return self._put(key, file)
 
+    def _put_iter(self, key, chunks):
+        obj = self.__new_object(key)
+        extra_args = {'Metadata': self.metadata}
+        if self.public:
+            extra_args['ACL'] = 'public-read'
+        if self.reduced_redundancy:
+            extra_args['StorageClass'] = 'REDUCED_REDUNDANCY'
+        with map_boto3_exceptions(key=key):
+            # uses a multipart upload for large values, holding only a few
+            # parts in memory at any time
+            obj.upload_fileobj(_IterReader(chunks), ExtraArgs=extra_args)
+        return key
+
     def _url_for(self, key):
         import boto3
         import botocore.client
@@ -1,8 +1,13 @@
 import io
 from contextlib import contextmanager
 
-from ._net_common import lazy_property, LAZY_PROPERTY_ATTR_PREFIX
-from .. import KeyValueStore
+from ._net_common import (
+    BufferReader,
+    datetime_to_timestamp,
+    lazy_property,
+    LAZY_PROPERTY_ATTR_PREFIX,
+)
+from .. import KeyValueStore, KeyStat
 
 
 @contextmanager
@@ -99,12 +104,43 @@ class GoogleCloudStore(KeyValueStore):
         with map_gcloud_exceptions(key):
             blob.download_to_file(file)
 
+    def _get_range(self, key: str, offset, length):
+        from google.api_core.exceptions import RequestRangeNotSatisfiable
+
+        blob = self._bucket.blob(key)
+        with map_gcloud_exceptions(key):
+            if length == 0:
+                if not blob.exists():
+                    raise KeyError(key)
+                return b""
+
+            try:
+                # end is inclusive
+                return blob.download_as_bytes(
+                    start=offset,
+                    end=None if length is None else offset + length - 1,
+                )
+            except RequestRangeNotSatisfiable:
+                # offset lies beyond the end
+                return b""
+
     def _has_key(self, key: str):
         return self._bucket.blob(key).exists()
 
     def iter_keys(self, prefix=""):
         return (blob.name for blob in self._bucket.list_blobs(prefix=prefix))
 
+    def iter_stats(self, prefix=""):
+        return ((blob.name, _blob_stat(blob))
+                for blob in self._bucket.list_blobs(prefix=prefix))
+
+    def _stat(self, key: str):
+        with map_gcloud_exceptions(key):
+            blob = self._bucket.get_blob(key)
+        if blob is None:
+            raise KeyError(key)
+        return _blob_stat(blob)
+
     def _open(self, key: str):
         blob = self._bucket.blob(key)
         if not blob.exists():
@@ -113,9 +149,15 @@ class GoogleCloudStore(KeyValueStore):
 
     def _put(self, key: str, data: bytes):
         blob = self._bucket.blob(key)
-        if type(data) != bytes:
-            raise IOError(f"data has to be of type 'bytes', not {type(data)}")
-        blob.upload_from_string(data, content_type="application/octet-stream")
+        if isinstance(data, memoryview):
+            # upload_from_string only accepts bytes
+            blob.upload_from_file(
+                BufferReader(data),
+                size=len(data),
+                content_type="application/octet-stream",
+            )
+        else:
+            blob.upload_from_string(data, content_type="application/octet-stream")
         return key
 
     def _put_file(self, key, file):
@@ -134,6 +176,10 @@ class GoogleCloudStore(KeyValueStore):
         }
 
 
+def _blob_stat(blob):
+    return KeyStat(blob.size, datetime_to_timestamp(blob.updated), blob.etag)
+
+
 class IOInterface(io.BufferedIOBase):
     """
     Class which provides a file-like interface to selectively read from a blob in the bucket.
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import hashlib
+import io
+import mmap
+import os
+import struct
+import uuid
+import zlib
+from bisect import bisect_right
+
+from . import KeyValueStore, KeyStat
+from ._compat import BytesIO
+from .fs import _replace, _successor
+
+# key length and value length of an entry, followed by the key and the value.
+# a block is a run of entries, followed by the offset of every entry within
+# the block and the number of entries
+_ENTRY = struct.Struct('>HI')
+_OFFSET = struct.Struct('>I')
+
+# key length, offset and stored length of a block in the index, followed by
+# the first key of the block
+_INDEX = struct.Struct('>HQI')
+
+# offset and length of the index, offset and number of bits of the bloom
+# filter, number of keys, number of hashes per key, flags and magic
+_FOOTER = struct.Struct('>QQQQQBB6s')
+_MAGIC = b'SKVSST'
+_COMPRESSED = 1
+
+
+def _bloom_hashes(key):
+    h = hashlib.md5(key).digest()
+    return struct.unpack('>QQ', h)
+
+
+def _read_items(source):
+    if isinstance(source, KeyValueStore):
+        return ((key, source.get(key)) for key in sorted(source.keys()))
+    if hasattr(source, 'items'):
+        return sorted(source.items())
+    return source
+
+
+def write_sstable(filename, source, block_size=64 * 1024, compress=False,
+                  bloom_bits=10):
+    """Writes the keys and values of *source* to a sorted table in
+    *filename*, to be read by :class:`SSTableStore`.
+
+    *source* is a :class:`~simplekv.KeyValueStore`, a dictionary or an
+    iterable of ``(key, value)`` pairs sorted by key. Values are read one at a
+    time, only the keys are held in memory.
+
+    Entries are grouped into blocks of about *block_size* bytes, which are
+    compressed with zlib if *compress* is set. A bloom filter with
+    *bloom_bits* bits per key lets lookups of most missing keys skip the
+    blocks entirely, `0` disables it. The table is written to a temporary
+    file that replaces *filename* once complete.
+
+    :returns: The number of keys written
+    """
+    tmp = '%s.%s.tmp' % (filename, uuid.uuid4().hex)
+    index = []
+    hashes = []
+    count = 0
+    last = None
+
+    try:
+        with io.open(tmp, 'wb') as f:
+            entries, offsets, size = [], [], 0
+            first = None
+
+            def flush():
+                data = b''.join(entries) + b''.join(
+                    _OFFSET.pack(o) for o in offsets) + \
+                    _OFFSET.pack(len(offsets))
+                if compress:
+                    data = zlib.compress(data)
+                index.append((first, f.tell(), len(data)))
+                f.write(data)
+
+            for key, value in _read_items(source):
+                k = key.encode('utf-8')
+                if last is not None and k <= last:
+                    raise ValueError('Keys must be unique and sorted: %r' %
+                                     key)
+                last = k
+                count += 1
+
+                if first is None:
+                    first = k
+                offsets.append(size)
+                entries.append(_ENTRY.pack(len(k), len(value)))
+                entries.append(k)
+                entries.append(value)
+                size += _ENTRY.size + len(k) + len(value)
+                if bloom_bits:
+                    hashes.append(_bloom_hashes(k))
+
+                if size >= block_size:
+                    flush()
+                    entries, offsets, size = [], [], 0
+                    first = None
+
+            if offsets:
+                flush()
+
+            index_offset = f.tell()
+            for k, offset, length in index:
+                f.write(_INDEX.pack(len(k), offset, length))
+                f.write(k)
+            index_length = f.tell() - index_offset
+
+            bits = n_hashes = 0
+            if hashes:
+                bits = max(64, len(hashes) * bloom_bits)
+                # the number of hashes with the lowest false positive rate
+                n_hashes = max(1, int(round(bloom_bits * 0.69)))
+                bloom = bytearray((bits + 7) // 8)
+                for h1, h2 in hashes:
+                    for i in range(n_hashes):
+                        bit = (h1 + i * h2) % bits
+                        bloom[bit >> 3] |= 1 << (bit & 7)
+            bloom_offset = f.tell()
+            if bits:
+                f.write(bytes(bloom))
+
+            f.write(_FOOTER.pack(index_offset, index_length, bloom_offset, bits,
+                                 count, n_hashes,
+                                 _COMPRESSED if compress else 0,
+                                 _MAGIC))
+        _replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    return count
+
+
+class SSTableStore(KeyValueStore):
+    """A read-only store serving the sorted table written by
+    :func:`write_sstable` from a memory map.
+
+    Opening the store maps the file and reads its sparse index of one key per
+    block. Lookups find the block with a binary search of the index and the
+    entry with a binary search of the block, keys are listed in order and
+    :meth:`iter_prefixes` seeks past every prefix it finds. Uncompressed
+    values are read straight from the map.
+    """
+
+    def __init__(self, filename):
+        """Open the table in *filename*.
+
+        :param filename: a file written by :func:`write_sstable`
+        """
+        super(SSTableStore, self).__init__()
+        self.filename = filename
+
+        with io.open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < _FOOTER.size:
+            raise ValueError('%s is not a sorted table' % filename)
+        (index_offset, index_length, bloom_offset, self._bloom_bits,
+         self._count, self._bloom_k, flags, magic) = _FOOTER.unpack_from(
+            self._map, len(self._map) - _FOOTER.size)
+        if magic != _MAGIC:
+            raise ValueError('%s is not a sorted table' % filename)
+        self._compressed = bool(flags & _COMPRESSED)
+        self._bloom_offset = bloom_offset
+
+        # the first key, offset and length of every block
+        self._first_keys = []
+        self._blocks = []
+        pos, end = index_offset, index_offset + index_length
+        while pos < end:
+            key_length, offset, length = _INDEX.unpack_from(self._map, pos)
+            pos += _INDEX.size
+            self._first_keys.append(self._map[pos:pos + key_length])
+            self._blocks.append((offset, length))
+            pos += key_length
+
+    def close(self):
+        """Unmaps the table."""
+        self._map.close()
+
+    def _may_contain(self, k):
+        if not self._bloom_bits:
+            return True
+        h1, h2 = _bloom_hashes(k)
+        for i in range(self._bloom_k):
+            bit = (h1 + i * h2) % self._bloom_bits
+            byte = self._map[self._bloom_offset + (bit >> 3)]
+            if not (byte if isinstance(byte, int) else ord(byte)) & \
+                    (1 << (bit & 7)):
+                return False
+        return True
+
+    def _block(self, i):
+        """Returns the buffer holding block *i*, its start and its end."""
+        offset, length = self._blocks[i]
+        if not self._compressed:
+            return self._map, offset, offset + length
+        data = zlib.decompress(self._map[offset:offset + length])
+        return data, 0, len(data)
+
+    def _entries(self, buf, start, end):
+        """Returns the number of entries of a block and a function returning
+        the key, value offset and value length of the entry at an index."""
+        n, = _OFFSET.unpack_from(buf, end - _OFFSET.size)
+        table = end - _OFFSET.size * (n + 1)
+
+        def entry(i):
+            pos = start + _OFFSET.unpack_from(buf, table + _OFFSET.size * i)[0]
+            key_length, value_length = _ENTRY.unpack_from(buf, pos)
+            pos += _ENTRY.size
+            return (buf[pos:pos + key_length], pos + key_length,
+                    value_length)
+
+        return n, entry
+
+    def _seek(self, k):
+        """Yields ``(key, buffer, value offset, value length)`` for all
+        entries with a key of at least *k*, in order."""
+        block = max(bisect_right(self._first_keys, k) - 1, 0)
+        while block < len(self._blocks):
+            buf, start, end = self._block(block)
+            n, entry = self._entries(buf, start, end)
+
+            lo, hi = 0, n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if entry(mid)[0] < k:
+                    lo = mid + 1
+                else:
+                    hi = mid
+
+            for i in range(lo, n):
+                key, offset, length = entry(i)
+                yield key, buf, offset, length
+            block += 1
+
+    def _find(self, key):
+        k = key.encode('utf-8')
+        if self._may_contain(k):
+            for found in self._seek(k):
+                if found[0] == k:
+                    return found
+                break
+        raise KeyError(key)
+
+    def _get(self, key):
+        _, buf, offset, length = self._find(key)
+        return bytes(buf[offset:offset + length])
+
+    def _get_range(self, key, offset, length):
+        _, buf, start, size = self._find(key)
+        end = start + size
+        if length is not None:
+            end = min(end, start + offset + length)
+        return bytes(buf[min(start + offset, end):end])
+
+    def _has_key(self, key):
+        try:
+            self._find(key)
+        except KeyError:
+            return False
+        return True
+
+    def _open(self, key):
+        return BytesIO(self._get(key))
+
+    def _stat(self, key):
+        return KeyStat(self._find(key)[3], None, None)
+
+    def iter_keys(self, prefix=u""):
+        """Iterates over the keys starting with *prefix*, in sorted order."""
+        p = prefix.encode('utf-8')
+        for k, _, _, _ in self._seek(p):
+            if not k.startswith(p):
+                return
+            yield k.decode('utf-8')
+
+    def iter_prefixes(self, delimiter, prefix=u""):
+        """Iterates over the prefixes up to *delimiter* of the keys starting
+        with *prefix*, in sorted order. Skips over all keys below a prefix
+        once it has been found."""
+        lower = prefix
+        while lower is not None:
+            for k, _, _, _ in self._seek(lower.encode('utf-8')):
+                key = k.decode('utf-8')
+                break
+            else:
+                return
+            if not key.startswith(prefix):
+                return
+
+            pos = key.find(delimiter, len(prefix))
+            if pos < 0:
+                yield key
+                lower = key + u'\0'
+            else:
+                key = key[:pos + len(delimiter)]
+                yield key
+                lower = _successor(key)
@@ -1,17 +1,23 @@
 # coding: utf8
 
+import array
 import os
 import time
 import tempfile
 
 import pytest
-from simplekv._compat import BytesIO, xrange, text_type
+from simplekv._compat import BytesIO, xrange, text_type, PY2
 from simplekv.decorator import PrefixDecorator
 from simplekv.crypt import HMACDecorator
 from simplekv.idgen import UUIDDecorator, HashDecorator
 from simplekv import CopyMixin
 
 
+def _array_bytes(a):
+    # tobytes() is called tostring() on python 2
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+
 class BasicStore(object):
     def test_store(self, store, key, value):
         key = store.put(key, value)
@@ -25,6 +31,34 @@ class BasicStore(object):
         store.put(key, value)
         assert store.get(key) == value
 
+    def test_store_bytearray(self, store, key, value):
+        store.put(key, bytearray(value))
+        assert store.get(key) == value
+
+    def test_store_memoryview_slice(self, store, key, value):
+        buf = bytearray(b'xx' + value + b'yy')
+        store.put(key, memoryview(buf)[2:-2])
+
+        # modifying the buffer afterwards does not change the stored value
+        buf[2:4] = b'zz'
+        assert store.get(key) == value
+
+    def test_store_multibyte_items(self, store, key):
+        data = array.array('i', range(100))
+        store.put(key, data)
+        assert store.get(key) == _array_bytes(data)
+
+    def test_store_multibyte_items_without_cast(self, store, key, mocker):
+        # memoryviews of python 2 cannot be cast
+        mocker.patch('simplekv.PY2', True)
+        data = array.array('i', range(100))
+        store.put(key, data)
+        assert store.get(key) == _array_bytes(data)
+
+    def test_put_many_bytes_like(self, store, key, key2, value, value2):
+        store.put_many([(key, bytearray(value)), (key2, memoryview(value2))])
+        assert store.get_many([key, key2]) == {key: value, key2: value2}
+
     def test_store_and_retrieve_filelike(self, store, key, value):
         store.put_file(key, BytesIO(value))
         assert store.get(key) == value
@@ -61,6 +95,21 @@ class BasicStore(object):
         assert store.get(key) == value
         assert store.get(key2) == value
 
+    def test_store_and_move(self, store, key, key2, value, value2):
+        if not isinstance(store, CopyMixin):
+            pytest.skip()
+        store.put(key, value)
+        store.put(key2, value2)
+        assert store.move(key, key2) == key2
+        assert store.get(key2) == value
+        assert key not in store
+
+    def test_key_error_on_nonexistant_move(self, store, key, key2):
+        if not isinstance(store, CopyMixin):
+            pytest.skip()
+        with pytest.raises(KeyError):
+            store.move(key, key2)
+
     def test_open_incremental_read(self, store, key, long_value):
         store.put_file(key, BytesIO(long_value))
         ok = store.open(key)
@@ -148,6 +197,33 @@ class BasicStore(object):
         store.get_file(key, output)
         assert output.getvalue() == value
 
+    def test_put_iter(self, store, key, long_value):
+        chunks = (long_value[i:i + 1000]
+                  for i in range(0, len(long_value), 1000))
+
+        assert store.put_iter(key, chunks) == key
+        assert store.get(key) == long_value
+
+    def test_put_iter_bytes_like_and_empty_chunks(self, store, key, value):
+        store.put_iter(key, [b'', bytearray(value[:3]), b'',
+                             memoryview(value)[3:]])
+        assert store.get(key) == value
+
+    def test_put_iter_empty(self, store, key, value):
+        store.put(key, value)
+
+        store.put_iter(key, iter([]))
+        assert store.stat(key).size == 0
+
+    def test_exception_on_invalid_key_put_iter(self, store, invalid_key,
+                                               value):
+        with pytest.raises(ValueError):
+            store.put_iter(invalid_key, [value])
+
+    def test_unicode_put_iter(self, store, key, unicode_value):
+        with pytest.raises(IOError):
+            store.put_iter(key, [unicode_value])
+
     def test_put_return_value(self, store, key, value):
         assert key == store.put(key, value)
 
@@ -175,6 +251,16 @@ class BasicStore(object):
         with pytest.raises(KeyError):
             store.get(key)
 
+    def test_delete_prefix(self, store, value):
+        for k in [u'pre_a', u'pre_b', u'prefix', u'other_pre']:
+            store.put(k, value)
+
+        store.delete_prefix(u'pre_')
+        assert sorted(store.keys()) == [u'other_pre', u'prefix']
+
+        store.delete_prefix(u'')
+        assert store.keys() == []
+
     def test_multiple_delete_fails_without_error(self, store, key, value):
         store.put(key, value)
 
@@ -304,6 +390,210 @@ class BasicStore(object):
         store.put(key, value)
         store.get(key)
 
+    def test_put_many_and_get_many(self, store, key, key2, value, value2):
+        assert sorted(store.put_many({key: value, key2: value2})) == \
+            sorted([key, key2])
+
+        assert store.get_many([key, key2]) == {key: value, key2: value2}
+        assert store.get(key) == value
+        assert store.get(key2) == value2
+
+    def test_put_many_pairs_overwrite(self, store, key, key2, value, value2):
+        store.put(key, value)
+
+        assert store.put_many([(key, value2), (key2, value)]) == [key, key2]
+        assert store.get_many([key2, key]) == {key: value2, key2: value}
+
+    def test_get_many_empty(self, store):
+        assert store.get_many([]) == {}
+
+    def test_key_error_on_nonexistant_get_many(self, store, key, key2, value):
+        store.put(key, value)
+
+        with pytest.raises(KeyError):
+            store.get_many([key, key2])
+
+    def test_exception_on_invalid_key_get_many(self, store, key, invalid_key):
+        with pytest.raises(ValueError):
+            store.get_many([key, invalid_key])
+
+    def test_exception_on_invalid_key_put_many(self, store, key, invalid_key,
+                                               value):
+        with pytest.raises(ValueError):
+            store.put_many([(key, value), (invalid_key, value)])
+
+        assert key not in store
+
+    def test_unicode_put_many(self, store, key, unicode_value):
+        with pytest.raises(IOError):
+            store.put_many({key: unicode_value})
+
+    def test_contains_many(self, store, key, key2, value):
+        store.put(key, value)
+
+        assert store.contains_many([key, key2]) == {key: True, key2: False}
+
+    def test_delete_many(self, store, key, key2, value, value2):
+        store.put(key, value)
+        store.put(key2, value2)
+
+        store.delete_many([key, key2])
+        store.delete_many([key, key2])
+
+        assert key not in store
+        assert key2 not in store
+
+    def test_get_into(self, store, key, long_value):
+        store.put(key, long_value)
+        buf = bytearray(store.stat(key).size)
+
+        assert store.get_into(key, buf) == len(long_value)
+        assert bytes(buf) == long_value
+
+    def test_get_into_larger_buffer(self, store, key, value):
+        store.put(key, value)
+        buf = bytearray(len(value) + 10)
+
+        assert store.get_into(key, memoryview(buf)[5:]) == len(value)
+        assert bytes(buf[5:5 + len(value)]) == value
+        assert bytes(buf[:5]) == b'\0' * 5
+
+    @pytest.mark.skipif(PY2, reason='arrays do not support memoryviews '
+                                    'on python 2')
+    def test_get_into_multibyte_items(self, store, key, value):
+        store.put(key, value)
+        buf = array.array('d', [0.0] * len(value))
+
+        assert store.get_into(key, buf) == len(value)
+        assert memoryview(buf).tobytes()[:len(value)] == value
+
+    def test_get_into_buffer_too_small(self, store, key, value):
+        store.put(key, value)
+
+        with pytest.raises(ValueError):
+            store.get_into(key, bytearray(len(value) - 1))
+
+    def test_get_into_readonly_buffer(self, store, key, value):
+        store.put(key, value)
+
+        with pytest.raises(ValueError):
+            store.get_into(key, bytes(len(value)))
+
+    def test_key_error_on_nonexistant_get_into(self, store, key):
+        with pytest.raises(KeyError):
+            store.get_into(key, bytearray(10))
+
+    def test_exception_on_invalid_key_get_into(self, store, invalid_key):
+        with pytest.raises(ValueError):
+            store.get_into(invalid_key, bytearray(10))
+
+    def test_iter_chunks(self, store, key, long_value):
+        store.put(key, long_value)
+
+        chunks = list(store.iter_chunks(key, 1000))
+        assert b''.join(chunks) == long_value
+        assert all(len(chunk) <= 1000 for chunk in chunks)
+        assert b''.join(store.iter_chunks(key)) == long_value
+
+    def test_iter_chunks_stop_early(self, store, key, long_value):
+        store.put(key, long_value)
+
+        chunks = store.iter_chunks(key, 1000)
+        assert len(next(chunks)) > 0
+        chunks.close()
+
+        store.delete(key)
+        assert key not in store
+
+    def test_key_error_on_nonexistant_iter_chunks(self, store, key):
+        # raised right away, not once iteration starts
+        with pytest.raises(KeyError):
+            store.iter_chunks(key)
+
+    def test_exception_on_invalid_key_iter_chunks(self, store, invalid_key):
+        with pytest.raises(ValueError):
+            store.iter_chunks(invalid_key)
+
+    def test_exception_on_invalid_chunk_size(self, store, key, value):
+        store.put(key, value)
+
+        with pytest.raises(ValueError):
+            store.iter_chunks(key, 0)
+
+    def test_get_range(self, store, key, long_value):
+        store.put(key, long_value)
+
+        assert store.get_range(key, 0, 10) == long_value[:10]
+        assert store.get_range(key, 7, 13) == long_value[7:20]
+        assert store.get_range(key, 5) == long_value[5:]
+        assert store.get_range(key, len(long_value) - 3, 10) == \
+            long_value[-3:]
+
+    def test_get_range_empty(self, store, key, value):
+        store.put(key, value)
+
+        assert store.get_range(key, 3, 0) == b''
+        assert store.get_range(key, len(value) + 10, 5) == b''
+        assert store.get_range(key, len(value) + 10) == b''
+
+    def test_key_error_on_nonexistant_get_range(self, store, key):
+        with pytest.raises(KeyError):
+            store.get_range(key, 0, 10)
+
+        with pytest.raises(KeyError):
+            store.get_range(key, 0, 0)
+
+    def test_exception_on_invalid_key_get_range(self, store, invalid_key):
+        with pytest.raises(ValueError):
+            store.get_range(invalid_key, 0, 10)
+
+    def test_exception_on_invalid_range(self, store, key, value):
+        store.put(key, value)
+
+        with pytest.raises(ValueError):
+            store.get_range(key, -1, 10)
+        with pytest.raises(ValueError):
+            store.get_range(key, 0, -1)
+        with pytest.raises(ValueError):
+            store.get_ranges(key, [(0, 1), (-1, 1)])
+
+    def test_get_ranges(self, store, key, long_value):
+        store.put(key, long_value)
+        ranges = [(100, 20), (0, 10), (5, 10), (15, 5), (110, None), (50, 0)]
+
+        assert store.get_ranges(key, ranges) == [
+            long_value[100:120], long_value[:10], long_value[5:15],
+            long_value[15:20], long_value[110:], b'',
+        ]
+
+    def test_key_error_on_nonexistant_get_ranges(self, store, key):
+        with pytest.raises(KeyError):
+            store.get_ranges(key, [(0, 10), (20, 5)])
+
+    def test_stat(self, store, key, value):
+        store.put(key, value)
+
+        assert store.stat(key).size == len(value)
+
+    def test_key_error_on_nonexistant_stat(self, store, key):
+        with pytest.raises(KeyError):
+            store.stat(key)
+
+    def test_exception_on_invalid_key_stat(self, store, invalid_key):
+        with pytest.raises(ValueError):
+            store.stat(invalid_key)
+
+    def test_iter_stats_with_prefix(self, store, key, key2, value, value2):
+        store.put(key + u'_key1', value)
+        store.put(key + u'_key2', value2)
+        store.put(key2, value)
+
+        stats = dict(store.iter_stats(key))
+        assert sorted(stats) == sorted([key + u'_key1', key + u'_key2'])
+        assert stats[key + u'_key1'].size == len(value)
+        assert stats[key + u'_key2'].size == len(value2)
+        assert len(dict(store.iter_stats())) == 3
+
     def test_max_key_length(self, store, max_key, value):
         new_key = store.put(max_key, value)
 
@@ -373,6 +663,13 @@ class TTLStore(object):
         with pytest.raises(KeyError):
             store.get(key)
 
+    def test_put_iter_with_ttl_argument(self, store, key, value, small_ttl):
+        store.put_iter(key, [value], small_ttl)
+
+        time.sleep(small_ttl + TTL_MARGIN)
+        with pytest.raises(KeyError):
+            store.get(key)
+
     def test_put_file_set_default(self, store, key, value, small_ttl):
         store.default_ttl_secs = small_ttl
 
@@ -1,8 +1,12 @@
 # coding: utf8
 import hashlib
+import sys
 
 import pytest
 
+# the asyncio API requires async generators
+collect_ignore = ['test_aio.py'] if sys.version_info < (3, 6) else []
+
 
 @pytest.fixture(params=['sha1', 'sha256', 'md5'])
 def hashfunc(request):
@@ -80,3 +84,22 @@ class ExtendedKeyspaceTests:
     @pytest.fixture(params=[u'ä', u'/', u'\x00', u'*', u''])
     def invalid_key(self, request):
         return request.param
+
+
+# Test class to derive from for stores listing keys in sorted order, a page
+# at a time. page_size names the module attribute holding the page size
+class OrderedListingTests:
+    page_size = None
+
+    def test_keys_are_sorted(self, store, value, mocker):
+        # small pages, so that listings span several of them
+        mocker.patch(self.page_size, 3)
+        keys = [u'k%02d' % i for i in range(20)]
+        store.put_many((k, value) for k in reversed(keys))
+        store.put(u'l', value)
+
+        assert list(store.iter_keys(u'k')) == keys
+        assert list(store.iter_keys()) == keys + [u'l']
+        assert [k for k, _ in store.iter_stats(u'k1')] == keys[10:]
+        assert list(store.iter_prefixes(u'1')) == keys[:10] + [u'k1', u'l']
+        assert list(store.iter_prefixes(u'1', u'k1')) == keys[10:]
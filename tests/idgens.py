@@ -52,6 +52,11 @@ class UUIDGen(IDGen):
             if os.path.exists(tmpfile.name):
                 os.unlink(tmpfile.name)
 
+    def test_put_iter_generates_uuid_form(self, uuidstore, value):
+        key = uuidstore.put_iter(None, [value])
+        assert UUID_REGEXP.match(key)
+        assert uuidstore.get(key) == value
+
     def test_put_generates_valid_uuid(self, uuidstore, value):
         key = uuidstore.put(None, value)
         uuid.UUID(hex=key)
@@ -116,6 +121,14 @@ class HashGen(IDGen):
         assert value_hash == key
         assert isinstance(key, text_type)
 
+    def test_put_iter_generates_correct_hash(
+        self, hashstore, value_hash, value
+    ):
+        key = hashstore.put_iter(None, [value[:3], value[3:]])
+
+        assert key == value_hash
+        assert hashstore.get(key) == value
+
     def test_put_file_generates_correct_hash(
         self, hashstore, value_hash, value
     ):
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import asyncio
+import functools
+import os
+
+import pytest
+
+from simplekv._compat import BytesIO, text_type
+from simplekv.memory import DictStore
+from simplekv.fs import FilesystemStore
+from simplekv.crypt import VerificationException
+from simplekv.aio import ThreadPoolStore, AsyncFile
+from simplekv.aio.decorator import AsyncPrefixDecorator
+from simplekv.aio.cache import AsyncCacheDecorator
+from simplekv.aio.crypt import AsyncHMACDecorator
+
+
+def run_async(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(fn(*args, **kwargs))
+        finally:
+            loop.close()
+    return wrapper
+
+
+class AsyncBasicStore(object):
+    @run_async
+    async def test_store_and_retrieve(self, store, key, value):
+        assert await store.put(key, value) == key
+        assert await store.get(key) == value
+
+    @run_async
+    async def test_unicode_store(self, store, key, unicode_value):
+        with pytest.raises(IOError):
+            await store.put(key, unicode_value)
+
+    @run_async
+    async def test_store_memoryview(self, store, key, value):
+        await store.put(key, memoryview(bytearray(value)))
+        assert await store.get(key) == value
+
+    @run_async
+    async def test_store_and_retrieve_filelike(self, store, key, value):
+        assert await store.put_file(key, BytesIO(value)) == key
+        assert await store.get(key) == value
+
+    @run_async
+    async def test_store_async_filelike(self, store, key, long_value):
+        await store.put_file(key, AsyncFile(BytesIO(long_value)))
+        assert await store.get(key) == long_value
+
+    @run_async
+    async def test_store_and_open(self, store, key, long_value):
+        await store.put(key, long_value)
+        f = await store.open(key)
+        try:
+            assert await f.read(3) == long_value[:3]
+            assert await f.read() == long_value[3:]
+        finally:
+            await f.close()
+
+    @run_async
+    async def test_get_into_stream(self, store, key, value):
+        await store.put(key, value)
+
+        output = BytesIO()
+        await store.get_file(key, output)
+        assert output.getvalue() == value
+
+    @run_async
+    async def test_get_into_file(self, store, key, value, tmp_path):
+        await store.put(key, value)
+        out_filename = os.path.join(str(tmp_path), 'output')
+
+        await store.get_file(key, out_filename)
+
+        assert open(out_filename, 'rb').read() == value
+
+    @run_async
+    async def test_key_error_on_nonexistant_get(self, store, key):
+        with pytest.raises(KeyError):
+            await store.get(key)
+
+    @run_async
+    async def test_key_error_on_nonexistant_open(self, store, key):
+        with pytest.raises(KeyError):
+            await store.open(key)
+
+    @run_async
+    async def test_exception_on_invalid_key_get(self, store, invalid_key):
+        with pytest.raises(ValueError):
+            await store.get(invalid_key)
+
+    @run_async
+    async def test_delete(self, store, key, value):
+        await store.put(key, value)
+        assert await store.contains(key)
+
+        await store.delete(key)
+        await store.delete(key)
+        assert not await store.contains(key)
+
+    @run_async
+    async def test_key_iterator(self, store, key, key2, value, value2):
+        await store.put(key, value)
+        await store.put(key2, value2)
+
+        keys = [k async for k in store]
+        for k in keys:
+            assert isinstance(k, text_type)
+
+        assert sorted(keys) == sorted([key, key2])
+        assert sorted(await store.keys()) == sorted([key, key2])
+
+    @run_async
+    async def test_key_iterator_with_prefix(self, store, key, key2, value):
+        await store.put(key + u'_key1', value)
+        await store.put(key + u'_key2', value)
+        await store.put(key2, value)
+
+        assert sorted([k async for k in store.iter_keys(key)]) == \
+            sorted([key + u'_key1', key + u'_key2'])
+
+    @run_async
+    async def test_prefix_iterator(self, store, value):
+        for k in [u"a1Xb1", u"a2X", u"a3", u"a4Xb1Xc1", u"a4Xb2"]:
+            await store.put(k, value)
+
+        assert sorted([k async for k in store.iter_prefixes(u"X")]) == \
+            [u"a1X", u"a2X", u"a3", u"a4X"]
+        assert sorted([k async for k in
+                       store.iter_prefixes(u"X", prefix=u"a4X")]) == \
+            [u"a4Xb1X", u"a4Xb2"]
+
+    @run_async
+    async def test_put_many_and_get_many(self, store, key, key2, value,
+                                         value2):
+        await store.put_many({key: value, key2: value2})
+
+        assert await store.get_many([key, key2]) == \
+            {key: value, key2: value2}
+        assert await store.contains_many([key, key2]) == \
+            {key: True, key2: True}
+
+        await store.delete_many([key])
+        with pytest.raises(KeyError):
+            await store.get_many([key, key2])
+
+
+class TestThreadPoolStore(AsyncBasicStore):
+    @pytest.fixture
+    def store(self):
+        return ThreadPoolStore(DictStore())
+
+    @run_async
+    async def test_iterates_in_batches(self, store, value):
+        store.iter_batch_size = 3
+        keys = [u'key%d' % i for i in range(10)]
+        await store.put_many((k, value) for k in keys)
+
+        assert sorted([k async for k in store]) == sorted(keys)
+
+    @run_async
+    async def test_stopping_early_closes_iterator(self, store, value, mocker):
+        closed = []
+        iterators = []
+
+        def keys():
+            try:
+                for i in range(10):
+                    yield u'key%d' % i
+            finally:
+                closed.append(True)
+
+        def iter_keys(prefix=u""):
+            # a reference kept elsewhere, e.g. by a cursor of the store
+            iterators.append(keys())
+            return iterators[-1]
+
+        mocker.patch.object(store.store, 'iter_keys', iter_keys)
+        store.iter_batch_size = 3
+        it = store.iter_keys()
+        async for key in it:
+            break
+        await it.aclose()
+
+        assert closed == [True]
+
+
+class TestThreadPoolFilesystemStore(AsyncBasicStore):
+    @pytest.fixture
+    def store(self, tmp_path):
+        return ThreadPoolStore(FilesystemStore(str(tmp_path)))
+
+
+class TestAsyncPrefixDecorator(AsyncBasicStore):
+    @pytest.fixture
+    def base_store(self):
+        store = DictStore()
+        store.put(u'some_other_value', b'data1')
+        return ThreadPoolStore(store)
+
+    @pytest.fixture
+    def store(self, base_store):
+        return AsyncPrefixDecorator(u'prefix_', base_store)
+
+    @run_async
+    async def test_put_sets_prefix(self, store, base_store, key, value):
+        await store.put(key, value)
+        assert await base_store.get(u'prefix_' + key) == value
+
+
+class TestAsyncCacheDecorator(AsyncBasicStore):
+    @pytest.fixture
+    def front_store(self):
+        return ThreadPoolStore(DictStore())
+
+    @pytest.fixture
+    def store(self, front_store):
+        return AsyncCacheDecorator(front_store, ThreadPoolStore(DictStore()))
+
+    @run_async
+    async def test_works_when_cache_loses_key(self, store, front_store, key,
+                                              value):
+        await store.put(key, value)
+        assert await store.get(key) == value
+
+        await front_store.delete(key)
+        assert await store.get(key) == value
+        assert await front_store.get(key) == value
+
+
+class TestAsyncHMACDecorator(AsyncBasicStore):
+    @pytest.fixture
+    def base_store(self):
+        return DictStore()
+
+    @pytest.fixture
+    def store(self, secret_key, base_store):
+        return AsyncHMACDecorator(secret_key, ThreadPoolStore(base_store))
+
+    # like the synchronous decorator, hashing fails before the type is checked
+    test_unicode_store = None
+
+    @run_async
+    async def test_get_fails_on_manipulation(self, store, base_store, key,
+                                             value):
+        await store.put(key, value)
+        base_store.d[key] += b'a'
+
+        with pytest.raises(VerificationException):
+            await store.get(key)
+
+        f = await store.open(key)
+        with pytest.raises(VerificationException):
+            await f.read()
+
+    def test_compatible_with_sync_decorator(self, store, base_store,
+                                            secret_key, key, value):
+        from simplekv.crypt import HMACDecorator
+
+        HMACDecorator(secret_key, base_store).put(key, value)
+        assert run_async(store.get)(key) == value
+
+
+class TestAsyncRedisStore(AsyncBasicStore):
+    @pytest.fixture
+    def store(self):
+        pytest.importorskip('redis.asyncio')
+        from redis.asyncio import StrictRedis
+        from redis.exceptions import ConnectionError
+        from simplekv.aio.redisstore import AsyncRedisStore
+
+        r = StrictRedis()
+
+        @run_async
+        async def flushdb():
+            try:
+                await r.flushdb()
+            except ConnectionError:
+                pytest.skip('Could not connect to redis server')
+            finally:
+                # connections are bound to the event loop of the test
+                await r.connection_pool.disconnect()
+
+        flushdb()
+        return AsyncRedisStore(r)
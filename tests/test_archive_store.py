@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from simplekv.archive import TarStore, ZipStore
+from simplekv.contrib import ExtendedKeyspaceMixin
+from simplekv._compat import text_type
+
+MEMBERS = {
+    u'a.txt': b'hello world' * 100,
+    u'empty': b'',
+    u'dir/b.bin': bytes(bytearray(range(256))) * 20,
+    u'dir/sub/c': b'c',
+}
+
+# not valid keys, even with the extended keyspace
+INVALID_MEMBERS = {
+    u'caf\xe9': b'coffee',
+    u'colon:name': b'colon',
+}
+
+
+class ExtendedZipStore(ExtendedKeyspaceMixin, ZipStore):
+    pass
+
+
+class ExtendedTarStore(ExtendedKeyspaceMixin, TarStore):
+    pass
+
+
+class ArchiveStoreTests(object):
+    def test_get(self, store):
+        for key, value in MEMBERS.items():
+            assert store.get(key) == value
+            assert key in store
+            assert store.stat(key).size == len(value)
+
+    def test_missing_key(self, store):
+        assert u'dir' not in store
+        with pytest.raises(KeyError):
+            store.get(u'missing')
+        with pytest.raises(KeyError):
+            store.open(u'missing')
+
+    def test_keys(self, store):
+        assert list(store.iter_keys()) == sorted(MEMBERS)
+        assert all(isinstance(key, text_type) for key in store.keys())
+        assert list(store.iter_keys(u'dir/')) == [u'dir/b.bin', u'dir/sub/c']
+        assert sorted(store.iter_prefixes(u'/')) == \
+            [u'a.txt', u'dir/', u'empty']
+
+    def test_invalid_names_are_skipped(self, store):
+        assert not any(name in store._members for name in INVALID_MEMBERS)
+        for name in INVALID_MEMBERS:
+            with pytest.raises(ValueError):
+                store.get(name)
+
+    def test_open_is_seekable(self, store):
+        value = MEMBERS[u'dir/b.bin']
+        with store.open(u'dir/b.bin') as f:
+            assert f.read(10) == value[:10]
+            f.seek(-5, io.SEEK_END)
+            assert f.read() == value[-5:]
+            f.seek(100)
+            assert f.tell() == 100
+            assert f.read(3) == value[100:103]
+
+    def test_get_range(self, store):
+        value = MEMBERS[u'a.txt']
+        assert store.get_range(u'a.txt', 5, 10) == value[5:15]
+        assert store.get_range(u'a.txt', 1090) == value[1090:]
+        assert store.get_range(u'a.txt', 5000) == b''
+
+    def test_open_mmap(self, store):
+        for key, value in MEMBERS.items():
+            view = store.open_mmap(key)
+            assert view.readonly
+            assert view.tobytes() == value
+
+    def test_is_read_only(self, store):
+        with pytest.raises(NotImplementedError):
+            store.put(u'key', b'value')
+
+
+class TestZipStore(ArchiveStoreTests):
+    @pytest.fixture(params=[zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED],
+                    ids=['stored', 'deflated'])
+    def store(self, request, tmp_path):
+        path = os.path.join(str(tmp_path), 'archive.zip')
+        with zipfile.ZipFile(path, 'w', request.param) as z:
+            z.writestr('dir/', b'')
+            for key, value in sorted(MEMBERS.items()) + \
+                    sorted(INVALID_MEMBERS.items()):
+                z.writestr(key, value)
+        store = ExtendedZipStore(path)
+        yield store
+        store.close()
+
+    def test_corruption_is_detected(self, tmp_path):
+        path = os.path.join(str(tmp_path), 'archive.zip')
+        with zipfile.ZipFile(path, 'w') as z:
+            z.writestr('key', b'value')
+        with open(path, 'r+b') as f:
+            data = f.read()
+            f.seek(data.index(b'value'))
+            f.write(b'VALUE')
+
+        store = ZipStore(path)
+        try:
+            with pytest.raises(IOError):
+                store.get(u'key')
+        finally:
+            store.close()
+
+
+class TestTarStore(ArchiveStoreTests):
+    @pytest.fixture
+    def store(self, tmp_path):
+        path = os.path.join(str(tmp_path), 'archive.tar')
+        with tarfile.open(path, 'w', encoding='utf-8') as t:
+            directory = tarfile.TarInfo('dir')
+            directory.type = tarfile.DIRTYPE
+            t.addfile(directory)
+            for key, value in sorted(MEMBERS.items()) + \
+                    sorted(INVALID_MEMBERS.items()):
+                info = tarfile.TarInfo(key)
+                info.size = len(value)
+                t.addfile(info, io.BytesIO(value))
+        store = ExtendedTarStore(path)
+        yield store
+        store.close()
+
+    def test_compressed_archive(self, tmp_path):
+        path = os.path.join(str(tmp_path), 'archive.tar.gz')
+        with tarfile.open(path, 'w:gz') as t:
+            t.addfile(tarfile.TarInfo('empty'))
+
+        with pytest.raises(tarfile.ReadError):
+            TarStore(path)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import io
+import os
+import threading
+
+import pytest
+
+from simplekv.bitcask import BitcaskStore
+
+from basic_store import BasicStore
+
+
+class TestBitcaskStore(BasicStore):
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path)
+
+    @pytest.fixture
+    def store(self, path):
+        store = BitcaskStore(path, max_segment_size=4096)
+        yield store
+        store.close()
+
+    def _reopen(self, store, **kwargs):
+        store.close()
+        kwargs.setdefault('max_segment_size', store.max_segment_size)
+        return BitcaskStore(store.path, **kwargs)
+
+    def test_values_survive_reopening(self, store, key, key2, value, value2):
+        store.put(key, value)
+        store.put(key2, value2)
+        store.put(key, value2)
+        store.delete(key2)
+
+        store = self._reopen(store)
+        try:
+            assert store.keys() == [key]
+            assert store.get(key) == value2
+        finally:
+            store.close()
+
+    def test_reopening_without_close(self, store, path, value):
+        keys = [u'key%d' % i for i in range(100)]
+        store.put_many((k, value) for k in keys)
+        store.delete(u'key0')
+
+        # a crash leaves neither the lock nor the hints of the active segment
+        os.close(store._lockfile)
+        store._lockfile = None
+
+        reopened = BitcaskStore(path)
+        try:
+            assert sorted(reopened.keys()) == sorted(keys[1:])
+            assert reopened.get(u'key99') == value
+        finally:
+            reopened.close()
+
+    def test_interrupted_write_is_ignored(self, store, path, key, key2,
+                                          value):
+        store.put(key, value)
+        store.put(key2, value)
+        segment = store._active
+        store.close()
+
+        filename = store._filename(segment, 'data')
+        os.unlink(store._filename(segment, 'hint'))
+        with open(filename, 'r+b') as f:
+            f.truncate(os.path.getsize(filename) - 1)
+
+        reopened = BitcaskStore(path)
+        try:
+            assert reopened.keys() == [key]
+            assert reopened.get(key) == value
+        finally:
+            reopened.close()
+
+    def test_corruption_is_detected(self, store, key, value):
+        store.put(key, value)
+        filename = store._filename(store._active, 'data')
+        with open(filename, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\0' if value[-1:] != b'\0' else b'\1')
+
+        with pytest.raises(IOError):
+            store.get(key)
+
+    def test_segments_are_rotated(self, store, path, long_value):
+        for i in range(10):
+            store.put(u'key%d' % i, long_value)
+
+        segments = [n for n in os.listdir(path) if n.endswith('.data')]
+        assert len(segments) == 10
+        hints = [n for n in os.listdir(path) if n.endswith('.hint')]
+        assert len(hints) == 9
+
+    def test_compaction_reclaims_space(self, store, path, value, long_value):
+        store.compact_ratio = None
+        for i in range(10):
+            store.put(u'key%d' % i, long_value)
+        for i in range(10):
+            store.put(u'key%d' % i, value)
+        store.put(u'other', value)
+        store.delete(u'key9')
+
+        def size():
+            return sum(os.path.getsize(os.path.join(path, n))
+                       for n in os.listdir(path) if n.endswith('.data'))
+
+        before = size()
+        store.compact()
+        assert size() < before / 2
+        assert not os.path.exists(os.path.join(path, 'MERGE'))
+
+        expected = dict((u'key%d' % i, value) for i in range(9))
+        expected[u'other'] = value
+        assert store.get_many(list(expected)) == expected
+        assert u'key9' not in store
+
+        store = self._reopen(store)
+        try:
+            assert store.get_many(list(expected)) == expected
+            assert u'key9' not in store
+        finally:
+            store.close()
+
+    def test_compaction_runs_in_background(self, store, long_value):
+        for i in range(20):
+            store.put(u'key', long_value)
+        store._compactor.join()
+
+        assert len(store._segments) < 20
+        assert store.get(u'key') == long_value
+
+    def test_writes_during_compaction(self, store, long_value, value):
+        store.compact_ratio = None
+        for i in range(20):
+            store.put(u'key%d' % (i % 5), long_value)
+
+        def write():
+            for i in range(200):
+                store.put(u'key%d' % (i % 5), value)
+
+        t = threading.Thread(target=write)
+        t.start()
+        store.compact()
+        t.join()
+
+        for i in range(5):
+            assert store.get(u'key%d' % i) == value
+
+    def test_compaction_closes_old_segments(self, store, key, key2,
+                                            long_value):
+        store.compact_ratio = None
+        store.put(key, long_value)
+        for i in range(10):
+            store.put(key2, long_value)
+        old = [f for s, f in store._segments.items() if s != store._active]
+
+        with store._locate(key) as (_, reading):
+            assert reading in old
+            store.compact()
+            # files still being read from are closed afterwards
+            assert not reading.closed
+            assert all(f.closed for f in old if f is not reading)
+        assert reading.closed
+        assert store.get(key) == long_value
+
+    def test_put_file_is_streamed(self, store, key, long_value, mocker):
+        store.bufsize = 7
+        put = mocker.spy(store, '_put')
+        f = io.BytesIO(b'skipped' + long_value)
+        f.seek(7)
+
+        assert store.put_file(key, f) == key
+        assert store.get(key) == long_value
+        assert not put.called
+
+        store = self._reopen(store)
+        try:
+            assert store.get(key) == long_value
+        finally:
+            store.close()
+
+    def test_failed_put_file_is_discarded(self, store, key, key2, value,
+                                          long_value):
+        class Failing(io.BytesIO):
+            def read(self, n=-1):
+                if self.tell():
+                    raise IOError('Failure')
+                return super(Failing, self).read(n)
+
+        store.bufsize = 7
+        with pytest.raises(IOError):
+            store.put_file(key, Failing(long_value))
+        store.put(key2, value)
+
+        store = self._reopen(store)
+        try:
+            assert key not in store
+            assert store.get(key2) == value
+        finally:
+            store.close()
+
+    def test_interrupted_compaction_is_finished(self, store, path, value,
+                                                long_value, mocker):
+        store.compact_ratio = None
+        for i in range(10):
+            store.put(u'key%d' % i, long_value)
+        for i in range(10):
+            store.put(u'key%d' % i, value)
+        old = [store._filename(s, 'data') for s in store._segments
+               if s != store._active]
+
+        # interrupted before removing the old segments
+        mocker.patch.object(store, '_remove_segments',
+                            side_effect=KeyboardInterrupt)
+        with pytest.raises(KeyboardInterrupt):
+            store.compact()
+        assert os.path.exists(os.path.join(path, 'MERGE'))
+
+        store = self._reopen(store)
+        try:
+            assert not any(os.path.exists(f) for f in old)
+            for i in range(10):
+                assert store.get(u'key%d' % i) == value
+        finally:
+            store.close()
+
+    def test_closed_store_cannot_be_used(self, store, path, key, value):
+        store.put(key, value)
+        store.close()
+        files = sorted(os.listdir(path))
+
+        # no segment is started without holding the lock on the directory
+        with pytest.raises(IOError):
+            store.put(key, value)
+        with pytest.raises(IOError):
+            store.get(key)
+        with pytest.raises(IOError):
+            store.compact()
+        assert sorted(os.listdir(path)) == files
+
+    def test_directory_is_locked(self, store, path):
+        pytest.importorskip('fcntl')
+        with pytest.raises(IOError):
+            BitcaskStore(path)
@@ -55,6 +55,16 @@ class TestBoto3Storage(BasicStore, UrlStore):
         with pytest.raises(KeyError):
             store.get_file(key, os.path.join(str(tmp_path), 'a'))
 
+    def test_iter_chunks_closes_body(self, store, key, long_value, mocker):
+        from botocore.response import StreamingBody
+        close = mocker.spy(StreamingBody, 'close')
+        store.put(key, long_value)
+
+        chunks = store.iter_chunks(key, 10)
+        assert next(chunks) == long_value[:10]
+        chunks.close()
+        assert close.called
+
     def test_storage_class_put(
         self, store, prefix, key, value, storage_class, bucket
     ):
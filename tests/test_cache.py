@@ -28,3 +28,24 @@ class TestCache(BasicStore):
         front_store.delete(key)
 
         assert store.get(key) == value
+
+    def test_get_into_closes_backing_file(self, store, front_store,
+                                          backing_store, key, value, mocker):
+        store.put(key, value)
+        front_store.delete(key)
+        open_ = mocker.spy(backing_store, 'open')
+
+        buf = bytearray(len(value))
+        assert store.get_into(key, buf) == len(value)
+        assert bytes(buf) == value
+        assert open_.spy_return.closed
+
+    def test_iter_chunks_closes_backing_file(self, store, front_store,
+                                             backing_store, key, value,
+                                             mocker):
+        store.put(key, value)
+        front_store.delete(key)
+        open_ = mocker.spy(backing_store, 'open')
+
+        assert b''.join(store.iter_chunks(key, 3)) == value
+        assert open_.spy_return.closed
@@ -28,6 +28,142 @@ class TestBaseFilesystemStore(BasicStore, UrlStore, UUIDGen, HashGen):
     def store(self, tmpdir):
         return FilesystemStore(tmpdir)
 
+    def test_stat_reports_mtime_and_etag(self, store, tmpdir, key, value,
+                                         value2):
+        store.put(key, value)
+        st = store.stat(key)
+
+        assert st.mtime == os.stat(store._build_filename(key)).st_mtime
+        store.put(key, value2)
+        assert store.stat(key).etag != st.etag
+
+    def test_put_file_from_current_position(self, store, tmpdir, key,
+                                            long_value):
+        filename = os.path.join(tmpdir, u'source;')
+        with open(filename, 'wb') as f:
+            f.write(b'skip' + long_value + b'rest')
+
+        with open(filename, 'rb') as f:
+            f.seek(4)
+            store.put_file(key, f)
+            assert f.tell() == 4 + len(long_value) + 4
+
+        assert store.get(key) == long_value + b'rest'
+
+    def test_get_file_at_current_position(self, store, tmpdir, key,
+                                          long_value):
+        store.put(key, long_value)
+        filename = os.path.join(tmpdir, u'dest;')
+
+        with open(filename, 'wb') as f:
+            f.write(b'head')
+            store.get_file(key, f)
+            f.write(b'tail')
+
+        with open(filename, 'rb') as f:
+            assert f.read() == b'head' + long_value + b'tail'
+
+    def test_put_file_from_pipe(self, store, key, long_value):
+        import threading
+
+        r, w = os.pipe()
+        writer = threading.Thread(target=lambda: (os.write(w, long_value),
+                                                  os.close(w)))
+        writer.start()
+        with open(r, 'rb', buffering=0) as f:
+            store.put_file(key, f)
+        writer.join()
+
+        assert store.get(key) == long_value
+
+    def test_get_file_into_socket(self, store, key, long_value):
+        import socket
+        import threading
+
+        store.put(key, long_value)
+        a, b = socket.socketpair()
+        received = []
+
+        def receive():
+            with b.makefile('rb') as f:
+                received.append(f.read())
+
+        reader = threading.Thread(target=receive)
+        reader.start()
+        with a.makefile('wb') as f:
+            store.get_file(key, f)
+        a.close()
+        reader.join()
+        b.close()
+
+        assert received == [long_value]
+
+    def test_kernel_copy_falls_back(self, store, tmpdir, key, long_value,
+                                    mocker):
+        import simplekv.fs
+        mocker.patch.object(simplekv.fs, '_kernel_copy', return_value=None)
+
+        filename = os.path.join(tmpdir, u'source;')
+        with open(filename, 'wb') as f:
+            f.write(long_value)
+        with open(filename, 'rb') as f:
+            store.put_file(key, f)
+
+        with open(filename, 'wb') as f:
+            store.get_file(key, f)
+        with open(filename, 'rb') as f:
+            assert f.read() == long_value
+
+    def test_copy_falls_back(self, store, key, key2, long_value, mocker):
+        import simplekv.fs
+        mocker.patch.object(simplekv.fs, '_clone', return_value=False)
+        kernel_copy = mocker.patch.object(simplekv.fs, '_kernel_copy',
+                                          return_value=None)
+
+        store.put(key, long_value)
+        store.copy(key, key2)
+
+        assert kernel_copy.called
+        assert store.get(key2) == long_value
+
+    def test_move_renames_file(self, store, tmpdir, key, key2, value):
+        store.put(key, value)
+        inode = os.stat(store._build_filename(key)).st_ino
+
+        store.move(key, key2)
+
+        assert os.stat(store._build_filename(key2)).st_ino == inode
+        assert store.move(key2, key2) == key2
+        assert store.get(key2) == value
+
+    def test_open_mmap(self, store, key, long_value):
+        store.put(key, long_value)
+
+        view = store.open_mmap(key)
+        assert view.readonly
+        assert view[10:20] == long_value[10:20]
+        assert view.tobytes() == long_value
+        if hasattr(view, 'release'):
+            # unmaps the value, python 2 has no release()
+            view.release()
+
+    def test_open_mmap_empty_value(self, store, key):
+        store.put(key, b'')
+        assert store.open_mmap(key).tobytes() == b''
+
+    def test_open_mmap_errors(self, store, key, invalid_key):
+        with pytest.raises(KeyError):
+            store.open_mmap(key)
+        with pytest.raises(ValueError):
+            store.open_mmap(invalid_key)
+
+    def test_open_mmap_through_decorators(self, store, key, value):
+        from simplekv.decorator import PrefixDecorator, ReadOnlyDecorator
+
+        PrefixDecorator(u'prefix_', store).put(key, value)
+        decorated = ReadOnlyDecorator(PrefixDecorator(u'prefix_', store))
+        assert decorated.open_mmap(key) == value
+
 
 class TestFilesystemStoreMkdir(TestBaseFilesystemStore):
 
@@ -127,6 +263,18 @@ class TestFilesystemStoreUmask(TestBaseFilesystemStore):
             if os.path.exists(tmpfile.name):
                 os.path.unlink(tmpfile.name)
 
+    def test_umask_is_not_changed_per_write(self, store, key, value, mocker):
+        umask = mocker.spy(os, 'umask')
+        stat_ = mocker.spy(os, 'stat')
+
+        store.put(key, value)
+        store.put(key, value)
+        store.put_file(key, BytesIO(value))
+
+        assert not umask.called
+        assert not stat_.called
+        assert store.get(key) == value
+
 
 class TestFileStoreSetPermissions(TestFilesystemStoreUmask):
     @pytest.fixture
@@ -172,6 +320,52 @@ class TestExtendedKeyspaceFilesystemStore(TestBaseFilesystemStore,
             pass
         return ExtendedKeyspaceStore(tmpdir)
 
+    def test_delete_prefix_ossep(self, store, tmpdir, value):
+        keys = [
+            u"a1" + os.sep + u"b1",
+            u"a1" + os.sep + u"b2" + os.sep + u"c1",
+            u"a12" + os.sep + u"b1",
+            u"a2",
+        ]
+        for k in keys:
+            store.put(k, value)
+
+        store.delete_prefix(u"a1" + os.sep + u"b2")
+        assert sorted(store.keys()) == [keys[0], keys[2], keys[3]]
+
+        store.delete_prefix(u"a1")
+        assert store.keys() == [keys[3]]
+        assert not os.path.exists(
+            os.path.dirname(store._build_filename(keys[0])))
+
+    def test_deferred_cleanup(self, store, value):
+        store.defer_cleanup = True
+        key = u"a" + os.sep + u"b" + os.sep + u"c"
+        store.put(key, value)
+        store.put(u"d", value)
+        directory = os.path.dirname(store._build_filename(key))
+
+        store.delete(key)
+        assert os.path.isdir(directory)
+
+        store.compact()
+        assert not os.path.exists(directory)
+        assert store.keys() == [u"d"]
+        assert not os.path.exists(os.path.dirname(directory))
+
+    def test_delete_removes_directories_without_listing(self, store, value,
+                                                        mocker):
+        key = u"a" + os.sep + u"b" + os.sep + u"c"
+        store.put(key, value)
+        store.put(u"a" + os.sep + u"d", value)
+
+        listdir = mocker.spy(os, 'listdir')
+        store.delete(key)
+
+        assert not listdir.called
+        assert not os.path.exists(os.path.dirname(store._build_filename(key)))
+        assert store.keys() == [u"a" + os.sep + u"d"]
+
     def test_prefix_iterator_ossep(self, store, value):
         delimiter = u"X"
         for k in [
@@ -209,3 +403,398 @@ class TestExtendedKeyspaceFilesystemStore(TestBaseFilesystemStore,
             prefix=u"foo" + os.sep,
         ))
         assert l == []
+
+    def test_key_iterator_ossep(self, store, value):
+        keys = [
+            u"a1" + os.sep + u"b1",
+            u"a1" + os.sep + u"b2" + os.sep + u"c1",
+            u"a12" + os.sep + u"b1",
+            u"a2",
+        ]
+        for k in keys:
+            store.put(k, value)
+
+        assert sorted(store.iter_keys()) == sorted(keys)
+        assert sorted(store.iter_keys(u"a1")) == keys[:3]
+        assert sorted(store.iter_keys(u"a1" + os.sep)) == keys[:2]
+        assert sorted(store.iter_keys(u"a1" + os.sep + u"b2")) == [keys[1]]
+        assert list(store.iter_keys(u"a3" + os.sep)) == []
+
+    def test_key_iterator_skips_unrelated_directories(self, store, value,
+                                                      mocker):
+        store.put(u"a1" + os.sep + u"b1", value)
+        store.put(u"a2" + os.sep + u"b1" + os.sep + u"c1", value)
+
+        import simplekv.fs
+        scandir = mocker.spy(simplekv.fs, 'scandir')
+        assert list(store.iter_keys(u"a1" + os.sep)) == \
+            [u"a1" + os.sep + u"b1"]
+        assert [c[0][0] for c in scandir.call_args_list] == \
+            [os.path.join(os.path.abspath(store.root), u"a1")]
+
+
+class TestAtomicFilesystemStore(TestBaseFilesystemStore):
+    @pytest.fixture(params=[None, 'file', 'directory'])
+    def store(self, request, tmpdir):
+        return FilesystemStore(tmpdir, atomic=True, sync=request.param)
+
+    def test_no_temporary_files_left(self, store, tmpdir, key, value):
+        store.put(key, value)
+        store.put_file(key, BytesIO(value))
+        store.copy(key, key + u'copy')
+        assert sorted(os.listdir(tmpdir)) == sorted([key, key + u'copy'])
+
+    def test_failed_write_keeps_old_value(self, store, tmpdir, key, value,
+                                          value2):
+        store.put(key, value)
+
+        def chunks():
+            yield value2
+            raise IOError('Failure')
+
+        with pytest.raises(IOError):
+            store.put_iter(key, chunks())
+
+        assert store.get(key) == value
+        assert os.listdir(tmpdir) == [key]
+
+    def test_replaced_value_keeps_permissions(self, store, tmpdir, key,
+                                              value, value2):
+        store.put(key, value)
+        os.chmod(os.path.join(tmpdir, key), 0o640)
+
+        store.put(key, value2)
+        mode = os.stat(os.path.join(tmpdir, key)).st_mode
+        assert stat.S_IMODE(mode) == 0o640
+
+    def test_temporary_files_are_not_listed(self, store, tmpdir, key, value):
+        store.put(key, value)
+        open(os.path.join(tmpdir, u';partial'), 'wb').close()
+
+        assert store.keys() == [key]
+        assert list(store.iter_prefixes(os.sep)) == [key]
+
+    def test_sync_policy(self, store, key, value, mocker):
+        import simplekv.fs
+        fdatasync = mocker.patch.object(simplekv.fs, '_fdatasync')
+        fsync = mocker.patch('os.fsync')
+
+        store.put(key, value)
+
+        assert fdatasync.called == (store.sync is not None)
+        assert fsync.called == (store.sync == 'directory')
+
+    def test_open_mmap_survives_replacing_value(self, store, key,
+                                                long_value):
+        store.put(key, long_value)
+        view = store.open_mmap(key)
+
+        store.put(key, b'new')
+        assert view.tobytes() == long_value
+        assert store.get(key) == b'new'
+
+    def test_invalid_sync_policy(self, tmpdir):
+        with pytest.raises(ValueError):
+            FilesystemStore(tmpdir, sync='always')
+
+
+class TestGroupCommitFilesystemStore(TestBaseFilesystemStore):
+    @pytest.fixture(params=[False, True])
+    def store(self, request, tmpdir):
+        return FilesystemStore(tmpdir, atomic=request.param,
+                               sync='directory', group_commit=True)
+
+    def test_concurrent_puts(self, store, value):
+        import threading
+
+        keys = [u'key%d' % i for i in range(20)]
+        threads = [threading.Thread(target=store.put, args=(k, value))
+                   for k in keys]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sorted(store.keys()) == sorted(keys)
+
+    def test_group_commit_requires_sync(self, tmpdir):
+        with pytest.raises(ValueError):
+            FilesystemStore(tmpdir, group_commit=True)
+
+
+class TestGroupCommit(object):
+    def test_coalesces_waiting_callers(self):
+        import threading
+        from simplekv.fs import _GroupCommit
+
+        release = threading.Event()
+        batches = []
+
+        def flush(items):
+            batches.append(sorted(items))
+            release.wait()
+
+        commit = _GroupCommit(flush)
+        threads = [threading.Thread(target=commit, args=(i,))
+                   for i in range(6)]
+        threads[0].start()
+        while not batches:
+            pass
+        for t in threads[1:]:
+            t.start()
+        while len(commit._batch.items) < 5:
+            pass
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert batches == [[0], [1, 2, 3, 4, 5]]
+
+    def test_errors_are_raised_by_all_callers_of_a_batch(self):
+        from simplekv.fs import _GroupCommit
+
+        def flush(items):
+            raise IOError('Failure')
+
+        commit = _GroupCommit(flush)
+        with pytest.raises(IOError):
+            commit(1)
+        with pytest.raises(IOError):
+            commit(2)
+
+
+class TestShardedFilesystemStore(TestBaseFilesystemStore):
+    @pytest.fixture(params=[1, 2])
+    def store(self, request, tmpdir):
+        return FilesystemStore(tmpdir, shard_depth=request.param)
+
+    def test_files_are_sharded(self, store, tmpdir, key, value):
+        store.put(key, value)
+
+        path = os.path.relpath(store._build_filename(key), tmpdir)
+        parts = path.split(os.sep)
+        assert len(parts) == store.shard_depth + 1
+        assert parts[-1] == key
+        assert all(len(p) == 2 for p in parts[:-1])
+
+    def test_keys_and_prefixes_are_transparent(self, store, value):
+        keys = [u'a%d' % i for i in range(50)] + [u'b1', u'b2']
+        for k in keys:
+            store.put(k, value)
+
+        assert sorted(store.keys()) == sorted(keys)
+        assert sorted(store.iter_keys(u'b')) == [u'b1', u'b2']
+        expected = [u'a1', u'a21', u'a31', u'a41', u'b1']
+        expected += [k for k in keys if u'1' not in k]
+        assert sorted(store.iter_prefixes(u'1')) == sorted(expected)
+
+    def test_delete_removes_empty_shards(self, store, tmpdir, key, value):
+        store.put(key, value)
+        store.delete(key)
+        assert os.listdir(tmpdir) == []
+
+    def test_url_includes_shard(self, tmpdir, key):
+        store = WebFilesystemStore(tmpdir, 'http://some/url/root/',
+                                   shard_depth=2)
+        shard = store._shard(key)
+        assert store.url_for(key) == 'http://some/url/root/%s/%s/%s' % (
+            shard[0], shard[1], url_quote(key))
+
+    def test_invalid_sharding(self, tmpdir):
+        with pytest.raises(ValueError):
+            FilesystemStore(tmpdir, shard_depth=5, shard_width=2)
+        with pytest.raises(ValueError):
+            FilesystemStore(tmpdir, shard_depth=1, shard_width=0)
+
+
+class TestShardedExtendedKeyspaceFilesystemStore(
+        TestExtendedKeyspaceFilesystemStore):
+    @pytest.fixture
+    def store(self, tmpdir):
+        class ExtendedKeyspaceStore(ExtendedKeyspaceMixin, FilesystemStore):
+            pass
+        return ExtendedKeyspaceStore(tmpdir, shard_depth=2)
+
+    # walks the scandir calls of the unsharded layout
+    test_key_iterator_skips_unrelated_directories = None
+
+
+class TestIndexedFilesystemStore(TestExtendedKeyspaceFilesystemStore):
+    @pytest.fixture(params=[0, 2])
+    def store(self, request, tmpdir):
+        class ExtendedKeyspaceStore(ExtendedKeyspaceMixin, FilesystemStore):
+            pass
+        return ExtendedKeyspaceStore(tmpdir, shard_depth=request.param,
+                                     index=True)
+
+    # listings are answered by the index
+    test_key_iterator_skips_unrelated_directories = None
+
+    def _age_directories(self, tmpdir):
+        # the index lists directories modified in the last second again
+        t = os.stat(tmpdir).st_mtime - 10
+        for dirpath, _, _ in os.walk(tmpdir):
+            os.utime(dirpath, (t, t))
+
+    def test_index_is_used_for_listings(self, store, value, mocker):
+        import simplekv.fs
+        store.put(u'a/b', value)
+        store.put(u'c', value)
+        scandir = mocker.spy(simplekv.fs, 'scandir')
+        exists = mocker.spy(os.path, 'exists')
+
+        assert sorted(store.keys()) == [u'a/b', u'c']
+        assert u'a/b' in store
+        assert list(store.iter_prefixes(u'/')) == [u'a/', u'c']
+        assert not scandir.called
+        assert not exists.called
+
+    def test_index_persists(self, store, tmpdir, key, value):
+        store.put(key, value)
+        store.put(u'a/b', value)
+        store.delete(key)
+
+        reopened = type(store)(tmpdir, shard_depth=store.shard_depth,
+                               index=True)
+        assert reopened.keys() == [u'a/b']
+
+    def test_refresh_finds_external_changes(self, store, tmpdir, key, key2,
+                                            value):
+        store.put(key, value)
+        os.unlink(store._build_filename(key))
+        other = type(store)(tmpdir, shard_depth=store.shard_depth)
+        other.put(key2, value)
+        other.put(u'a/b', value)
+
+        assert store.keys() == [key]
+        store.refresh_index()
+        assert sorted(store.keys()) == sorted([key2, u'a/b'])
+
+    def test_refresh_only_lists_changed_directories(self, store, tmpdir,
+                                                    value, mocker):
+        import simplekv.fs
+        for k in [u'a/b/c', u'a/d', u'e']:
+            store.put(k, value)
+        self._age_directories(tmpdir)
+        store.refresh_index()
+
+        scandir = mocker.spy(simplekv.fs, 'scandir')
+        store.refresh_index()
+        assert not scandir.called
+
+        os.unlink(store._build_filename(u'a/b/c'))
+        store.refresh_index()
+        assert scandir.call_count == 1
+        assert sorted(store.keys()) == [u'a/d', u'e']
+
+    def test_index_is_rebuilt_for_another_layout(self, store, tmpdir, value):
+        store.put(u'k', value)
+        reopened = FilesystemStore(tmpdir, shard_depth=1, index=True)
+        assert u'k' not in reopened.keys()
+
+    def test_prefix_iterator_skips_keys(self, store, value):
+        keys = [u'a/b%d' % i for i in range(10)] + [u'a/c/d', u'ab', u'b/c']
+        for k in keys:
+            store.put(k, value)
+
+        assert list(store.iter_prefixes(u'/')) == [u'a/', u'ab', u'b/']
+        assert list(store.iter_prefixes(u'/', u'a/')) == \
+            [u'a/b%d' % i for i in range(10)] + [u'a/c/']
+        assert list(store.iter_keys(u'a/c')) == [u'a/c/d']
+
+
+class TestFilesystemStoreStaysInRoot(object):
+    @pytest.fixture
+    def outside(self, tmpdir):
+        # a sibling of the root and a file next to it
+        tmpdir.join('sibling').ensure(dir=True).join('secret').write('x')
+        tmpdir.join('outside.txt').write('x')
+        return tmpdir
+
+    @pytest.fixture(params=[0, 2])
+    def store(self, request, outside, value):
+        class ExtendedKeyspaceStore(ExtendedKeyspaceMixin, FilesystemStore):
+            pass
+        root = outside.join('root').ensure(dir=True)
+        store = ExtendedKeyspaceStore(str(root), shard_depth=request.param)
+        store.put(u'a/b', value)
+        store.put(u'c', value)
+        return store
+
+    def test_iter_keys_with_parent_prefix(self, store):
+        for prefix in [u'..', u'../', u'../sib', u'a/../../',
+                       u'a/../../out', u'a/../a/']:
+            assert list(store.iter_keys(prefix)) == []
+
+    def test_iter_keys_with_absolute_prefix(self, store, outside):
+        assert list(store.iter_keys(str(outside) + os.sep)) == []
+        assert list(store.iter_keys(str(outside.join('out')))) == []
+
+    def test_iter_keys_through_symlink(self, store, outside):
+        os.symlink(str(outside.join('sibling')),
+                   os.path.join(store.root, 'link'))
+        assert list(store.iter_keys(u'link/')) == []
+        assert sorted(store.iter_keys()) == [u'a/b', u'c']
+
+    def test_iter_prefixes_with_parent_prefix(self, store):
+        for prefix in [u'../', u'../sibling/', u'a/../../',
+                       u'a/../../sibling/']:
+            assert list(store.iter_prefixes(u'/', prefix)) == []
+        assert list(store.iter_prefixes(u'/', u'a/')) == [u'a/b']
+
+    def test_iter_prefixes_with_absolute_prefix(self, store, outside):
+        assert list(store.iter_prefixes(u'/', str(outside) + os.sep)) == []
+        assert list(store.iter_prefixes(
+            u'/', str(outside.join('sibling')) + os.sep)) == []
+
+    def test_iter_prefixes_through_symlink(self, store, outside):
+        os.symlink(str(outside.join('sibling')),
+                   os.path.join(store.root, 'link'))
+        assert list(store.iter_prefixes(u'/', u'link/')) == []
+
+    def _assert_untouched(self, store, outside):
+        assert outside.join('outside.txt').check(file=True)
+        assert outside.join('sibling', 'secret').check(file=True)
+        assert outside.join('root').check(dir=True)
+        assert sorted(store.keys()) == [u'a/b', u'c']
+
+    def test_delete_prefix_with_parent_prefix(self, store, outside):
+        for prefix in [u'../sib', u'../', u'a/../../sib', u'a/../../out',
+                       u'a/../../']:
+            store.delete_prefix(prefix)
+            self._assert_untouched(store, outside)
+
+    def test_delete_prefix_with_absolute_prefix(self, store, outside):
+        store.delete_prefix(str(outside.join('out')))
+        store.delete_prefix(str(outside.join('sibling')) + os.sep)
+        self._assert_untouched(store, outside)
+
+    def test_delete_prefix_through_symlink(self, store, outside):
+        os.symlink(str(outside.join('sibling')),
+                   os.path.join(store.root, 'link'))
+        store.delete_prefix(u'link/')
+        self._assert_untouched(store, outside)
+
+    def test_iter_keys_closes_scandir(self, store, mocker):
+        import simplekv.fs
+        scandir = simplekv.fs.scandir
+        opened, closed = [], []
+
+        class Entries(object):
+            def __init__(self, path):
+                self._path = path
+                self._entries = iter(list(scandir(path)))
+                opened.append(path)
+
+            def __iter__(self):
+                return self._entries
+
+            def close(self):
+                closed.append(self._path)
+
+        mocker.patch.object(simplekv.fs, 'scandir', Entries)
+        keys = store.iter_keys()
+        next(keys)
+        keys.close()
+        assert opened
+        assert sorted(closed) == sorted(opened)
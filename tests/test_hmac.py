@@ -129,6 +129,31 @@ class HMACDec(object):
         with pytest.raises(VerificationException):
             hmacstore.get(key)
 
+    def test_open_mmap_fails_on_manipulation(self, hmacstore, key, value):
+        hmacstore.put(key, value)
+        assert hmacstore.open_mmap(key) == value
+
+        hmacstore.d[key] += b('a')
+        with pytest.raises(VerificationException):
+            hmacstore.open_mmap(key)
+
+    def test_iter_chunks_fails_on_manipulation(self, hmacstore, key,
+                                               long_value):
+        hmacstore.put(key, long_value)
+        hmacstore.d[key] = b('X') + hmacstore.d[key][1:]
+
+        chunks = hmacstore.iter_chunks(key, 1024)
+        # data is passed on before the hash can be checked
+        assert next(chunks)[:1] == b('X')
+        with pytest.raises(VerificationException):
+            list(chunks)
+
+    def test_iter_chunks_fails_on_short_value(self, hmacstore, key):
+        hmacstore.d[key] = b('abc')
+
+        with pytest.raises(VerificationException):
+            list(hmacstore.iter_chunks(key))
+
     def test_copy_raises_not_implemented(self, store):
         with pytest.raises(NotImplementedError):
             HMACDecorator(b'secret', store).copy(u'src', u'dest')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import pytest
+
+lmdb = pytest.importorskip('lmdb')
+
+from simplekv.db.lmdbstore import LMDBStore
+from simplekv.contrib import ExtendedKeyspaceMixin
+
+from basic_store import BasicStore
+from conftest import ExtendedKeyspaceTests, OrderedListingTests
+
+
+class TestLMDBStore(BasicStore, OrderedListingTests):
+    page_size = 'simplekv.db.lmdbstore._BATCH_SIZE'
+
+    @pytest.fixture
+    def env(self, tmp_path):
+        env = lmdb.open(str(tmp_path), map_size=64 * 1024 * 1024,
+                        max_dbs=2)
+        yield env
+        env.close()
+
+    @pytest.fixture
+    def store(self, env):
+        return LMDBStore(env)
+
+    def test_named_database(self, store, env, key, value, value2):
+        first = type(store)(env, env.open_db(b'first'))
+        second = type(store)(env, env.open_db(b'second'))
+
+        first.put(key, value)
+        second.put(key, value2)
+        assert first.get(key) == value
+        assert second.get(key) == value2
+
+    def test_view(self, store, key, value):
+        store.put(key, value)
+        with store.view(key) as view:
+            assert isinstance(view, memoryview)
+            assert view.tobytes() == value
+
+        with pytest.raises(KeyError):
+            with store.view(u'missing'):
+                pass
+
+    def test_key_too_long(self, store, value):
+        with pytest.raises(ValueError):
+            store.put(u'k' * (store.env.max_key_size() + 1), value)
+
+    def test_map_full(self, store, tmp_path, key, long_value):
+        env = lmdb.open(str(tmp_path / 'small'), map_size=64 * 1024)
+        try:
+            with pytest.raises(IOError):
+                type(store)(env).put(key, long_value * 1000)
+        finally:
+            env.close()
+
+    def test_put_many_is_one_transaction(self, store, value, mocker):
+        write = mocker.spy(store, '_write')
+        store.put_many([(u'a', value), (u'b', value), (u'c', value)])
+        store.delete_many([u'a', u'b'])
+        assert write.call_count == 2
+        assert store.keys() == [u'c']
+
+
+class TestExtendedKeyspaceLMDBStore(TestLMDBStore, ExtendedKeyspaceTests):
+    @pytest.fixture
+    def store(self, env):
+        class ExtendedKeyspaceStore(ExtendedKeyspaceMixin, LMDBStore):
+            pass
+        return ExtendedKeyspaceStore(env)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import io
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from simplekv.db import sqlite
+from simplekv.db.sqlite import SQLiteStore
+from simplekv.contrib import ExtendedKeyspaceMixin
+
+from basic_store import BasicStore, OpenSeekTellStore
+from conftest import ExtendedKeyspaceTests, OrderedListingTests
+
+
+class TestSQLiteStore(BasicStore, OpenSeekTellStore, OrderedListingTests):
+    page_size = 'simplekv.db.sqlite._PAGE_SIZE'
+
+    @pytest.fixture
+    def filename(self, tmp_path):
+        return os.path.join(str(tmp_path), 'store.db')
+
+    @pytest.fixture
+    def store(self, filename):
+        store = SQLiteStore(filename)
+        yield store
+        store.close()
+
+    def test_wal_mode(self, store):
+        assert store._conn.execute('PRAGMA journal_mode').fetchone()[0] == \
+            'wal'
+
+    def test_connection_per_thread(self, store, key, value):
+        store.put(key, value)
+        connections = []
+
+        def read():
+            connections.append(store._conn)
+            assert store.get(key) == value
+
+        t = threading.Thread(target=read)
+        t.start()
+        t.join()
+
+        assert connections[0] is not store._conn
+
+        # the connection of a thread is closed once it exits, which python 2
+        # only gets to after join() returned
+        for _ in range(100):
+            if len(store._connections) == 1:
+                break
+            time.sleep(0.01)
+        assert store._connections == [store._conn]
+        with pytest.raises(sqlite3.ProgrammingError):
+            connections[0].execute('SELECT 1')
+
+    def test_shared_database(self, store, filename, key, value):
+        other = type(store)(filename)
+        try:
+            store.put(key, value)
+            assert other.get(key) == value
+        finally:
+            other.close()
+
+    def test_values_are_blobs(self, store, key):
+        value = b'\xff\x00\x01'
+        store.put(key, value)
+        store.put_many([(u'ascii', b'abc'), (u'view', memoryview(value))])
+
+        for k, v in [(key, value), (u'ascii', b'abc'), (u'view', value)]:
+            assert type(store.get(k)) is bytes
+            assert store.get(k) == v
+        assert store._conn.execute(
+            'SELECT DISTINCT typeof(value) FROM simplekv').fetchall() == \
+            [(u'blob',)]
+
+    def test_tablename_is_quoted(self, store, filename, key, value):
+        store = type(store)(filename, tablename='my "table"')
+        try:
+            store.put(key, value)
+            assert store.get(key) == value
+            assert store.open(key).read() == value
+        finally:
+            store.close()
+
+    def test_prefix_is_not_a_pattern(self, store, value):
+        store.put_many([(u'a_b', value), (u'axb', value), (u'a%', value)])
+        assert list(store.iter_keys(u'a_')) == [u'a_b']
+        store.delete_prefix(u'a%')
+        assert sorted(store.keys()) == [u'a_b', u'axb']
+
+    def test_put_many_rolls_back(self, store, key, value):
+        with pytest.raises(Exception):
+            store._put_many([(key, value), (u'other', object())])
+        assert key not in store
+
+    def test_memory_database_is_rejected(self):
+        for filename in [':memory:', '']:
+            with pytest.raises(ValueError):
+                SQLiteStore(filename)
+
+    @pytest.mark.skipif(not sqlite._HAS_BLOBOPEN,
+                        reason='needs Connection.blobopen')
+    def test_open_reads_blob(self, store, key, long_value):
+        store.put(key, long_value)
+        f = store.open(key)
+        assert isinstance(f, sqlite._BlobFile)
+        assert f.read(10) == long_value[:10]
+
+        # writes from the same thread neither abort nor change an open file
+        store.put(key, b'new value')
+        with store.open(key) as g:
+            assert g.read() == b'new value'
+        store.delete(key)
+        assert f.read() == long_value[10:]
+        f.close()
+
+        # connections are reused once their files are closed
+        assert len(store._readers) == 2
+        store.put(key, long_value)
+        with store.open(key) as f:
+            assert f.read() == long_value
+        assert len(store._readers) == 2
+
+    def test_open_without_blobopen(self, store, key, value, mocker):
+        mocker.patch.object(sqlite, '_HAS_BLOBOPEN', False)
+        store.put(key, value)
+        with store.open(key) as f:
+            assert f.read() == value
+            assert f.seek(-2, io.SEEK_END) == len(value) - 2
+            with pytest.raises(IOError):
+                f.seek(-1)
+
+    @pytest.mark.skipif(not sqlite._HAS_BLOBOPEN,
+                        reason='needs Connection.blobopen')
+    def test_idle_readers_are_capped(self, store, key, value):
+        store.put(key, value)
+        files = [store.open(key) for _ in range(sqlite._MAX_READERS + 2)]
+        for f in files:
+            f.close()
+
+        assert len(store._readers) == sqlite._MAX_READERS
+        assert len(store._connections) == sqlite._MAX_READERS + 1
+        with store.open(key) as f:
+            assert f.read() == value
+
+    @pytest.mark.skipif(not sqlite._HAS_BLOBOPEN,
+                        reason='needs Connection.blobopen')
+    def test_open_after_close(self, store, key, long_value):
+        store.put(key, long_value)
+        f = store.open(key)
+        store.close()
+        with pytest.raises(IOError):
+            f.read()
+        f.close()
+
+    @pytest.mark.skipif(not sqlite._HAS_BLOBOPEN,
+                        reason='needs Connection.blobopen')
+    def test_open_does_not_retry_errors(self, store, key, value, mocker):
+        class Connection(sqlite3.Connection):
+            def blobopen(self, *args, **kwargs):
+                raise sqlite3.OperationalError('no such column')
+
+        store.put(key, value)
+        conn = sqlite3.connect(store.filename, isolation_level=None,
+                               factory=Connection)
+        mocker.patch.object(store, '_reader', return_value=conn)
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                store.open(key)
+        finally:
+            conn.close()
+
+    @pytest.mark.skipif(not sqlite._HAS_BLOBOPEN,
+                        reason='needs Connection.blobopen')
+    def test_put_file_in_chunks(self, store, key, long_value, mocker):
+        mocker.patch('simplekv.db.sqlite._BUFSIZE', 7)
+        f = io.BytesIO(b'skipped' + long_value)
+        f.seek(7)
+        put = mocker.spy(store, '_put')
+
+        assert store.put_file(key, f) == key
+        assert store.get(key) == long_value
+        assert not put.called
+
+
+class TestExtendedKeyspaceSQLiteStore(TestSQLiteStore, ExtendedKeyspaceTests):
+    @pytest.fixture
+    def store(self, filename):
+        class ExtendedKeyspaceStore(ExtendedKeyspaceMixin, SQLiteStore):
+            pass
+        store = ExtendedKeyspaceStore(filename)
+        yield store
+        store.close()
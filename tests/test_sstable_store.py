@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding=utf8
+
+import os
+
+import pytest
+
+from simplekv.memory import DictStore
+from simplekv.sstable import SSTableStore, write_sstable
+
+
+@pytest.fixture
+def items():
+    items = dict((u'key%04d' % i, (u'value%d' % i).encode('ascii') * (i % 7))
+                 for i in range(1000))
+    items.update({u'a.b.c': b'1', u'a.b.d': b'2', u'a.e': b'3', u'ab': b'4'})
+    return items
+
+
+class TestSSTableStore(object):
+    @pytest.fixture(params=[False, True], ids=['plain', 'compressed'])
+    def store(self, request, tmp_path, items):
+        filename = os.path.join(str(tmp_path), 'table')
+        assert write_sstable(filename, items, block_size=512,
+                             compress=request.param) == len(items)
+        store = SSTableStore(filename)
+        yield store
+        store.close()
+
+    def test_get(self, store, items):
+        for key, value in items.items():
+            assert store.get(key) == value
+            assert key in store
+
+    def test_missing_keys(self, store):
+        for key in [u'key', u'key1000', u'a', u'a.b', u'zzz', u'0']:
+            assert key not in store
+            with pytest.raises(KeyError):
+                store.get(key)
+
+    def test_keys_are_sorted(self, store, items):
+        assert list(store.iter_keys()) == sorted(items)
+        assert list(store.iter_keys(u'key099')) == \
+            [u'key0990', u'key0991', u'key0992', u'key0993', u'key0994',
+             u'key0995', u'key0996', u'key0997', u'key0998', u'key0999']
+        assert list(store.iter_keys(u'a.')) == [u'a.b.c', u'a.b.d', u'a.e']
+        assert list(store.iter_keys(u'nope')) == []
+
+    def test_prefixes(self, store, items):
+        assert list(store.iter_prefixes(u'.')) == \
+            [u'a.', u'ab'] + sorted(k for k in items if k.startswith(u'key'))
+        assert list(store.iter_prefixes(u'.', u'a.')) == [u'a.b.', u'a.e']
+        assert list(store.iter_prefixes(u'y')) == [u'a.b.c', u'a.b.d',
+                                                   u'a.e', u'ab', u'key']
+
+    def test_ranges_and_stat(self, store, items):
+        value = items[u'key0006']
+        assert store.get_range(u'key0006', 2, 5) == value[2:7]
+        assert store.get_range(u'key0006', 10) == value[10:]
+        assert store.get_range(u'key0006', 1000) == b''
+        assert store.stat(u'key0006').size == len(value)
+        assert store.open(u'key0006').read() == value
+
+    def test_is_read_only(self, store):
+        with pytest.raises(NotImplementedError):
+            store.put(u'key', b'value')
+        with pytest.raises(NotImplementedError):
+            store.delete(u'key0001')
+
+    def test_build_from_store(self, tmp_path, items):
+        source = DictStore()
+        source.put_many(items)
+        filename = os.path.join(str(tmp_path), 'table')
+        write_sstable(filename, source, bloom_bits=0)
+
+        store = SSTableStore(filename)
+        try:
+            assert store.get_many(list(items)) == items
+            assert u'missing' not in store
+        finally:
+            store.close()
+
+    def test_unsorted_items(self, tmp_path):
+        filename = os.path.join(str(tmp_path), 'table')
+        with pytest.raises(ValueError):
+            write_sstable(filename, [(u'b', b''), (u'a', b'')])
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_empty_table(self, tmp_path):
+        filename = os.path.join(str(tmp_path), 'table')
+        write_sstable(filename, [])
+
+        store = SSTableStore(filename)
+        try:
+            assert store.keys() == []
+            assert list(store.iter_prefixes(u'.')) == []
+            assert u'key' not in store
+        finally:
+            store.close()
+
+    def test_not_a_table(self, tmp_path):
+        filename = os.path.join(str(tmp_path), 'table')
+        with open(filename, 'wb') as f:
+            f.write(b'x' * 100)
+        with pytest.raises(ValueError):
+            SSTableStore(filename)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# coding=utf8
+
+from simplekv._compat import BytesIO
+from simplekv.memory import DictStore
+from simplekv.decorator import StatsDecorator, PrefixDecorator
+import pytest
+
+from basic_store import BasicStore
+
+
+class TestStatsDecorator(BasicStore):
+    @pytest.fixture
+    def store(self):
+        return StatsDecorator(DictStore())
+
+    def test_counts_calls_and_bytes(self, store, key, value):
+        store.put(key, value)
+        store.get(key)
+        store.get(key)
+
+        stats = store.snapshot()
+        assert stats['put']['calls'] == 1
+        assert stats['put']['bytes_in'] == len(value)
+        assert stats['get']['calls'] == 2
+        assert stats['get']['bytes_out'] == 2 * len(value)
+        assert sum(stats['get']['latency_buckets']) == 2
+
+    def test_counts_errors(self, store, key, invalid_key):
+        with pytest.raises(KeyError):
+            store.get(key)
+        with pytest.raises(IOError):
+            store.put(key, u'not bytes')
+        with pytest.raises(ValueError):
+            store.get(invalid_key)
+
+        stats = store.snapshot()
+        assert stats['get']['calls'] == 2
+        assert stats['get']['errors'] == {'KeyError': 1, 'IOError': 0,
+                                          'other': 1}
+        assert stats['put']['errors']['IOError'] == 1
+        assert stats['put']['bytes_in'] == 0
+
+    def test_counts_streamed_bytes(self, store, key, long_value):
+        store.put_file(key, BytesIO(long_value))
+        store.get_file(key, BytesIO())
+
+        f = store.open(key)
+        f.read(10)
+        f.read()
+        f.close()
+
+        assert b''.join(store.iter_chunks(key, 100)) == long_value
+        store.put_iter(key, [long_value[:5], long_value[5:]])
+
+        stats = store.snapshot()
+        assert stats['put_file']['bytes_in'] == len(long_value)
+        assert stats['get_file']['bytes_out'] == len(long_value)
+        assert stats['open']['bytes_out'] == len(long_value)
+        assert stats['iter_chunks']['bytes_out'] == len(long_value)
+        assert stats['put_iter']['bytes_in'] == len(long_value)
+
+    def test_counts_bytes_of_unseekable_files(self, store, key, value):
+        class Unseekable(object):
+            def __init__(self, data):
+                self.buf = BytesIO(data)
+
+            def read(self, *args):
+                return self.buf.read(*args)
+
+        store.put_file(key, Unseekable(value))
+
+        assert store.get(key) == value
+        assert store.snapshot()['put_file']['bytes_in'] == len(value)
+
+    def test_counts_bytes_read_by_line(self, store, key):
+        value = b'first\nsecond\nthird\n'
+        store.put(key, value)
+
+        with store.open(key) as f:
+            assert f.readline() == b'first\n'
+            assert list(f) == [b'second\n', b'third\n']
+        with store.open(key) as f:
+            assert f.readlines() == value.splitlines(True)
+
+        assert store.snapshot()['open']['bytes_out'] == 2 * len(value)
+
+    def test_counts_errors_of_missing_files(self, store, key, tmpdir):
+        with pytest.raises(EnvironmentError):
+            store.put_file(key, str(tmpdir.join('missing')))
+
+        stats = store.snapshot()
+        assert stats['put_file']['calls'] == 1
+        assert stats['put_file']['errors']['IOError'] == 1
+
+    def test_iteration_is_recorded_once_finished(self, store, key, value):
+        store.put(key, value)
+
+        keys = store.iter_keys()
+        assert 'iter_keys' not in store.snapshot()
+        assert list(keys) == [key]
+        assert store.snapshot()['iter_keys']['calls'] == 1
+
+    def test_stopping_early_closes_iterator(self, key, long_value):
+        closed = []
+
+        class Store(DictStore):
+            def iter_chunks(self, key, chunk_size=1024 * 1024):
+                try:
+                    for chunk in DictStore.iter_chunks(self, key, chunk_size):
+                        yield chunk
+                finally:
+                    closed.append(key)
+
+        store = StatsDecorator(Store())
+        store.put(key, long_value)
+        chunks = store.iter_chunks(key, 10)
+        next(chunks)
+        chunks.close()
+
+        assert closed == [key]
+        assert store.snapshot()['iter_chunks']['calls'] == 1
+
+    def test_callback_does_not_mask_errors(self, key):
+        def callback(method, seconds, error):
+            raise RuntimeError('callback failed')
+
+        store = StatsDecorator(DictStore(), callback=callback)
+        with pytest.raises(KeyError):
+            store.get(key)
+        with pytest.raises(KeyError):
+            list(store.iter_chunks(key))
+        with pytest.raises(RuntimeError):
+            store.keys()
+
+    def test_callback(self, key, value):
+        calls = []
+        store = StatsDecorator(DictStore(),
+                               callback=lambda *args: calls.append(args))
+        store.put(key, value)
+        with pytest.raises(KeyError):
+            store.get(u'missing')
+
+        assert [(m, e) for m, _, e in calls] == [('put', None),
+                                                 ('get', 'KeyError')]
+
+    def test_reset(self, store, key, value):
+        store.put(key, value)
+        store.reset()
+        assert store.snapshot() == {}
+
+    def test_snapshot_is_a_copy(self, store, key, value):
+        store.put(key, value)
+        stats = store.snapshot()
+        store.put(key, value)
+
+        assert stats['put']['calls'] == 1
+        assert sum(stats['put']['latency_buckets']) == 1
+
+    def test_stacked_decorators(self, key, value):
+        backend = StatsDecorator(DictStore(), name='backend')
+        store = StatsDecorator(PrefixDecorator(u'prefix_', backend),
+                               name='prefix')
+        store.put(key, value)
+
+        assert store.snapshot()['put']['calls'] == 1
+        assert backend.snapshot()['put']['calls'] == 1
+        assert backend.keys() == [u'prefix_' + key]
+
+    def test_prometheus_text(self, key, value):
+        store = StatsDecorator(DictStore(), name='a"b', buckets=(1, 0.5))
+        store.put(key, value)
+        with pytest.raises(KeyError):
+            store.get(u'missing')
+
+        lines = store.prometheus_text().splitlines()
+
+        assert '# TYPE simplekv_calls_total counter' in lines
+        assert 'simplekv_calls_total{store="a\\"b",method="put"} 1' in lines
+        assert ('simplekv_errors_total{store="a\\"b",method="get",'
+                'error="KeyError"} 1') in lines
+        assert ('simplekv_bytes_in_total{store="a\\"b",method="put"} %d'
+                % len(value)) in lines
+        assert '# TYPE simplekv_latency_seconds histogram' in lines
+        assert ('simplekv_latency_seconds_bucket{store="a\\"b",'
+                'method="put",le="0.5"} 1') in lines
+        assert ('simplekv_latency_seconds_bucket{store="a\\"b",'
+                'method="put",le="+Inf"} 1') in lines
+        assert ('simplekv_latency_seconds_count{store="a\\"b",'
+                'method="get"} 1') in lines
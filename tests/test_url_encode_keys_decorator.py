@@ -32,3 +32,10 @@ class TestURLEncodeKeysDecorator(BasicStore):
     test_exception_on_invalid_key_delete = None
     test_exception_on_invalid_key_get_file = None
     test_exception_on_invalid_key_get = None
+    test_exception_on_invalid_key_get_many = None
+    test_exception_on_invalid_key_put_many = None
+    test_exception_on_invalid_key_stat = None
+    test_exception_on_invalid_key_get_range = None
+    test_exception_on_invalid_key_get_into = None
+    test_exception_on_invalid_key_iter_chunks = None
+    test_exception_on_invalid_key_put_iter = None